@@ -0,0 +1,12 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Benchmarks of ProfileQC.
+
+The suites follow the asv (airspeed velocity) conventions: classes with
+params, setup() and time_* / peakmem_* methods. Run them with asv (see
+asv.conf.json in the repository root) or without asv:
+
+    python -m benchmarks
+    python -m benchmarks --quick -k spike
+"""
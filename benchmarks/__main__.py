@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Run the benchmark suites without asv.
+
+    python -m benchmarks                 # all suites and params
+    python -m benchmarks --quick         # smallest params only
+    python -m benchmarks -k spike -k range --repeat 5
+
+Only time_* benchmarks are run (peakmem_* need asv).
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import itertools
+import pkgutil
+import sys
+import time
+from pathlib import Path
+
+PACKAGE_PATH = Path(__file__).resolve().parent
+SRC_PATH = PACKAGE_PATH.parent.joinpath('src')
+
+
+def get_suites():
+    """Yield (name, suite class) of all benchmark modules."""
+    for module_info in pkgutil.iter_modules([str(PACKAGE_PATH)]):
+        if not module_info.name.startswith('bench_'):
+            continue
+        module = importlib.import_module(f'benchmarks.{module_info.name}')
+        for name, obj in vars(module).items():
+            if isinstance(obj, type) and obj.__module__ == module.__name__ \
+                    and any(a.startswith('time_') for a in dir(obj)):
+                yield f'{module_info.name}.{name}', obj
+
+
+def get_param_combinations(suite, quick=False):
+    """Return list of parameter tuples of a suite."""
+    params = getattr(suite, 'params', None)
+    if params is None:
+        return [()]
+    if not getattr(suite, 'param_names', None) or \
+            len(suite.param_names) == 1:
+        params = (params,) if not isinstance(params[0], (tuple, list)) \
+            else params
+    if quick:
+        params = [p[:1] for p in params]
+    return list(itertools.product(*params))
+
+
+def run_benchmark(suite, method, args, repeat):
+    """Return the best time of repeat runs of suite.method(*args)."""
+    instance = suite()
+    if hasattr(instance, 'setup'):
+        instance.setup(*args)
+    try:
+        timings = []
+        for _ in range(repeat):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                getattr(instance, method)(*args)
+                timings.append(time.perf_counter() - start)
+    finally:
+        if hasattr(instance, 'teardown'):
+            instance.teardown(*args)
+    return min(timings)
+
+
+def main(argv=None):
+    """Run benchmarks from command line."""
+    parser = argparse.ArgumentParser(description='ProfileQC benchmarks.')
+    parser.add_argument('-k', action='append', default=[],
+                        help='Only run benchmarks with this substring in '
+                             'their name. Can be given several times.')
+    parser.add_argument('--quick', action='store_true',
+                        help='Only run the smallest params of each suite.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of runs per benchmark, best is shown.')
+    args = parser.parse_args(argv)
+
+    if SRC_PATH.exists() and str(SRC_PATH) not in sys.path:
+        sys.path.insert(0, str(SRC_PATH))
+
+    for suite_name, suite in get_suites():
+        for method in sorted(a for a in dir(suite) if a.startswith('time_')):
+            name = f'{suite_name}.{method}'
+            if args.k and not any(k.lower() in name.lower() for k in args.k):
+                continue
+            for params in get_param_combinations(suite, quick=args.quick):
+                seconds = run_benchmark(suite, method, params, args.repeat)
+                label = ', '.join(str(p) for p in params)
+                print(f'{name}({label}): {seconds * 1e3:.3f} ms', flush=True)
+
+
+if __name__ == '__main__':
+    main()
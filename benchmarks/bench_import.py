@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Import-time benchmark and regression guard.
+
+Every import is timed in a fresh interpreter. The run fails (exit code 1)
+if an import is slower than its limit or pulls in a module that should be
+deferred until it is actually needed.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --repeat 10 --scale 2
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_PATH = Path(__file__).resolve().parents[1].joinpath('src')
+
+# Modules that must not be imported by a plain import of the given statement.
+DEFERRED_MODULES = (
+    'pkg_resources',
+    'geopandas',
+    'shapely',
+    'profileqc.basins',
+    'profileqc.routines.continuous',
+    'profileqc.routines.diff',
+    'profileqc.routines.range',
+    'profileqc.routines.spike',
+)
+
+# (statement, limit in seconds, deferred modules to check)
+CASES = (
+    ('import profileqc', 0.05, DEFERRED_MODULES),
+    ('from profileqc.qc import SessionQC', 2.0, DEFERRED_MODULES),
+    ('from profileqc.batch import BatchSessionQC', 2.0, DEFERRED_MODULES),
+)
+
+_PROBE = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'elapsed': elapsed,
+    'loaded': [m for m in {modules!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(statement, modules, src_path=SRC_PATH):
+    """Return (seconds, loaded deferred modules) of one import.
+
+    The import is run in a fresh interpreter.
+    """
+    code = _PROBE.format(src=str(src_path), statement=statement,
+                         modules=tuple(modules))
+    out = subprocess.run([sys.executable, '-c', code], check=True,
+                         capture_output=True, text=True).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    return result['elapsed'], result['loaded']
+
+
+def run(repeat=5, scale=1.):
+    """Run all cases and return True if all passed."""
+    passed = True
+    for statement, limit, modules in CASES:
+        timings = []
+        loaded = set()
+        for _ in range(repeat):
+            elapsed, names = measure(statement, modules)
+            timings.append(elapsed)
+            loaded.update(names)
+        median = statistics.median(timings)
+        ok = median <= limit * scale and not loaded
+        passed &= ok
+        print(f'{"OK  " if ok else "FAIL"} {statement:<45} '
+              f'median {median * 1e3:8.1f} ms (limit {limit * scale * 1e3:.0f}'
+              f' ms)')
+        if loaded:
+            print(f'     imported deferred modules: {sorted(loaded)}')
+    return passed
+
+
+def main(argv=None):
+    """Run import benchmark from command line."""
+    parser = argparse.ArgumentParser(
+        description='Import-time benchmark of ProfileQC.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of fresh interpreters per import.')
+    parser.add_argument('--scale', type=float, default=1.,
+                        help='Multiply all time limits, eg. on slow CI '
+                             'machines.')
+    args = parser.parse_args(argv)
+    return 0 if run(repeat=args.repeat, scale=args.scale) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
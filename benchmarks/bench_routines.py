@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Benchmarks of the single QC routines at 1e2 - 1e6 rows."""
+from benchmarks.synthetic import make_profile, get_parameter_mapping
+from profileqc.routines.continuous import Decreasing, Increasing
+from profileqc.routines.diff import DataDiff
+from profileqc.routines.range import Range
+from profileqc.routines.spike import Spike
+
+ROWS = (100, 10_000, 1_000_000)
+
+
+class RoutineSuite:
+    """Base of the routine benchmarks, data of one profile."""
+
+    params = ROWS
+    param_names = ('rows',)
+    timeout = 600
+
+    def setup(self, rows):
+        """Set up data."""
+        item = make_profile(seed=1, n_rows=rows)
+        self.df = item['data']
+        self.mapping = get_parameter_mapping(self.df)
+
+    def run(self, routine, **kwargs):
+        """Return routine after it has been run."""
+        qc_func = routine(self.df, **kwargs)
+        qc_func()
+        return qc_func.flag_return
+
+
+class RangeSuite(RoutineSuite):
+    """Range on TEMP_CTD."""
+
+    def time_range(self, rows):
+        """Range."""
+        self.run(Range, parameter=self.mapping['TEMP_CTD'],
+                 min_range_value=-2, max_range_value=30)
+
+
+class SpikeSuite(RoutineSuite):
+    """Spike on SALT_CTD."""
+
+    def time_spike(self, rows):
+        """Spike."""
+        self.run(Spike, parameter=self.mapping['SALT_CTD'],
+                 number_of_values=7, acceptable_stddev_factor=1.25,
+                 min_stddev_value=0.1)
+
+    def peakmem_spike(self, rows):
+        """Spike, peak memory."""
+        self.time_spike(rows)
+
+
+class IncreasingSuite(RoutineSuite):
+    """Increasing on PRES_CTD and SIGMA_THETA_CTD."""
+
+    def time_increasing_pres(self, rows):
+        """Increasing on pressure."""
+        self.run(Increasing, parameter=self.mapping['PRES_CTD'],
+                 acceptable_error=0)
+
+    def time_increasing_density(self, rows):
+        """Increasing on density."""
+        self.run(Increasing, parameter=self.mapping['SIGMA_THETA_CTD'],
+                 acceptable_error=0.1)
+
+
+class DecreasingSuite(RoutineSuite):
+    """Decreasing on PAR_CTD."""
+
+    def time_decreasing(self, rows):
+        """Decreasing."""
+        self.run(Decreasing, parameter=self.mapping['PAR_CTD'],
+                 acceptable_error=1)
+
+
+class DataDiffSuite(RoutineSuite):
+    """DataDiff of the primary and secondary DOXY sensors."""
+
+    def time_data_diff(self, rows):
+        """DataDiff."""
+        self.run(DataDiff, parameters=[self.mapping['DOXY_CTD'],
+                                       self.mapping['DOXY2_CTD']],
+                 acceptable_error=0.5)
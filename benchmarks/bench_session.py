@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Benchmarks of SessionQC.run and BatchSessionQC.run.
+
+From one profile of up to 1e6 rows to 10k profiles.
+"""
+import copy
+from benchmarks.synthetic import (
+    make_datasets,
+    make_profile,
+    get_parameter_mapping
+)
+from profileqc.batch import BatchSessionQC, RaggedProfiles
+from profileqc.qc import SessionQC
+from profileqc.utils import QcLog
+
+SPEC_NAME = 'smhi_expedition'
+
+
+class SessionRunSuite:
+    """SessionQC.run on one profile."""
+
+    params = ((100, 10_000, 1_000_000), (None, SPEC_NAME))
+    param_names = ('rows', 'advanced_spec')
+    timeout = 1200
+
+    def setup(self, rows, advanced_spec):
+        """Set up session and data."""
+        self.session = SessionQC(None, advanced_settings_name=advanced_spec)
+        self.item = make_profile(seed=2, n_rows=rows)
+        self.mapping = get_parameter_mapping(self.item['data'])
+
+    def time_run(self, rows, advanced_spec):
+        """Run QC on a copy of the data."""
+        item = {'data': self.item['data'].copy(),
+                'metadata': self.item['metadata'].copy()}
+        self.session.run_profile(item, parameter_mapping=self.mapping,
+                                 dataset_name='bench')
+        QcLog.update_info(reset_log=True)
+
+    def peakmem_run(self, rows, advanced_spec):
+        """Run QC, peak memory."""
+        self.time_run(rows, advanced_spec)
+
+
+class ManyProfilesSuite:
+    """SessionQC.run_profile on many profiles, one after the other."""
+
+    params = ((1, 100, 1000), (100, 1000))
+    param_names = ('profiles', 'rows')
+    timeout = 3600
+
+    def setup(self, profiles, rows):
+        """Set up session and data."""
+        self.session = SessionQC(None, advanced_settings_name=SPEC_NAME)
+        self.datasets = make_datasets(n_profiles=profiles, n_rows=rows)
+        self.mapping = get_parameter_mapping(
+            next(iter(self.datasets.values()))['data'])
+
+    def time_serial(self, profiles, rows):
+        """Run QC profile by profile."""
+        datasets = copy.deepcopy(self.datasets)
+        self.session.run_many(datasets, parameter_mapping=self.mapping)
+        QcLog.update_info(reset_log=True)
+
+
+class BatchSuite:
+    """BatchSessionQC.run on 1 - 10k profiles at once."""
+
+    params = ((1, 100, 1000, 10_000), (100, 1000))
+    param_names = ('profiles', 'rows')
+    timeout = 3600
+
+    def setup(self, profiles, rows):
+        """Set up data."""
+        self.datasets = make_datasets(n_profiles=profiles, n_rows=rows)
+        self.mapping = get_parameter_mapping(
+            next(iter(self.datasets.values()))['data'])
+
+    def time_batch(self, profiles, rows):
+        """Run QC on all profiles at once."""
+        qc_run = BatchSessionQC(
+            RaggedProfiles.from_datasets(self.datasets),
+            parameter_mapping=self.mapping,
+            advanced_settings_name=SPEC_NAME
+        )
+        qc_run.run()
+        QcLog.update_info(reset_log=True)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Benchmarks of loading settings and resolving advanced QC settings."""
+import os
+import shutil
+import tempfile
+from profileqc.config import Settings
+
+SPEC_NAME = 'smhi_expedition'
+
+
+class SettingsSuite:
+    """Load Settings with a cold or warm settings bundle."""
+
+    params = ((None, SPEC_NAME),)
+    param_names = ('advanced_spec',)
+
+    def setup(self, advanced_spec):
+        """Use a separate cache folder."""
+        self._cache_env = os.environ.get('PROFILEQC_CACHE_DIR')
+        self.cache_folder = tempfile.mkdtemp()
+        os.environ['PROFILEQC_CACHE_DIR'] = self.cache_folder
+        # Compile the bundles for the warm benchmark
+        Settings(advanced_qc_spec_name=advanced_spec)
+
+    def teardown(self, advanced_spec):
+        """Remove the cache folder."""
+        if self._cache_env is None:
+            os.environ.pop('PROFILEQC_CACHE_DIR', None)
+        else:
+            os.environ['PROFILEQC_CACHE_DIR'] = self._cache_env
+        shutil.rmtree(self.cache_folder, ignore_errors=True)
+
+    def time_load_warm(self, advanced_spec):
+        """Load settings from the compiled bundles."""
+        Settings(advanced_qc_spec_name=advanced_spec)
+
+    def time_load_cold(self, advanced_spec):
+        """Load settings from the json, yaml and xlsx sources."""
+        for path in os.listdir(self.cache_folder):
+            os.remove(os.path.join(self.cache_folder, path))
+        Settings(advanced_qc_spec_name=advanced_spec)
+
+
+class RoutineSettingsSuite:
+    """Settings.update_routine_settings for every profile (advanced QC)."""
+
+    def setup(self):
+        """Set up settings."""
+        self.settings = Settings(advanced_qc_spec_name=SPEC_NAME)
+
+    def time_update_routine_settings(self):
+        """Resolve the routine settings of one profile position and month."""
+        self.settings.update_routine_settings(
+            latitude=57.3, longitude=20.0, month=6)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Seeded synthetic CTD profiles for benchmarks.
+
+Profiles look like a downcast in the Baltic Sea / Kattegat: a mixed surface
+layer above a thermocline / halocline and oxygen depletion at depth. Every
+profile gets injected errors that the QC routines should catch:
+    - spikes in the sensor parameters (qc_spike),
+    - density and pressure inversions (qc_increase),
+    - out-of-range values (qc_range),
+    - drift of the secondary sensors (qc_diff).
+Data are given as strings, the way ctdpy reads standard format files, with
+empty Q-fields and Q0-fields in the default '00000' format.
+"""
+import numpy as np
+import pandas as pd
+
+NUMBER_OF_ROUTINES = 5
+
+# Positions within the basins of etc/resources/shp/basins.shp
+POSITIONS = (
+    (56.5, 12.0),
+    (55.25, 15.98),
+    (57.3, 20.0),
+    (58.9, 20.3),
+    (63.5, 20.5),
+    (54.9, 13.5),
+)
+
+UNITS = {
+    'PRES_CTD': 'dbar',
+    'DEPH': 'm',
+    'TEMP_CTD': 'deg C',
+    'TEMP2_CTD': 'deg C',
+    'SALT_CTD': 'psu',
+    'SALT2_CTD': 'psu',
+    'CNDC_CTD': 'S/m',
+    'CNDC2_CTD': 'S/m',
+    'DOXY_CTD': 'ml/l',
+    'DOXY2_CTD': 'ml/l',
+    'DENS_CTD': 'kg/m3',
+    'SIGMA_THETA_CTD': 'kg/m3',
+    'PAR_CTD': 'uE/(cm2*sec)',
+}
+
+# Parameters that get spikes and out-of-range values
+SENSOR_PARAMETERS = ('TEMP_CTD', 'TEMP2_CTD', 'SALT_CTD', 'SALT2_CTD',
+                     'CNDC_CTD', 'CNDC2_CTD', 'DOXY_CTD', 'DOXY2_CTD')
+
+OUT_OF_RANGE_VALUES = {
+    'TEMP_CTD': 35., 'TEMP2_CTD': -5., 'SALT_CTD': 45., 'SALT2_CTD': -1.,
+    'CNDC_CTD': 9., 'CNDC2_CTD': -1., 'DOXY_CTD': 15., 'DOXY2_CTD': -2.,
+}
+
+
+def _get_values(rng, n_rows, month):
+    """Return dictionary of physically consistent float arrays."""
+    max_pres = rng.uniform(20, 250)
+    pres = np.linspace(0.5, max_pres, n_rows)
+    # Noise below the pressure step, so that only injected inversions fail
+    pres += rng.normal(0, min(0.01, 0.1 * max_pres / n_rows), n_rows)
+    depth = pres * 0.992
+
+    season = np.cos((month - 8) / 12 * 2 * np.pi)
+    mixed_layer = rng.uniform(10, 30)
+    cline = 0.5 * (1 + np.tanh((depth - mixed_layer) / 5))
+    temp = 4 + 8 * (season + 1) * (1 - cline) + rng.normal(0, 0.02, n_rows)
+
+    halocline = rng.uniform(40, 70)
+    salt_surface = rng.uniform(6, 20)
+    salt = salt_surface + rng.uniform(3, 12) * 0.5 * (
+        1 + np.tanh((depth - halocline) / 8)) + rng.normal(0, 0.01, n_rows)
+
+    cndc = salt / 35 * 4.29 * (1 + 0.0191 * (temp - 15)) + rng.normal(
+        0, 0.001, n_rows)
+    sigma = 0.78 * salt - 0.06 * (temp - 10) - 0.0045 * (temp - 10) ** 2
+    dens = 1000 + sigma + 0.0045 * pres
+    doxy = 8.5 - 7 * 0.5 * (1 + np.tanh((depth - halocline - 10) / 10))
+    doxy += rng.normal(0, 0.05, n_rows)
+    par = 1500 * np.exp(-depth / rng.uniform(3, 8)) + np.abs(
+        rng.normal(0, 0.1, n_rows))
+
+    return {
+        'PRES_CTD': pres,
+        'DEPH': depth,
+        'TEMP_CTD': temp,
+        'TEMP2_CTD': temp + rng.normal(0.002, 0.01, n_rows),
+        'SALT_CTD': salt,
+        'SALT2_CTD': salt + rng.normal(0.002, 0.01, n_rows),
+        'CNDC_CTD': cndc,
+        'CNDC2_CTD': cndc + rng.normal(0.0002, 0.001, n_rows),
+        'DOXY_CTD': doxy,
+        'DOXY2_CTD': doxy + rng.normal(0.01, 0.05, n_rows),
+        'DENS_CTD': dens,
+        'SIGMA_THETA_CTD': sigma,
+        'PAR_CTD': par,
+    }
+
+
+def _inject_errors(rng, values, error_rate):
+    """Inject errors in place and return the rows of each kind of error."""
+    n_rows = len(values['PRES_CTD'])
+    n_errors = max(1, int(n_rows * error_rate))
+    injected = {}
+
+    rows = rng.choice(n_rows, size=n_errors, replace=False)
+    for i, row in enumerate(rows):
+        para = SENSOR_PARAMETERS[i % len(SENSOR_PARAMETERS)]
+        values[para][row] += rng.choice((-1, 1)) * rng.uniform(1, 5)
+    injected['spike'] = np.sort(rows)
+
+    rows = rng.choice(n_rows, size=n_errors, replace=False)
+    values['SIGMA_THETA_CTD'][rows] -= rng.uniform(0.5, 2, n_errors)
+    values['DENS_CTD'][rows] -= rng.uniform(0.5, 2, n_errors)
+    values['PRES_CTD'][rows[:max(1, n_errors // 4)]] -= 2.
+    injected['inversion'] = np.sort(rows)
+
+    rows = rng.choice(n_rows, size=n_errors, replace=False)
+    for i, row in enumerate(rows):
+        para = SENSOR_PARAMETERS[i % len(SENSOR_PARAMETERS)]
+        values[para][row] = OUT_OF_RANGE_VALUES[para]
+    injected['out_of_range'] = np.sort(rows)
+
+    start = rng.integers(0, max(1, n_rows - n_errors))
+    values['DOXY2_CTD'][start:start + n_errors] += 1.5
+    injected['drift'] = np.arange(start, min(start + n_errors, n_rows))
+    return injected
+
+
+def make_profile(seed=0, n_rows=1000, error_rate=0.01, as_str=True,
+                 position=None, month=None, year=2021):
+    """Return one synthetic profile as a data item.
+
+    Args:
+        seed (int): Seed of the random generator.
+        n_rows (int): Number of rows (scans / depth bins).
+        error_rate (float): Fraction of rows that get each kind of error.
+        as_str (bool): Return data as strings (as read by ctdpy), otherwise
+                       as floats.
+        position (tuple): (latitude, longitude). Defaults to one of
+                          POSITIONS.
+        month (int): Month of the profile, 1-12.
+        year (int): Year of the profile.
+
+    Returns:
+        {'data': pd.DataFrame, 'metadata': pd.Series,
+         'injected': {kind of error: rows}}
+    """
+    rng = np.random.default_rng(seed)
+    month = month or int(rng.integers(1, 13))
+    position = position or POSITIONS[seed % len(POSITIONS)]
+    values = _get_values(rng, n_rows, month)
+    injected = _inject_errors(rng, values, error_rate)
+
+    data = {}
+    for para, array in values.items():
+        key = f'{para} [{UNITS[para]}]'
+        if as_str:
+            data[key] = np.char.mod('%.4f', array).astype(object)
+        else:
+            data[key] = array
+        data[f'Q_{para}'] = ''
+        data[f'Q0_{para}'] = '0' * NUMBER_OF_ROUTINES
+
+    df = pd.DataFrame(data, index=pd.RangeIndex(n_rows))
+    df['YEAR'] = str(year)
+    df['MONTH'] = str(month)
+    df['STATION'] = f'ST{seed:05d}'
+    df['LATITUDE_DD'] = str(position[0])
+    df['LONGITUDE_DD'] = str(position[1])
+
+    metadata = pd.Series([
+        f'//METADATA;SERNO;{seed:04d}',
+        f'//METADATA;YEAR;{year}',
+    ])
+    return {'data': df, 'metadata': metadata, 'injected': injected}
+
+
+def make_datasets(n_profiles=10, n_rows=1000, seed=0, **kwargs):
+    """Return {name: data item} of synthetic profiles.
+
+    Names follow the serie format MYEAR_SHIPC_SERNO. Keyword arguments are
+    passed on to make_profile.
+    """
+    year = kwargs.get('year', 2021)
+    return {
+        f'{year}_77SE_{i:04d}': make_profile(seed=seed + i, n_rows=n_rows,
+                                             **kwargs)
+        for i in range(n_profiles)
+    }
+
+
+def get_parameter_mapping(df):
+    """Return parameter mapping of the data.
+
+    Eg. {'TEMP_CTD': 'TEMP_CTD [deg C]'}
+    """
+    return {key.split(' ')[0]: key for key in df.columns if ' [' in key}
@@ -6,13 +6,26 @@ Created on 2022-01-04 15:11
 
 @author: johannes
 """
-from pkg_resources import get_distribution, DistributionNotFound
-try:
-    __version__ = get_distribution(__name__).version
-except DistributionNotFound:
-    # package is not installed
-    pass
-
-from profileqc import routines  # noqa: F401
+import importlib
 
 name = "profileqc"
+
+
+def __getattr__(attr):
+    """Resolve __version__ and the routines package on first access.
+
+    Keeps "import profileqc" free from pkg_resources / importlib.metadata
+    and the routine modules.
+    """
+    if attr == '__version__':
+        from importlib.metadata import version, PackageNotFoundError
+        try:
+            value = version(name)
+        except PackageNotFoundError:
+            # package is not installed
+            raise AttributeError(attr) from None
+        globals()[attr] = value
+        return value
+    if attr == 'routines':
+        return importlib.import_module('profileqc.routines')
+    raise AttributeError(f'module {__name__!r} has no attribute {attr!r}')
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Apache Arrow (and Polars) backend of SessionQC.
+
+Requires pyarrow, Polars frames are handled through their Arrow
+representation.
+"""
+import numpy as np
+import pandas as pd
+from profileqc.flag_handler import FlagMatrix, FLAGS, FLAG_CODES
+from profileqc.qc import SessionQC
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError as e:
+    raise ImportError(
+        'pyarrow is needed for Arrow and Polars data, install it with '
+        '"pip install profileqc[arrow]"') from e
+
+# Byte --> flag code and flag code --> byte of the Q0-strings
+_CODE_OF_BYTE = np.zeros(256, dtype=np.uint8)
+for _flag, _code in FLAG_CODES.items():
+    _CODE_OF_BYTE[ord(_flag)] = _code
+_BYTE_OF_CODE = np.frombuffer(''.join(FLAGS).encode('ascii'), dtype=np.uint8)
+
+
+def to_arrow_table(data):
+    """Return data as pa.Table.
+
+    Polars frames are converted with to_arrow, which shares the buffers.
+
+    Args:
+        data (pa.Table | pa.RecordBatch | polars.DataFrame): Data.
+    """
+    if isinstance(data, pa.Table):
+        return data
+    if isinstance(data, pa.RecordBatch):
+        return pa.Table.from_batches([data])
+    if _is_polars(data):
+        return data.to_arrow()
+    raise TypeError(f'Can not handle data of type {type(data)}')
+
+
+def from_arrow_table(table, like):
+    """Return table as the type of like, see to_arrow_table."""
+    if _is_polars(like):
+        import polars
+        return polars.from_arrow(table)
+    if isinstance(like, pa.RecordBatch):
+        return table.combine_chunks().to_batches()[0]
+    return table
+
+
+def _is_polars(data):
+    return type(data).__module__.split('.')[0] == 'polars'
+
+
+def get_float_array(column):
+    """Return an Arrow column as float64 numpy array, NaN for missing.
+
+    A float64 column in one chunk without nulls is returned as a view of
+    the Arrow buffer. Other numerical columns are cast, string columns are
+    parsed (empty strings are NaN).
+    """
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks() if column.num_chunks != 1 else \
+            column.chunk(0)
+    if pa.types.is_string(column.type) or pa.types.is_large_string(
+            column.type) or pa.types.is_string_view(column.type):
+        column = pc.if_else(pc.equal(column, ''), None, column)
+    if column.type != pa.float64():
+        column = column.cast(pa.float64())
+    if column.null_count:
+        column = column.fill_null(np.nan)
+    return column.to_numpy(zero_copy_only=False)
+
+
+def get_flag_codes_of_strings(column, number_of_routines):
+    """Return codes (n_rows, number_of_routines) of an Arrow Q0-column.
+
+    If all strings have the length number_of_routines, the codes are looked
+    up straight from the bytes of the Arrow data buffer. Otherwise the
+    strings are truncated / padded as in FlagMatrix.from_frame.
+    """
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    n_rows = len(column)
+    large = pa.types.is_large_string(column.type)
+    if not column.null_count and (pa.types.is_string(column.type) or large):
+        _, offsets, data = column.buffers()
+        offset_type = np.int64 if large else np.int32
+        offsets = np.frombuffer(offsets, dtype=offset_type)[
+            column.offset:column.offset + n_rows + 1]
+        if (np.diff(offsets) == number_of_routines).all():
+            chars = np.frombuffer(data, dtype=np.uint8)[
+                offsets[0]:offsets[-1]]
+            return _CODE_OF_BYTE[chars].reshape(n_rows, number_of_routines)
+    values = column.to_numpy(zero_copy_only=False)
+    values = np.where(pd.isna(values), '', values)
+    return FlagMatrix._parse_strings(values, number_of_routines)
+
+
+def get_flag_string_array(codes):
+    """Return pa.StringArray of Q0-strings of a code array.
+
+    codes has the shape (n_rows, number_of_routines). No Python strings are
+    created.
+    """
+    n_rows, width = codes.shape
+    chars = np.ascontiguousarray(_BYTE_OF_CODE[codes])
+    offsets = np.arange(0, (n_rows + 1) * width, width, dtype=np.int32)
+    return pa.Array.from_buffers(
+        pa.string(), n_rows,
+        [None, pa.py_buffer(offsets), pa.py_buffer(chars)]
+    )
+
+
+class ArrowSessionQC(SessionQC):
+    """Run ProfileQC on Arrow tables or Polars frames.
+
+    The data item is {'data': pa.Table | polars.DataFrame, 'metadata':
+    pd.Series}. The routines read the float64 buffers of the table without
+    a copy (see get_float_array), and the Q0- and Q-fields are returned as
+    new Arrow arrays: after run, data_item['data'] is a new table (or
+    Polars frame) with the flag columns replaced, the input is not
+    changed. Columns are never converted to pandas object columns.
+
+    Example:
+        session = ArrowSessionQC(advanced_settings_name='smhi_expedition')
+        item = session.run_profile({'data': table, 'metadata': metadata},
+                                   parameter_mapping=mapping)
+        table = item['data']
+    """
+
+    def __init__(self, data_item=None, parameter_mapping=None, routines=None,
+                 routine_settings=None, routine_path=None, dataset_name=None,
+                 advanced_settings_name=None):
+        """Initiate."""
+        self.data_item = None
+        self.table = None
+        super().__init__(None, parameter_mapping=parameter_mapping,
+                         routines=routines, routine_settings=routine_settings,
+                         routine_path=routine_path, dataset_name=dataset_name,
+                         advanced_settings_name=advanced_settings_name)
+        if data_item is not None:
+            self.update_data(data_item, parameter_mapping=parameter_mapping,
+                             dataset_name=dataset_name)
+
+    def update_data(self, data_item, parameter_mapping=None,
+                    dataset_name=None):
+        """Update data.
+
+        self.df is a pandas view of the table with Arrow backed columns
+        (pd.ArrowDtype), used for the column layout and metadata lookups.
+        """
+        self.dataset_name = dataset_name
+        self.parameter_mapping = parameter_mapping
+        self.data_item = data_item
+        self.table = to_arrow_table(data_item.get('data'))
+        self.df = self.table.to_pandas(types_mapper=pd.ArrowDtype)
+        self.meta = data_item.get('metadata')
+
+    def run(self):
+        """Run QC routines and set the new table to data_item['data']."""
+        like = self.data_item.get('data')
+        super().run()
+        self.data_item['data'] = from_arrow_table(self.table, like)
+
+    def set_working_frame(self, columns):
+        """Set the float working frame on the buffers of the table."""
+        columns = self.get_working_columns(columns)
+        self.working = pd.DataFrame(
+            {key: get_float_array(self.table.column(key)) for key in columns},
+            index=pd.RangeIndex(self.table.num_rows), columns=columns,
+            copy=False
+        )
+
+    def data_available(self, item):
+        """Check if the parameter(s) have any data.
+
+        As for pandas: any non-empty string, or any non-zero number.
+        """
+        if item.get('parameter'):
+            if self._has_data(item.get('parameter')):
+                return True
+
+        if item.get('parameters'):
+            if all(self._has_data(p) for p in item.get('parameters')):
+                return True
+
+    def _has_data(self, key):
+        column = self.table.column(key)
+        if pa.types.is_floating(column.type):
+            column = pc.if_else(pc.is_nan(column), None, column)
+        if pa.types.is_string(column.type) or pa.types.is_large_string(
+                column.type) or pa.types.is_string_view(column.type):
+            return bool(pc.any(pc.not_equal(column, '')).as_py())
+        if pa.types.is_boolean(column.type):
+            return bool(pc.any(column).as_py())
+        if pa.types.is_integer(column.type) or pa.types.is_floating(
+                column.type):
+            return bool(pc.any(pc.not_equal(column, 0)).as_py())
+        return bool(pc.any(pc.is_valid(column)).as_py())
+
+    def _open_up_flag_fields(self):
+        """Open up the Q0-fields of the table into self.flags."""
+        q0_keys, reset_keys = self.get_flag_fields(self.df)
+        self._reset_flag_keys = reset_keys
+        n_routines = self.settings.number_of_routines
+        self.flags = FlagMatrix(q0_keys, self.table.num_rows, n_routines)
+        for key, i in self.flags.column_index.items():
+            if key not in reset_keys:
+                self.flags.codes[:, i, :] = get_flag_codes_of_strings(
+                    self.table.column(key), n_routines)
+
+    def _close_flag_fields(self):
+        """Set the flagged (and reset) Q0-fields as new Arrow arrays."""
+        touched = set(self.flags.touched_columns)
+        for q_key, i in self.flags.column_index.items():
+            if q_key in touched or q_key in self._reset_flag_keys:
+                self._set_column(
+                    q_key, get_flag_string_array(self.flags.codes[:, i, :]))
+
+    def synchronize_flag_fields(self):
+        """Sync auto-flags with primary-flag.
+
+        See SessionQC.synchronize_flag_fields.
+        """
+        max_codes = self.flags.get_max_codes()
+        for q0_key, i in self.flags.column_index.items():
+            q_key = q0_key.replace('Q0_', 'Q_')
+            suspicious = max_codes[:, i] == FLAG_CODES['S']
+            bad = max_codes[:, i] == FLAG_CODES['B']
+            if not (suspicious.any() or bad.any()):
+                continue
+            if q_key in self.table.column_names:
+                column = self.table.column(q_key).cast(pa.string())
+            else:
+                column = pa.nulls(self.table.num_rows, type=pa.string())
+            column = pc.if_else(suspicious, 'S', column)
+            column = pc.if_else(bad, 'B', column)
+            self._set_column(q_key, column)
+
+    def _set_column(self, key, values):
+        """Replace or append a column of self.table."""
+        if key in self.table.column_names:
+            self.table = self.table.set_column(
+                self.table.column_names.index(key), key, values)
+        else:
+            self.table = self.table.append_column(key, values)
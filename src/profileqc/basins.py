@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Basin of a position, from the polygons of basins.shp."""
+import logging
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+from profileqc import utils
+
+logger = logging.getLogger(__file__)
+
+DEFAULT_BASIN_SHP_PATH = utils.get_base_folder().joinpath(
+    'etc', 'resources', 'shp', 'basins.shp')
+
+
+class BasinLocator:
+    """Resolve basin area names of positions.
+
+    The basin polygons are prepared and indexed in a STRtree, so that
+    thousands of positions can be resolved in one call. If a position lies
+    within more than one basin, the first basin of the shapefile is used.
+    Positions outside every basin get the fallback value.
+
+    geopandas and shapely are imported when the first locator is created,
+    not when profileqc is imported.
+    """
+
+    def __init__(self, basin_shp_path=None, area_column='AREA_NAME',
+                 fallback=None):
+        """Initiate.
+
+        Args:
+            basin_shp_path (str | Path): Path to basins.shp.
+            area_column (str): Column with the area names.
+            fallback: Area name given to positions outside every basin.
+        """
+        import geopandas as gp
+        import shapely
+        self.basin_gf = gp.read_file(basin_shp_path or DEFAULT_BASIN_SHP_PATH)
+        self.area_names = self.basin_gf[area_column].to_numpy(dtype=object)
+        self.fallback = fallback
+        geometries = self.basin_gf.geometry.to_numpy()
+        shapely.prepare(geometries)
+        self.tree = shapely.STRtree(geometries)
+
+    def locate_index(self, lats, lons):
+        """Return index of the basin of each position, -1 if outside."""
+        import shapely
+        lats = np.asarray(lats, dtype=float).ravel()
+        lons = np.asarray(lons, dtype=float).ravel()
+        points = shapely.points(lons, lats)
+        point_index, basin_index = self.tree.query(points, predicate='within')
+
+        index = np.full(len(points), len(self.area_names), dtype=np.int64)
+        np.minimum.at(index, point_index, basin_index)
+        index[index == len(self.area_names)] = -1
+        return index
+
+    def locate(self, lats, lons):
+        """Return area name of each position as a numpy object array.
+
+        Args:
+            lats (array like): Latitudes in decimal degrees.
+            lons (array like): Longitudes in decimal degrees.
+        """
+        index = self.locate_index(lats, lons)
+        areas = np.full(len(index), self.fallback, dtype=object)
+        inside = index >= 0
+        areas[inside] = self.area_names[index[inside]]
+        if not inside.all():
+            logger.warning(
+                f'{(~inside).sum()} position(s) outside of all basins, '
+                f'using area: {self.fallback}'
+            )
+        return areas
+
+    def get_area(self, lat, lon):
+        """Return area name of one position."""
+        return self.locate([lat], [lon])[0]
+
+
+@lru_cache
+def get_basin_locator(basin_shp_path=None):
+    """Return the shared BasinLocator of the given shapefile.
+
+    Loaded only once per shapefile.
+    """
+    path = Path(basin_shp_path or DEFAULT_BASIN_SHP_PATH).resolve()
+    return _get_basin_locator(path)
+
+
+@lru_cache
+def _get_basin_locator(path):
+    return BasinLocator(path)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""QC of many profiles stacked in one frame (BatchSessionQC)."""
+import copy
+import numpy as np
+import pandas as pd
+from profileqc.flag_handler import FlagPropagation, get_flag_codes
+from profileqc.instrumentation import Probe
+from profileqc.qc import SessionQC
+from profileqc.utils import get_time_as_format
+
+# Dataset settings that are allowed to differ between the profiles of one
+# batch run. These are expanded to one value per row, all other settings
+# must be equal for the profiles that are processed together.
+ROW_WISE_SETTINGS = (
+    'min_range_value',
+    'max_range_value',
+    'acceptable_error',
+    'acceptable_stddev_factor',
+    'min_stddev_value',
+)
+
+
+class RaggedProfiles:
+    """Many profiles held as one CF contiguous ragged array.
+
+    The data of all profiles are concatenated into one DataFrame and
+    row_size holds the number of rows of each profile (the CF
+    "sample_dimension" count variable). Profile i is found in the rows
+    offsets[i]:offsets[i + 1].
+    """
+
+    def __init__(self, data, row_size=None, offsets=None, names=None,
+                 metadata=None):
+        """Initiate.
+
+        Args:
+            data (pd.DataFrame): Concatenated data of all profiles.
+            row_size (array like): Number of rows of each profile.
+            offsets (array like): Start row of each profile followed by the
+                                  total number of rows. Used if row_size is
+                                  not given.
+            names (list): Name of each profile (serie / dataset name).
+            metadata (list): pd.Series of metadata for each profile.
+        """
+        if row_size is None:
+            if offsets is None:
+                raise ValueError('Either row_size or offsets must be given')
+            row_size = np.diff(offsets)
+        self.data = data.reset_index(drop=True)
+        self.row_size = np.asarray(row_size, dtype=np.int64)
+        if self.row_size.sum() != len(self.data):
+            raise ValueError(
+                f'Sum of row_size ({self.row_size.sum()}) does not match '
+                f'the number of rows of data ({len(self.data)})'
+            )
+        if (self.row_size < 1).any():
+            raise ValueError('Every profile must hold at least one row')
+
+        self.offsets = np.concatenate(([0], np.cumsum(self.row_size)))
+        self.segment_ids = np.repeat(np.arange(len(self.row_size)),
+                                     self.row_size)
+        self.names = list(names) if names is not None else [
+            str(i) for i in range(len(self))]
+        self.metadata = list(metadata) if metadata is not None else [
+            None] * len(self)
+
+    @classmethod
+    def from_datasets(cls, datasets):
+        """Return RaggedProfiles from a dictionary of data items.
+
+        Args:
+            datasets (dict): {name: {'data': pd.DataFrame,
+                                     'metadata': pd.Series}}
+                             eg. datasets[0] as read by ctdpy.
+        """
+        names = list(datasets)
+        frames = [datasets[name]['data'] for name in names]
+        return cls(
+            pd.concat(frames, ignore_index=True),
+            row_size=[len(df) for df in frames],
+            names=names,
+            metadata=[datasets[name].get('metadata') for name in names]
+        )
+
+    def __len__(self):
+        """Return number of profiles."""
+        return len(self.row_size)
+
+    @property
+    def first_rows(self):
+        """Return the index of the first row of each profile."""
+        return self.offsets[:-1]
+
+    def get_rows(self, index):
+        """Return the slice of rows of profile number index."""
+        return slice(self.offsets[index], self.offsets[index + 1])
+
+    def segment_any(self, boolean):
+        """Return for each profile if any of its rows is True."""
+        counts = np.concatenate(([0], np.cumsum(boolean, dtype=np.int64)))
+        return counts[self.offsets[1:]] > counts[self.offsets[:-1]]
+
+    def repeat(self, profile_values):
+        """Return one value per row from one value per profile."""
+        return np.repeat(profile_values, self.row_size)
+
+    def split(self):
+        """Return the profiles as a dictionary of data items.
+
+        {name: {'data': pd.DataFrame, 'metadata': pd.Series}}
+        """
+        return {
+            name: {
+                'data': self.data.iloc[self.get_rows(i)].reset_index(
+                    drop=True),
+                'metadata': self.metadata[i]
+            } for i, name in enumerate(self.names)
+        }
+
+
+class BatchSessionQC(SessionQC):
+    """Run ProfileQC on many profiles at once.
+
+    The profiles are given as one RaggedProfiles object. Every routine runs
+    once over the concatenated data with segment-aware kernels, so that
+    rolling windows and diffs never cross profile boundaries. Flags are
+    written to the Q0 / Q-fields of each profile and the QC log is kept per
+    profile name, exactly as if SessionQC had been run profile by profile.
+
+    Example:
+        profiles = RaggedProfiles.from_datasets(datasets[0])
+        qc_run = BatchSessionQC(profiles,
+                                parameter_mapping=parameter_mapping,
+                                advanced_settings_name='smhi_expedition')
+        qc_run.update_routines()
+        qc_run.run()
+        datasets[0] = qc_run.profiles.split()
+    """
+
+    def __init__(self, profiles, parameter_mapping=None, routines=None,
+                 routine_settings=None, routine_path=None,
+                 advanced_settings_name=None):
+        """Initiate."""
+        super().__init__(None, parameter_mapping=parameter_mapping,
+                         routines=routines, routine_settings=routine_settings,
+                         routine_path=routine_path,
+                         advanced_settings_name=advanced_settings_name)
+        self.update_data(profiles, parameter_mapping=parameter_mapping)
+
+    def update_data(self, profiles, parameter_mapping=None,
+                    dataset_name=None):
+        """Update data."""
+        self.profiles = profiles
+        self.parameter_mapping = parameter_mapping or {}
+        self.dataset_name = dataset_name
+        self.df = profiles.data
+        self.meta = None
+        self._profile_settings = None
+        self._settings_index = None
+
+    def update_routines(self):
+        """Resolve the routine settings of every profile.
+
+        Without an advanced QC specification all profiles share the same
+        settings. Otherwise the settings are resolved once per unique
+        (area, month) among the profiles.
+        """
+        qc_routines = list(self.settings.qc_routines)
+        if not self.settings.advanced_spec:
+            self._profile_settings = [self._get_settings_snapshot(qc_routines)]
+            self._settings_index = np.zeros(len(self.profiles), dtype=int)
+            return
+
+        first_rows = self.profiles.first_rows
+        latitudes = self.df['LATITUDE_DD'].to_numpy()[first_rows]
+        longitudes = self.df['LONGITUDE_DD'].to_numpy()[first_rows]
+        months = self.df['MONTH'].to_numpy()[first_rows]
+
+        areas = self.settings.advanced_spec.get_areas(latitudes, longitudes)
+
+        keys = {}
+        self._profile_settings = []
+        self._settings_index = np.zeros(len(self.profiles), dtype=int)
+        for i, (area, lat, lon, month) in enumerate(
+                zip(areas, latitudes, longitudes, months)):
+            key = (area, str(int(month)))
+            if key not in keys:
+                self.settings.update_routine_settings(
+                    latitude=lat, longitude=lon, month=month)
+                keys[key] = len(self._profile_settings)
+                self._profile_settings.append(
+                    self._get_settings_snapshot(qc_routines))
+            self._settings_index[i] = keys[key]
+
+    def _get_settings_snapshot(self, qc_routines):
+        """Return a copy of the current dataset settings of all routines."""
+        return {
+            routine: copy.deepcopy(
+                getattr(self.settings, routine)['datasets'])
+            for routine in qc_routines
+        }
+
+    def run(self):
+        """Run QC routines on all profiles."""
+        if self._profile_settings is None:
+            self.update_routines()
+
+        run_probe = Probe(trace_memory=False) if self.hooks else None
+        self._run_phase('open', self._open_up_flag_fields)
+
+        runs = []
+        columns = []
+        for qc_routine, qc_index in self.settings.qc_routines.items():
+            qc_setting = getattr(self.settings, qc_routine)
+
+            for key, base_item in qc_setting['datasets'].items():
+                # Check if parameters exists
+                item = self.resolve_parameters(base_item)
+                if item is None:
+                    continue
+                runs.append((qc_setting, qc_routine, qc_index, key, item))
+                columns.extend(
+                    [item['parameter']] if item.get('parameter')
+                    else item['parameters'])
+
+        self.set_working_frame(columns)
+
+        # Flags of each run, propagated to the Q0-fields after all runs
+        self._source_codes = np.zeros((len(self.df), len(runs)),
+                                      dtype=np.uint8)
+        active = np.zeros(len(runs), dtype=bool)
+        for i, (qc_setting, qc_routine, qc_index, key, item) in enumerate(
+                runs):
+            # Check which profiles have data
+            profile_boolean = self.profiles_with_data(item)
+            if not profile_boolean.any():
+                continue
+
+            active[i] = True
+            for group_item, group_boolean in self._get_setting_groups(
+                    qc_routine, key, item, profile_boolean):
+                self._run_group(qc_setting, qc_routine, qc_index,
+                                group_item, group_boolean, dataset=key,
+                                source=i)
+
+        self.flags.propagate(
+            self._source_codes,
+            FlagPropagation(self.flags.columns, [
+                (run[4].get('q_parameters'), run[2]) for run in runs]),
+            active
+        )
+        self._source_codes = None
+
+        self._run_phase('close', self._close_flag_fields)
+        self._run_phase('sync', self.synchronize_flag_fields)
+        self.append_qc_comment()
+        if run_probe is not None:
+            self._emit(run_probe.event('run', self.dataset_name,
+                                       rows=len(self.df)))
+
+    def _run_group(self, qc_setting, qc_routine, qc_index, item,
+                   profile_boolean, dataset=None, source=None):
+        """Run one routine on the profiles that share the same settings.
+
+        Flags are stored in column source of the source codes of the run, or
+        merged directly if source is None.
+        """
+        probe = Probe() if self.hooks else None
+        rows = self.profiles.repeat(profile_boolean)
+
+        # Get QC routine and run it on all rows
+        qc_func = self.initialize_qc_object(qc_setting, qc_routine, item)
+        qc_func()
+
+        # Only flag the rows of the profiles in this group
+        if source is None:
+            self.add_qflag(qc_func.flag_return, item.get('q_parameters'),
+                           qc_index, rows=rows)
+        else:
+            self._source_codes[rows, source] = get_flag_codes(
+                np.asarray(qc_func.flag_return)[rows])
+
+        flagged = np.asarray(qc_func.inverted_boolean) & rows
+        for i in np.flatnonzero(self.profiles.segment_any(flagged)):
+            profile_rows = self.profiles.get_rows(i)
+            self.log_flagged(qc_routine, qc_index, item, qc_func,
+                             flagged[profile_rows],
+                             serie=self.profiles.names[i],
+                             rows=profile_rows)
+
+        if probe is not None:
+            n_flagged = int(np.count_nonzero(flagged))
+            self._emit(probe.event(
+                'routine', self.dataset_name, routine=qc_routine,
+                dataset=dataset, rows=int(np.count_nonzero(rows)),
+                flagged={str(qc_func.q_flag): n_flagged} if n_flagged else {}
+            ))
+
+    def _get_setting_groups(self, qc_routine, key, item, profile_boolean):
+        """Yield (item, profile_boolean) for every group of equal settings.
+
+        Profiles are grouped by all settings but ROW_WISE_SETTINGS, which
+        are expanded to one value per row in the returned item.
+        """
+        groups = {}
+        for index, snapshot in enumerate(self._profile_settings):
+            profile_item = snapshot[qc_routine][key]
+            group_key = repr(sorted(
+                (k, v.item() if isinstance(v, np.generic) else v)
+                for k, v in profile_item.items()
+                if k not in ROW_WISE_SETTINGS
+                if k not in ('parameter', 'parameters')
+            ))
+            groups.setdefault(group_key, []).append(index)
+
+        for indices in groups.values():
+            boolean = profile_boolean & np.isin(self._settings_index,
+                                                indices)
+            if not boolean.any():
+                continue
+            group_item = dict(self._profile_settings[indices[0]][
+                qc_routine][key])
+            for k in ('parameter', 'parameters'):
+                if k in item:
+                    group_item[k] = item[k]
+            for k in ROW_WISE_SETTINGS:
+                if k not in group_item:
+                    continue
+                values = np.array([
+                    self._get_float(snapshot[qc_routine][key].get(k))
+                    for snapshot in self._profile_settings
+                ])
+                group_item[k] = self.profiles.repeat(
+                    values[self._settings_index])
+            group_item['segment_ids'] = self.profiles.segment_ids
+            yield group_item, boolean
+
+    @staticmethod
+    def _get_float(value):
+        """Return value as float, None as NaN."""
+        return np.nan if value is None else float(value)
+
+    def profiles_with_data(self, item):
+        """Return for each profile if the parameter(s) have any data."""
+        boolean = np.zeros(len(self.profiles), dtype=bool)
+        if item.get('parameter'):
+            boolean |= self.profiles.segment_any(
+                self._get_truthy(item.get('parameter')))
+
+        if item.get('parameters'):
+            boolean_all = np.ones(len(self.profiles), dtype=bool)
+            for p in item.get('parameters'):
+                boolean_all &= self.profiles.segment_any(self._get_truthy(p))
+            boolean |= boolean_all
+        return boolean
+
+    def _get_truthy(self, key):
+        """Return True for the rows with a value, as pd.Series.any()."""
+        serie = self.df[key]
+        values = serie.to_numpy(dtype=object).astype(bool)
+        return values & serie.notna().to_numpy()
+
+    def append_qc_comment(self):
+        """Append comment to the metadata series of every profile."""
+        time_stamp = get_time_as_format(now=True, fmt='%Y%m%d%H%M')
+        comnt = self.default_comnt.format(
+            self.settings.user, time_stamp, self.settings.repo_version
+        )
+        for meta in self.profiles.metadata:
+            if meta is not None:
+                meta[len(meta) + 1] = comnt
@@ -0,0 +1,455 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Binary profile container, read with np.memmap.
+
+A profile file (eg. 'cast_01.pqc') holds
+    preamble: MAGIC, two version bytes (major, minor), the header length as
+              a little-endian uint32 and the header, UTF-8 encoded JSON
+              padded with spaces to a multiple of ALIGNMENT bytes:
+        {
+            'n_rows': 1200,
+            'metadata': ['//METADATA;...', ...],
+            'columns': [
+                {'name': 'TEMP_CTD [°C]', 'dtype': '<f8', 'offset': 128,
+                 'has_data': true},
+                {'name': 'Q_TEMP_CTD', 'dtype': '<U1', 'offset': 9728,
+                 'has_data': false},
+                ...
+            ]
+        }
+    column blocks: n_rows values of each column, in the dtype of the
+                   header (as the data of a .npy file), starting at the
+                   offset of the column.
+
+Columns are listed in the order of the original data. Numerical columns
+are stored as float64 (empty values are NaN) back to back from the first
+aligned offset after the header, so that together they form one
+Fortran-ordered (n_rows, n_float_columns) array. Other columns, and all
+flag columns, are stored as fixed width unicode strings. has_data tells
+if the column holds any data in the original (see SessionQC.data_available)
+without reading the column.
+
+The Q0-flags of a profile file are held in a sidecar (eg.
+'cast_01.pqc.q0') with the same preamble, and the header
+    {'n_rows': 1200, 'number_of_routines': 5, 'offset': 128,
+     'columns': ['Q0_TEMP_CTD', ...]}
+followed by the uint8 flag codes (see profileqc.flag_handler) as a
+C-ordered (n_rows, n_q0_columns, number_of_routines) array. The sidecar is
+created from the Q0-strings of the profile file the first time the file
+is QC-ed, after that it is the source of the Q0-flags.
+"""
+import json
+import struct
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from profileqc.flag_handler import FlagMatrix, get_flag_strings
+from profileqc.qc import SessionQC
+from profileqc.utils import to_float_array
+
+MAGIC = b'\x93PROFILEQC'
+VERSION = (1, 0)
+ALIGNMENT = 64
+FLAG_SUFFIX = '.q0'
+
+
+def get_preamble(header):
+    """Return MAGIC, version and header as bytes.
+
+    The header is padded so that the length is a multiple of ALIGNMENT.
+    """
+    fixed = len(MAGIC) + 2 + 4
+    text = json.dumps(header).encode('utf-8')
+    size = _align(fixed + len(text) + 1)
+    text = text + b' ' * (size - fixed - len(text) - 1) + b'\n'
+    return MAGIC + bytes(VERSION) + struct.pack('<I', len(text)) + text
+
+
+def set_offsets(header, items):
+    """Return the preamble and shift the offsets of items to follow it.
+
+    The offsets are given relative to the start of the data, and are
+    shifted so that the data starts right after the preamble. The length
+    of the preamble depends on the offsets in the header.
+    """
+    start = 0
+    while True:
+        preamble = get_preamble(header)
+        if len(preamble) == start:
+            return preamble
+        for item in items:
+            item['offset'] += len(preamble) - start
+        start = len(preamble)
+
+
+def read_preamble(path):
+    """Return the header of a profile file or flag sidecar."""
+    with open(path, 'rb') as fd:
+        magic = fd.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a ProfileQC binary file')
+        major, _ = fd.read(2)
+        if major != VERSION[0]:
+            raise ValueError(
+                f'Unsupported version {major} of binary file {path}')
+        size, = struct.unpack('<I', fd.read(4))
+        return json.loads(fd.read(size).decode('utf-8'))
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class ProfileFile:
+    """One profile stored in the binary container, see the module doc.
+
+    Columns are read with np.memmap, ie. zero-copy and only the pages of
+    the columns that are actually used are read from disk. The object can
+    be given as data item to SessionQC.update_data, see get. Data is opened
+    copy-on-write: changes of the data are not written to the file. The
+    Q0-flags are written to the flag sidecar (see open_flags).
+
+    Example:
+        profile = ProfileFile.write('cast_01.pqc', data_item)
+        session = MappedSessionQC(profile, parameter_mapping=mapping)
+        session.run()
+    """
+
+    def __init__(self, path):
+        """Initiate.
+
+        Args:
+            path (str | Path): Profile file.
+        """
+        self.path = Path(path)
+        self.header = read_preamble(self.path)
+        self.n_rows = self.header['n_rows']
+        self.columns = {item['name']: item for item in self.header['columns']}
+        self.metadata = pd.Series(self.header.get('metadata', []),
+                                  dtype=object)
+        self._frame = None
+        self._values = None
+
+    @classmethod
+    def write(cls, path, data_item):
+        """Write data item to a profile file and return it opened.
+
+        Columns that can be parsed as float are stored as float64, flag
+        columns (Q...) and the others as strings. Note that numerical
+        values are not stored as formatted in the original, eg. '5.100'
+        is read back as 5.1.
+
+        Args:
+            path (str | Path): Profile file.
+            data_item (dict): {'data': pd.DataFrame, 'metadata': pd.Series}
+        """
+        df = data_item['data']
+        metadata = data_item.get('metadata')
+        float_blocks = {}
+        text_blocks = {}
+        for key in df:
+            values = None
+            if not key.startswith('Q'):
+                try:
+                    values = to_float_array(df[key]).astype('<f8', copy=False)
+                except (TypeError, ValueError):
+                    pass
+            if values is not None:
+                float_blocks[key] = values
+            else:
+                text = np.asarray(df[key].fillna('').astype(str).to_numpy(),
+                                  dtype=str)
+                text_blocks[key] = text.astype(
+                    f'<U{max(text.dtype.itemsize // 4, 1)}')
+
+        header = {
+            'n_rows': len(df),
+            'metadata': [] if metadata is None else [
+                str(line) for line in metadata],
+            'columns': [],
+        }
+        # Offsets relative to the start of the data, see set_offsets
+        offset = 0
+        for key, values in float_blocks.items():
+            header['columns'].append({'name': key, 'dtype': values.dtype.str,
+                                      'offset': offset})
+            offset += values.nbytes
+        for key, values in text_blocks.items():
+            offset = _align(offset)
+            header['columns'].append({'name': key, 'dtype': values.dtype.str,
+                                      'offset': offset})
+            offset += values.nbytes
+        for item in header['columns']:
+            item['has_data'] = bool(df[item['name']].any())
+        order = {key: i for i, key in enumerate(df.columns)}
+        header['columns'].sort(key=lambda item: order[item['name']])
+
+        preamble = set_offsets(header, header['columns'])
+        blocks = {**float_blocks, **text_blocks}
+        with open(path, 'wb') as fd:
+            fd.write(preamble)
+            for item in header['columns']:
+                fd.seek(item['offset'])
+                blocks[item['name']].tofile(fd)
+        return cls(path)
+
+    @property
+    def float_columns(self):
+        """Return the float64 columns, in the order of the file."""
+        return [key for key, item in sorted(self.columns.items(),
+                                            key=lambda i: i[1]['offset'])
+                if item['dtype'] == '<f8']
+
+    @property
+    def flag_path(self):
+        """Return path of the Q0-flag sidecar."""
+        return self.path.with_name(self.path.name + FLAG_SUFFIX)
+
+    def get_values(self):
+        """Return memmap of all float64 columns, see float_columns.
+
+        Shape (n_rows, n_float_columns), Fortran-ordered.
+        """
+        if self._values is None:
+            columns = self.float_columns
+            if not columns or not self.n_rows:
+                self._values = np.empty((self.n_rows, len(columns)),
+                                        dtype=np.float64)
+            else:
+                self._values = np.memmap(
+                    self.path, dtype='<f8', mode='c',
+                    offset=self.columns[columns[0]]['offset'],
+                    shape=(self.n_rows, len(columns)), order='F')
+        return self._values
+
+    def get_column(self, key):
+        """Return memmap of one column."""
+        item = self.columns[key]
+        if not self.n_rows:
+            return np.empty(0, dtype=item['dtype'])
+        return np.memmap(self.path, dtype=item['dtype'], mode='c',
+                         offset=item['offset'], shape=(self.n_rows,))
+
+    def has_data(self, key):
+        """Return True if the column holds any data."""
+        return self.columns[key]['has_data']
+
+    def get_frame(self, flag_fields=False):
+        """Return the data as pd.DataFrame.
+
+        Float columns are views of the memmap (see get_values). String
+        columns are read into memory.
+
+        Args:
+            flag_fields (bool): Include the Q0-fields. The Q0-strings are
+                                taken from the flag sidecar if it exists.
+        """
+        float_columns = self.float_columns
+        df = pd.DataFrame(self.get_values(), columns=float_columns,
+                          copy=False)
+        for key, item in self.columns.items():
+            if item['dtype'] == '<f8':
+                continue
+            if key.startswith('Q0_') and not flag_fields:
+                continue
+            df[key] = self.get_column(key).astype(object)
+        columns = [key for key in self.columns if key in df]
+
+        if flag_fields and self.flag_path.exists():
+            header = read_preamble(self.flag_path)
+            flags = self._get_flag_matrix(header, mode='r')
+            for key in flags.columns:
+                if key not in df:
+                    columns.append(key)
+                df[key] = flags.get_strings(key)
+        return df[columns]
+
+    def get(self, key, default=None):
+        """Return 'data' or 'metadata' as of a data item.
+
+        {'data': pd.DataFrame, 'metadata': pd.Series}. The data frame
+        holds no Q0-fields, those are held by the flag sidecar (see
+        open_flags).
+        """
+        if key == 'data':
+            if self._frame is None:
+                self._frame = self.get_frame()
+            return self._frame
+        if key == 'metadata':
+            return self.metadata
+        return default
+
+    def to_data_item(self):
+        """Return the QC-ed profile as data item, eg. for writing a text file.
+
+        {'data': pd.DataFrame, 'metadata': pd.Series}. The Q0-strings are
+        taken from the flag sidecar. The primary Q-fields (and other string
+        columns) are taken from the data frame of the data item, where
+        MappedSessionQC synchronizes them.
+        """
+        df = self.get_frame(flag_fields=True)
+        if self._frame is not None:
+            float_columns = set(self.float_columns)
+            for key in self._frame:
+                if key not in float_columns:
+                    df[key] = self._frame[key]
+        return {'data': df, 'metadata': self.metadata}
+
+    def open_flags(self, number_of_routines):
+        """Return FlagMatrix on the memmap of the flag sidecar.
+
+        Merges into the matrix are written to the sidecar. The sidecar is
+        created from the Q0-strings of the profile file if it does not
+        exist, and rebuilt if it has another number of routines.
+
+        Args:
+            number_of_routines (int): Length of the Q0-strings.
+        """
+        header = None
+        if self.flag_path.exists():
+            header = read_preamble(self.flag_path)
+            if header['n_rows'] != self.n_rows:
+                raise ValueError(
+                    f'Flag sidecar {self.flag_path} does not match '
+                    f'{self.path}')
+        if header is None or header['number_of_routines'] != \
+                number_of_routines:
+            self._create_flags(number_of_routines, header)
+            header = read_preamble(self.flag_path)
+        return self._get_flag_matrix(header, mode='r+')
+
+    def _get_flag_matrix(self, header, mode='r+'):
+        shape = (header['n_rows'], len(header['columns']),
+                 header['number_of_routines'])
+        if 0 in shape:
+            codes = np.zeros(shape, dtype=np.uint8)
+        else:
+            codes = np.memmap(self.flag_path, dtype=np.uint8, mode=mode,
+                              offset=header['offset'], shape=shape)
+        return FlagMatrix(header['columns'], self.n_rows,
+                          header['number_of_routines'], codes=codes)
+
+    def _create_flags(self, number_of_routines, old_header=None):
+        """Write the flag sidecar.
+
+        Codes of an existing sidecar are kept, as far as the number of
+        routines allows. Otherwise they are parsed from the Q0-strings of
+        the profile file (see SessionQC.get_flag_fields).
+        """
+        df = self.get_frame(flag_fields=True)
+        q0_keys, reset_keys = SessionQC.get_flag_fields(df)
+        if old_header is not None:
+            old = self._get_flag_matrix(old_header, mode='r')
+            flags = FlagMatrix(q0_keys, self.n_rows, number_of_routines)
+            n = min(number_of_routines, old.number_of_routines)
+            for key, i in old.column_index.items():
+                if key in flags:
+                    flags.codes[:, flags.column_index[key], :n] = \
+                        old.codes[:, i, :n]
+            del old
+        else:
+            flags = FlagMatrix.from_frame(df, q0_keys, number_of_routines,
+                                          reset_columns=reset_keys)
+
+        header = {
+            'n_rows': self.n_rows,
+            'number_of_routines': number_of_routines,
+            'offset': 0,
+            'columns': q0_keys,
+        }
+        preamble = set_offsets(header, [header])
+        with open(self.flag_path, 'wb') as fd:
+            fd.write(preamble)
+            flags.codes.tofile(fd)
+
+    def get_flag_strings(self, key):
+        """Return the Q0-strings of a Q0-field from the flag sidecar."""
+        header = read_preamble(self.flag_path)
+        flags = self._get_flag_matrix(header, mode='r')
+        return get_flag_strings(flags.codes[:, flags.column_index[key], :])
+
+
+class MappedSessionQC(SessionQC):
+    """Run ProfileQC on profiles stored as ProfileFile.
+
+    No text is parsed: the routines read the float64 columns of the
+    profile file straight from the memmap, and the Q0-flags are merged
+    into the memmap of the flag sidecar. Only the pages of the columns
+    used by the routines are read from disk. The primary Q-fields are
+    synchronized in memory, in the data frame of the ProfileFile.
+
+    Example:
+        session = MappedSessionQC(advanced_settings_name='smhi_expedition')
+        for path in Path('archive').glob('*.pqc'):
+            session.run_profile(ProfileFile(path),
+                                parameter_mapping=mapping,
+                                dataset_name=path.stem)
+    """
+
+    def __init__(self, data_item=None, parameter_mapping=None, routines=None,
+                 routine_settings=None, routine_path=None, dataset_name=None,
+                 advanced_settings_name=None):
+        """Initiate.
+
+        Args:
+            data_item (ProfileFile | str | Path): Profile to QC.
+        """
+        self.profile = None
+        super().__init__(None, parameter_mapping=parameter_mapping,
+                         routines=routines, routine_settings=routine_settings,
+                         routine_path=routine_path, dataset_name=dataset_name,
+                         advanced_settings_name=advanced_settings_name)
+        if data_item is not None:
+            self.update_data(data_item, parameter_mapping=parameter_mapping,
+                             dataset_name=dataset_name)
+
+    def update_data(self, data_item, parameter_mapping=None,
+                    dataset_name=None):
+        """Update data.
+
+        Args:
+            data_item (ProfileFile | str | Path): Profile to QC.
+        """
+        if not isinstance(data_item, ProfileFile):
+            data_item = ProfileFile(data_item)
+        self.profile = data_item
+        super().update_data(data_item, parameter_mapping=parameter_mapping,
+                            dataset_name=dataset_name)
+
+    def set_working_frame(self, columns):
+        """Set the float working frame as a view of the memmap.
+
+        The working frame holds all float64 columns of the profile file,
+        pages of columns that no routine reads are never read from disk.
+        If any of the columns is not stored as float64, the columns are
+        parsed as in SessionQC.set_working_frame.
+        """
+        float_columns = self.profile.float_columns
+        if set(self.get_working_columns(columns)).issubset(float_columns):
+            self.working = pd.DataFrame(self.profile.get_values(),
+                                        columns=float_columns,
+                                        index=self.df.index, copy=False)
+        else:
+            super().set_working_frame(columns)
+
+    def data_available(self, item):
+        """Check if the parameter(s) have any data (ProfileFile.has_data)."""
+        if item.get('parameter'):
+            if self.profile.has_data(item.get('parameter')):
+                return True
+
+        if item.get('parameters'):
+            if all(self.profile.has_data(p) for p in item.get('parameters')):
+                return True
+
+    def _open_up_flag_fields(self):
+        """Open up the Q0-flags of the flag sidecar."""
+        self._reset_flag_keys = {}
+        self.flags = self.profile.open_flags(self.settings.number_of_routines)
+
+    def _close_flag_fields(self):
+        """Write the Q0-flags to the flag sidecar."""
+        codes = self.flags.codes
+        if isinstance(codes, np.memmap):
+            codes.flush()
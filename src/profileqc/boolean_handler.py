@@ -12,6 +12,16 @@ import numpy as np
 class BooleanBaseDataFrame:
     """Base of pd.DataFrame boolean handling."""
 
+    @classmethod
+    def row_extent(cls, **settings):
+        """Return (rows before, rows after) that the result of a row needs.
+
+        Eg. (1, 0) if the value of a row is compared with the previous
+        value. Used when data are QC-ed in chunks (see
+        profileqc.streaming).
+        """
+        return 0, 0
+
     def __init__(self):
         """Initiate."""
         super().__init__()
@@ -138,6 +148,16 @@ class BooleanBaseDataFrame:
 class BooleanBaseSerie:
     """Base of pd.Series boolean handling."""
 
+    @classmethod
+    def row_extent(cls, **settings):
+        """Return (rows before, rows after) that the result of a row needs.
+
+        Eg. (1, 0) if the value of a row is compared with the previous
+        value. Used when data are QC-ed in chunks (see
+        profileqc.streaming).
+        """
+        return 0, 0
+
     def __init__(self):
         """Initiate."""
         super().__init__()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Compiled bundles of settings files in the cache folder."""
+import hashlib
+import logging
+import os
+import pickle
+from pathlib import Path
+from profileqc import utils
+
+logger = logging.getLogger(__file__)
+
+# Increase when the layout of the compiled content changes.
+BUNDLE_VERSION = 2
+
+
+def get_source_stamps(paths):
+    """Return {path: modification time in ns} of the given source files."""
+    return {str(path): Path(path).stat().st_mtime_ns for path in paths}
+
+
+def get_bundle_path(name, paths, cache_folder=None):
+    """Return path of the compiled bundle for the given source files.
+
+    The file name is keyed by the (sorted) source paths, so that different
+    sets of sources never share a bundle.
+    """
+    cache_folder = Path(cache_folder or utils.get_cache_folder())
+    key = '\n'.join(sorted(str(Path(p).resolve()) for p in paths))
+    digest = hashlib.sha1(key.encode('utf8')).hexdigest()[:16]
+    return cache_folder.joinpath(f'{name}-{digest}.pickle')
+
+
+def load_bundle(name, paths, build, cache_folder=None):
+    """Return content compiled from the source files.
+
+    The content is read from a pickled bundle in the cache folder as long
+    as none of the source files have changed (path and mtime). Otherwise
+    it is rebuilt with build(paths) and the bundle is rewritten.
+
+    Args:
+        name (str): Name of the bundle, eg. 'settings'.
+        paths (list): Source files.
+        build (callable): Function that returns the content of the given
+                          source files. Must return a picklable object.
+        cache_folder (str | Path): Folder of the bundle. Defaults to
+                                   utils.get_cache_folder().
+    """
+    paths = list(paths)
+    stamps = get_source_stamps(paths)
+    bundle_path = get_bundle_path(name, paths, cache_folder=cache_folder)
+
+    if bundle_path.exists():
+        try:
+            with open(bundle_path, 'rb') as fd:
+                bundle = pickle.load(fd)
+            if bundle.get('version') == BUNDLE_VERSION and \
+                    bundle.get('sources') == stamps:
+                return bundle['content']
+        except Exception as e:
+            logger.info(f'Could not load bundle {bundle_path}: {e}')
+
+    content = build(paths)
+    _write_bundle(bundle_path, {
+        'version': BUNDLE_VERSION,
+        'sources': stamps,
+        'content': content,
+    })
+    return content
+
+
+def _write_bundle(bundle_path, bundle):
+    """Write bundle atomically. Failure is logged, not raised."""
+    tmp_path = bundle_path.with_name(f'{bundle_path.name}.{os.getpid()}.tmp')
+    try:
+        bundle_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'wb') as fd:
+            pickle.dump(bundle, fd, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, bundle_path)
+    except Exception as e:
+        logger.info(f'Could not write bundle {bundle_path}: {e}')
+        if tmp_path.exists():
+            tmp_path.unlink()
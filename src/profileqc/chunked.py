@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""QC of very long series, one chunk of rows at a time."""
+import os
+import shutil
+from pathlib import Path
+import pandas as pd
+from profileqc.streaming import StreamingSessionQC
+
+METADATA_PREFIX = '//'
+
+
+class ChunkedQC:
+    """Run ProfileQC on very long series, one chunk of rows at a time.
+
+    Each chunk is QC-ed together with the halo of rows needed by the widest
+    rolling window and the continuity checks of the routines (see
+    StreamingSessionQC), so flags at chunk edges are exact and the result
+    equals SessionQC.run on the whole series. Memory use of the data is
+    bounded by the chunk size, not by the length of the series. Only the
+    flagged values for the QC log are collected until the end of the
+    series.
+
+    Example:
+        chunked = ChunkedQC(chunksize=200_000,
+                            advanced_settings_name='smhi_expedition')
+        chunked.run_file('mvp_tow.txt', 'mvp_tow_qc.txt')
+    """
+
+    def __init__(self, chunksize=100_000, routines=None,
+                 routine_settings=None, routine_path=None,
+                 advanced_settings_name=None):
+        """Initiate.
+
+        Args:
+            chunksize (int): Number of rows read from file per chunk.
+            Other arguments are passed on to SessionQC.
+        """
+        self.chunksize = chunksize
+        self.settings = {
+            'routines': routines,
+            'routine_settings': routine_settings,
+            'routine_path': routine_path,
+            'advanced_settings_name': advanced_settings_name,
+        }
+
+    def get_session(self, **kwargs):
+        """Return StreamingSessionQC with the settings of the runner."""
+        return StreamingSessionQC(**self.settings, **kwargs)
+
+    def run(self, chunks, parameter_mapping=None, dataset_name=None,
+            metadata=None, data_columns=None):
+        """Yield the QC-ed chunks of a series.
+
+        Without data_columns, rows are held back until every parameter
+        checked by the routines has shown data (see StreamingSessionQC). A
+        parameter without data in the first chunks can therefore make
+        memory use grow, give data_columns (see get_data_columns) to bound
+        it.
+
+        Args:
+            chunks (iterable): pd.DataFrames with the rows of the series.
+            parameter_mapping (dict): Eg. {'TEMP_CTD': 'TEMP_CTD [°C]'}
+            dataset_name (str): Name of serie in the QC log.
+            metadata (pd.Series): Metadata of the serie. The QC comment is
+                                  appended when all chunks are QC-ed.
+            data_columns (iterable): Columns that hold data in the series.
+        """
+        session = None
+        for chunk in chunks:
+            if session is None:
+                session = self.get_session(
+                    parameter_mapping=parameter_mapping,
+                    dataset_name=dataset_name, metadata=metadata,
+                    data_columns=data_columns)
+            out = session.push(chunk)
+            if len(out):
+                yield out
+        if session is not None:
+            out = session.finish()
+            if len(out):
+                yield out
+
+    def run_file(self, file_path, out_path, parameter_mapping=None,
+                 dataset_name=None, sep='\t', encoding='cp1252'):
+        """QC a standard format file and write the result to out_path.
+
+        The file is read twice: first to find the columns with data, then
+        to QC the data chunk by chunk. Data rows are written to a temporary
+        file next to out_path and copied in after the metadata, since the
+        QC comment is added to the metadata at the end of the run.
+
+        Args:
+            file_path (str | Path): Data file with metadata rows starting
+                                    with '//' above a header row.
+            out_path (str | Path): Output file.
+            parameter_mapping (dict): Defaults to the header names without
+                                      unit, eg.
+                                      {'TEMP_CTD': 'TEMP_CTD [°C]'}
+            dataset_name (str): Defaults to the name of the file.
+            sep (str): Column separator.
+            encoding (str): File encoding.
+        """
+        file_path = Path(file_path)
+        out_path = Path(out_path)
+        metadata = read_metadata(file_path, encoding=encoding)
+        read_kwargs = {
+            'chunksize': self.chunksize,
+            'skiprows': len(metadata),
+            'sep': sep,
+            'encoding': encoding,
+        }
+        data_columns = get_data_columns(read_chunks(file_path, **read_kwargs))
+        if parameter_mapping is None:
+            header = pd.read_csv(file_path, sep=sep, encoding=encoding,
+                                 skiprows=len(metadata), nrows=0)
+            parameter_mapping = get_parameter_mapping(header.columns)
+
+        tmp_path = out_path.with_name(f'{out_path.name}.{os.getpid()}.tmp')
+        try:
+            with open(tmp_path, 'w', encoding=encoding, newline='') as fd:
+                header = True
+                for out in self.run(
+                        read_chunks(file_path, **read_kwargs),
+                        parameter_mapping=parameter_mapping,
+                        dataset_name=dataset_name or file_path.stem,
+                        metadata=metadata,
+                        data_columns=data_columns):
+                    out.to_csv(fd, sep=sep, index=False, header=header,
+                               lineterminator='\n')
+                    header = False
+            with open(out_path, 'w', encoding=encoding, newline='') as fd, \
+                    open(tmp_path, encoding=encoding, newline='') as data:
+                for line in metadata:
+                    fd.write(f'{line}\n')
+                shutil.copyfileobj(data, fd)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        return out_path
+
+
+def read_metadata(file_path, encoding='cp1252'):
+    """Return the '//' metadata rows at the top of a file as pd.Series."""
+    lines = []
+    with open(file_path, encoding=encoding) as fd:
+        for line in fd:
+            if not line.startswith(METADATA_PREFIX):
+                break
+            lines.append(line.rstrip('\r\n'))
+    return pd.Series(lines, dtype=object)
+
+
+def read_chunks(file_path, chunksize=100_000, skiprows=0, sep='\t',
+                encoding='cp1252'):
+    """Yield the data of a file as pd.DataFrames of chunksize rows.
+
+    Values are read as strings, the way ctdpy reads standard format files.
+    The index is the row number within the file.
+    """
+    return pd.read_csv(file_path, sep=sep, encoding=encoding,
+                       skiprows=skiprows, dtype=str, keep_default_na=False,
+                       chunksize=chunksize)
+
+
+def get_data_columns(chunks):
+    """Return the columns that hold data in any of the chunks.
+
+    Same condition as SessionQC.data_available: any truthy value.
+    """
+    columns = {}
+    for chunk in chunks:
+        for key in chunk.columns:
+            if not columns.get(key) and chunk[key].any():
+                columns[key] = True
+            else:
+                columns.setdefault(key, False)
+    return {key for key, has_data in columns.items() if has_data}
+
+
+def get_parameter_mapping(columns):
+    """Return parameter mapping of the columns.
+
+    Eg. {'TEMP_CTD': 'TEMP_CTD [°C]'}
+    """
+    return {key.split(' ')[0]: key for key in columns}
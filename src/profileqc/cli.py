@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Command line interface of ProfileQC.
+
+Example:
+    profileqc run "processed_data/*.txt" -o qc_data
+        --spec smhi_expedition --jobs 8 --log qc_log.jsonl
+"""
+import argparse
+import glob
+import sys
+from pathlib import Path
+from profileqc.config import Settings
+from profileqc.log_sinks import StreamingLogSink, write_yaml_log
+from profileqc.manifest import RunManifest
+from profileqc.pipeline import QcPipeline, read_profile, write_profile
+from profileqc.result_cache import ResultCache
+from profileqc.utils import QcLog
+
+MANIFEST_NAME = 'profileqc_manifest.jsonl'
+
+
+def get_parser():
+    """Return the argument parser of the profileqc command."""
+    parser = argparse.ArgumentParser(
+        prog='profileqc', description='Quality control of profile data.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser(
+        'run', help='QC standard format files.',
+        description='QC standard format files and write them to an output '
+                    'directory. Completed profiles are recorded in a '
+                    'manifest in the output directory, a run that is '
+                    'started again skips them.')
+    run.add_argument('inputs', nargs='+',
+                     help='Files or glob patterns, eg. "data/**/*.txt".')
+    run.add_argument('-o', '--out-directory', required=True,
+                     help='Directory of the QC-ed files.')
+    run.add_argument('--spec', dest='advanced_settings_name',
+                     help='Name of advanced QC specification, eg. '
+                          'smhi_expedition.')
+    run.add_argument('--routine-path',
+                     help='Directory with routine settings (yaml).')
+    run.add_argument('--routines', nargs='+',
+                     help='Routine settings files (yaml), used instead of '
+                          'the files of --routine-path.')
+    run.add_argument('-j', '--jobs', type=int, default=None,
+                     help='Number of QC processes, defaults to the number '
+                          'of CPUs.')
+    run.add_argument('--log',
+                     help='QC log file (JSON Lines), appended to when a run '
+                          'is resumed.')
+    run.add_argument('--log-yaml',
+                     help='Also write the QC log as yaml when the run is '
+                          'done (requires --log).')
+    run.add_argument('--manifest',
+                     help=f'Manifest file, defaults to {MANIFEST_NAME} in '
+                          f'the output directory.')
+    run.add_argument('--restart', action='store_true',
+                     help='Ignore the manifest and QC all files.')
+    run.add_argument('--cache', action='store_true',
+                     help='Take the QC result of profiles that have been '
+                          'QC-ed before with the same data and settings from '
+                          'the result cache.')
+    run.add_argument('--cache-dir',
+                     help='Folder of the result cache, defaults to "results" '
+                          'in PROFILEQC_CACHE_DIR or ~/.cache/profileqc '
+                          '(implies --cache).')
+    run.add_argument('--sep', default='\t', help='Column separator.')
+    run.add_argument('--encoding', default='cp1252', help='File encoding.')
+    return parser
+
+
+def get_file_paths(inputs):
+    """Return sorted unique file paths of files and glob patterns."""
+    paths = {}
+    for pattern in inputs:
+        matches = glob.glob(pattern, recursive=True) or [pattern]
+        for match in matches:
+            path = Path(match)
+            if path.is_file():
+                paths[path.resolve()] = path
+    return [paths[key] for key in sorted(paths)]
+
+
+def run(args):
+    """Run the "run" command. Return the exit code."""
+    file_paths = get_file_paths(args.inputs)
+    if not file_paths:
+        print('No files found', file=sys.stderr)
+        return 1
+    names = [path.name for path in file_paths]
+    if len(set(names)) != len(names):
+        print('Files with the same name would overwrite each other in the '
+              'output directory', file=sys.stderr)
+        return 2
+    if args.log_yaml and not args.log:
+        print('--log-yaml requires --log', file=sys.stderr)
+        return 2
+
+    out_directory = Path(args.out_directory)
+    out_directory.mkdir(parents=True, exist_ok=True)
+    config = {
+        'routines': args.routines,
+        'routine_path': args.routine_path,
+        'routine_settings': None,
+        'advanced_settings_name': args.advanced_settings_name,
+    }
+    settings = Settings(routines=args.routines,
+                        routine_path=args.routine_path,
+                        advanced_qc_spec_name=args.advanced_settings_name)
+    manifest = RunManifest(
+        args.manifest or out_directory.joinpath(MANIFEST_NAME),
+        config=config, settings=settings)
+    if args.restart:
+        manifest.reset()
+    pending = manifest.get_pending(file_paths)
+    print(f'{len(pending)} of {len(file_paths)} files to QC '
+          f'({len(file_paths) - len(pending)} already completed)')
+
+    sink = None
+    if args.log:
+        sink = StreamingLogSink(
+            args.log, mode='a' if manifest.completed else 'w')
+        QcLog.set_sink(sink)
+
+    def on_written(path, out_path):
+        # The log of a profile is on disk before it is marked as completed
+        if sink is not None:
+            sink.flush()
+        manifest.add(path, out_path)
+
+    result_cache = None
+    if args.cache or args.cache_dir:
+        result_cache = ResultCache(args.cache_dir)
+
+    pipeline = QcPipeline(
+        workers=args.jobs,
+        **config,
+        result_cache=result_cache,
+        reader=lambda path: read_profile(path, sep=args.sep,
+                                         encoding=args.encoding),
+        writer=lambda path, item: write_profile(path, item, sep=args.sep,
+                                                encoding=args.encoding),
+        on_written=on_written
+    )
+    try:
+        written = pipeline.run_files(pending, out_directory)
+    finally:
+        if sink is not None:
+            QcLog.set_sink(None)
+            sink.close()
+    print(f'Wrote {len(written)} files to {out_directory}')
+
+    if args.log_yaml:
+        write_yaml_log(args.log, args.log_yaml)
+    return 0
+
+
+def main(argv=None):
+    """Entry point of the profileqc command."""
+    args = get_parser().parse_args(argv)
+    if args.command == 'run':
+        return run(args)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,18 +6,24 @@ Created on 2022-01-04 15:49
 
 @author: johannes
 """
+import copy
+import importlib
 import json
 import yaml
 import pandas as pd
-import geopandas as gp
-from shapely.geometry import Point
 from pathlib import Path
 from profileqc import utils
+from profileqc.overrides import OverrideTable
+from profileqc.bundle import load_bundle
 
 
 def qc_fail_message(obj, spec):
-    """Print message of QC failure."""
-    print('QC-{} failed for {}'.format(obj.__class__.__name__, spec))
+    """Print message of QC failure.
+
+    obj is the routine object, or the routine class.
+    """
+    name = obj.__name__ if isinstance(obj, type) else obj.__class__.__name__
+    print('QC-{} failed for {}'.format(name, spec))
 
 
 def qc_pass_message(obj, spec):
@@ -25,36 +31,130 @@ def qc_pass_message(obj, spec):
     print('QC-{} passed for {}'.format(obj.__class__.__name__, spec))
 
 
+class RoutineReference:
+    """Reference to a QC routine class given by its dotted path.
+
+    Eg. 'profileqc.routines.range.Range'. The module of the routine is
+    imported on the first call, not when the settings are loaded. Calling
+    the reference initiates the routine class.
+    """
+
+    def __init__(self, path):
+        """Initiate."""
+        self.path = path
+        self._routine = None
+
+    def resolve(self):
+        """Return the routine class."""
+        if self._routine is None:
+            module, _, attr = self.path.rpartition('.')
+            self._routine = getattr(importlib.import_module(module), attr)
+        return self._routine
+
+    def __call__(self, *args, **kwargs):
+        """Return initiated routine."""
+        return self.resolve()(*args, **kwargs)
+
+    @staticmethod
+    def resolve_routine(routine):
+        """Return the routine class of routine settings.
+
+        Args:
+            routine (RoutineReference | type): The 'routine' of the
+                settings, either a reference or the routine class itself.
+        """
+        if isinstance(routine, RoutineReference):
+            return routine.resolve()
+        return routine
+
+    def __eq__(self, other):
+        """Return True if other refers to the same routine."""
+        if isinstance(other, RoutineReference):
+            return self.path == other.path
+        return NotImplemented
+
+    def __hash__(self):
+        """Hash of the path."""
+        return hash(self.path)
+
+    def __repr__(self):
+        """Return representation."""
+        return f'RoutineReference({self.path!r})'
+
+    def __getstate__(self):
+        """Pickle only the path."""
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        """Restore from pickle."""
+        self.__init__(state['path'])
+
+    def __copy__(self):
+        """Return self, the reference is immutable."""
+        return self
+
+    def __deepcopy__(self, memo):
+        """Return self, the reference is immutable."""
+        return self
+
+
+class SettingsLoader(yaml.SafeLoader):
+    """YAML loader of the routine files.
+
+    !!python/name tags are loaded as RoutineReference objects instead of
+    importing the routine modules while reading the settings.
+    """
+
+
+SettingsLoader.add_multi_constructor(
+    'tag:yaml.org,2002:python/name:',
+    lambda loader, suffix, node: RoutineReference(suffix)
+)
+
+
 class AdvancedQC:
     """Doc."""
 
     def __init__(self, file_path=None, basin_shp_path=None):
         """Doc."""
-        self.basin_gf = gp.read_file(basin_shp_path)
-        self.data = {}
-        xlsx_file = pd.ExcelFile(file_path)
+        from profileqc.basins import get_basin_locator
+        self.basin_locator = get_basin_locator(basin_shp_path)
+        self.data = load_bundle('advanced_spec', [file_path],
+                                self._read_spec)
+        self.override_table = OverrideTable.from_month_lists(self.data)
+
+    @staticmethod
+    def _read_spec(paths):
+        """Return the routine sheets of the xlsx specification."""
+        data = {}
+        xlsx_file = pd.ExcelFile(paths[0])
         for sheet in xlsx_file.sheet_names:
             if sheet.startswith('qc_'):
-                self.data[sheet] = pd.read_excel(
+                data[sheet] = pd.read_excel(
                     xlsx_file, sheet).set_index('PARAMETER')
-                self.data[sheet]['MONTH_LIST'] = self.data[sheet][
+                data[sheet]['MONTH_LIST'] = data[sheet][
                     'MONTHS'].str.replace(' ', '').str.split(',')
+        return data
 
     def extract_advanced_settings(self, area, month):
-        """Doc."""
-        _data = {}
-        for routine, _item in self.data.items():
-            boolean = (_item['AREA_NAME'] == area) & (
-                _item['MONTH_LIST'].apply(lambda x: month in x))
-            cols = [c for c in _item.columns if
-                    c not in ('AREA_NAME', 'SEASON')]
-            _data.setdefault(routine, _item.loc[boolean, cols].to_dict('index'))
-        return _data
+        """Return the precomputed settings of the area and month.
+
+        See OverrideTable. The returned mapping is read-only.
+        """
+        return self.override_table.get(area, month)
+
+    @property
+    def basin_gf(self):
+        """Return GeoDataFrame of the basins."""
+        return self.basin_locator.basin_gf
 
     def get_area(self, lat, lon):
-        """Doc."""
-        boolean = self.basin_gf.contains(Point((float(lon), float(lat))))
-        return self.basin_gf.loc[boolean, 'AREA_NAME'].iloc[0]
+        """Return area name of the position, None if outside all basins."""
+        return self.basin_locator.get_area(lat, lon)
+
+    def get_areas(self, lats, lons):
+        """Return area names of many positions (see BasinLocator.locate)."""
+        return self.basin_locator.locate(lats, lons)
 
     def get_routine_settings(self, latitude=None, longitude=None, month=None):
         """Doc."""
@@ -74,6 +174,10 @@ class Settings:
         # TODO: enable possibility for local settings
 
         self.qc_routines = {}
+        # Files the settings are read from (json, yaml, xlsx and shp)
+        self.source_paths = []
+        self._compiled = None
+        self._dependencies = None
         self.base_directory = utils.get_base_folder()
         self.routines = routines
         self.routine_path = routine_path
@@ -86,12 +190,13 @@ class Settings:
         if advanced_qc_spec_name:
             if not advanced_qc_spec_name.endswith('.xlsx'):
                 advanced_qc_spec_name = advanced_qc_spec_name + '.xlsx'
-            self.advanced_spec = AdvancedQC(
-                file_path=self.base_directory.joinpath(
-                    f'etc/qc_advanced_spec/{advanced_qc_spec_name}'),
-                basin_shp_path=self.base_directory.joinpath(
-                    'etc/resources/shp/basins.shp')
-            )
+            spec_path = self.base_directory.joinpath(
+                f'etc/qc_advanced_spec/{advanced_qc_spec_name}')
+            basin_shp_path = self.base_directory.joinpath(
+                'etc/resources/shp/basins.shp')
+            self.advanced_spec = AdvancedQC(file_path=spec_path,
+                                            basin_shp_path=basin_shp_path)
+            self.source_paths.extend([spec_path, basin_shp_path])
         else:
             self.advanced_spec = None
 
@@ -115,29 +220,93 @@ class Settings:
 
     def _load_settings(self, etc_path, routines=None, routine_path=None,
                        advanced_settings=None, only_routines=False):
-        """Load settings."""
+        """Load settings.
+
+        The json and yaml files are compiled into a settings bundle (see
+        profileqc.bundle) the first time. Later calls, eg. when updating
+        routine settings for every profile, work on copies of the already
+        loaded content and do not touch the disk.
+        """
+        if self._compiled is None:
+            routine_path = Path(routine_path) if routine_path else etc_path
+            json_paths = sorted(etc_path.glob('**/*.json'))
+            if routines:
+                yaml_paths = [Path(fid) for fid in routines]
+            else:
+                yaml_paths = sorted(routine_path.glob('**/*.yaml'))
+            self._compiled = load_bundle(
+                'settings', json_paths + yaml_paths,
+                lambda paths: self._read_sources(json_paths, yaml_paths)
+            )
+            self.source_paths.extend(json_paths + yaml_paths)
+
         settings = {}
         if not only_routines:
-            for fid in etc_path.glob('**/*.json'):
-                with open(fid, 'r') as fd:
-                    content = json.load(fd)
-                    settings[fid.stem] = content
-
-        routine_path = Path(routine_path) if routine_path else etc_path
-        if routines:
-            for fid in routines:
-                with open(fid, encoding='utf8') as fd:
-                    content = yaml.load(fd, Loader=yaml.FullLoader)
-                    settings[Path(fid).stem] = content
-        else:
-            for fid in routine_path.glob('**/*.yaml'):
-                with open(fid, encoding='utf8') as fd:
-                    content = yaml.load(fd, Loader=yaml.FullLoader)
-                    settings[fid.stem] = content
+            settings.update(copy.deepcopy(self._compiled['json']))
+        settings.update(copy.deepcopy(self._compiled['yaml']))
         if advanced_settings:
             self._update_settings(settings, advanced=advanced_settings)
 
         self.set_attributes(self, **settings)
+        self._set_default_q_parameters()
+        self.layout_key = self._get_layout_key()
+
+    @property
+    def dependencies(self):
+        """Return the Dependencies of the parameters.
+
+        Read from parameter_dependencies.json. The transitive closure is
+        computed once per Settings object.
+        """
+        if self._dependencies is None:
+            from profileqc.routines.dependencies import Dependencies
+            self._dependencies = Dependencies(
+                getattr(self, 'parameter_dependencies', None))
+        return self._dependencies
+
+    def _set_default_q_parameters(self):
+        """Set q_parameters of datasets that do not list them.
+
+        Flags are then propagated to the Q0-fields of the parameter and
+        all parameters that depend on it.
+        """
+        for routine in self.qc_routines:
+            for item in getattr(self, routine)['datasets'].values():
+                if item.get('q_parameters'):
+                    continue
+                parameters = item.get('parameters') or [item.get('parameter')]
+                item['q_parameters'] = self.dependencies.get_q_parameters(
+                    *[p for p in parameters if p])
+
+    def _get_layout_key(self):
+        """Return the parameter layout of the routine datasets.
+
+        Execution plans (see profileqc.plan) are only valid for settings with
+        the same layout.
+        """
+        layout = []
+        for routine, qc_index in self.qc_routines.items():
+            for key, item in getattr(self, routine)['datasets'].items():
+                layout.append((
+                    routine, qc_index, key,
+                    item.get('parameter'),
+                    tuple(item.get('parameters') or ()),
+                    tuple(item.get('q_parameters') or ()),
+                ))
+        return tuple(layout)
+
+    @staticmethod
+    def _read_sources(json_paths, yaml_paths):
+        """Return content of the json and yaml settings files."""
+        content = {'json': {}, 'yaml': {}}
+        for fid in json_paths:
+            with open(fid, 'r') as fd:
+                content['json'][fid.stem] = json.load(fd)
+        for fid in yaml_paths:
+            with open(fid, encoding='utf8') as fd:
+                content['yaml'][fid.stem] = yaml.load(
+                    fd, Loader=SettingsLoader)
+        return content
 
     @staticmethod
     def _update_settings(settings, advanced=None):
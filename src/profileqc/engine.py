@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Fused evaluation of routine kernels.
+
+A routine supports the kernel protocol if its class has the classmethods
+    kernel(values, **settings) --> boolean array, True where passed
+    row_extent(**settings) --> (rows before, rows after)
+where values is a 1-D float array of the parameter (or a 2-D array with one
+column per parameter for routines on many parameters). A kernel is pure: it
+only depends on values and settings, and the result of a row only depends
+on the rows given by row_extent. Row-wise settings (np.ndarrays with one
+value per row) and segment_ids are sliced together with the values.
+"""
+from typing import NamedTuple
+import numpy as np
+from profileqc.config import RoutineReference, qc_fail_message
+from profileqc.instrumentation import Probe
+
+
+class StepResult(NamedTuple):
+    """Result of one step of an ExecutionPlan.
+
+    codes are the uint8 flag codes of the step (see get_flag_codes) and
+    flagged is True where the routine failed with q_flag. seconds and
+    nbytes are only measured on request (see SessionQC.evaluate_steps).
+    """
+
+    codes: np.ndarray
+    flagged: np.ndarray
+    q_flag: str
+    seconds: float = None
+    nbytes: int = None
+
+
+# Dataset settings that are not passed on to the kernels as vectors
+SHARED_SETTINGS = ('parameter', 'parameters', 'q_parameters', 'q_flag',
+                   'routine', 'segment_ids')
+
+
+def get_kernel(routine):
+    """Return the kernel of a routine class, None if it has none."""
+    routine = RoutineReference.resolve_routine(routine)
+    kernel = getattr(routine, 'kernel', None)
+    if kernel is None or not hasattr(routine, 'row_extent'):
+        return None
+    return kernel
+
+
+class KernelTask:
+    """One kernel call per block for one or many steps of the same routine.
+
+    Routines with the class attribute column_batch_keys evaluate all their
+    datasets at once: the columns are stacked into a 2-D block and numeric
+    settings into vectors of shape (1, n_columns), or (n_rows, n_columns)
+    for row-wise settings. Datasets are only batched together if the
+    settings named in column_batch_keys (eg. the window size of a rolling
+    check), and all non-numeric settings, are equal.
+    """
+
+    def __init__(self, routine, indices, columns, items, column_index,
+                 n_rows):
+        """Initiate.
+
+        Args:
+            routine (type): Routine class.
+            indices (list): Step numbers of the task.
+            columns (list): Data columns of each step.
+            items (list): Dataset settings of each step.
+            column_index (dict): Position of each column in the values.
+            n_rows (int): Number of rows of the values.
+        """
+        self.routine = routine
+        self.kernel = routine.kernel
+        self.indices = indices
+        self.batched = hasattr(routine, 'column_batch_keys')
+        self.extent = routine.row_extent(**items[0])
+        self.segment_ids = items[0].get('segment_ids')
+        positions = [[column_index[c] for c in cols] for cols in columns]
+        if len(columns[0]) == 1:
+            positions = [p[0] for p in positions]
+        if self.batched:
+            self.positions = np.array(positions, dtype=np.intp)
+            self.shared, self.stacked, self.row_wise = self._stack(
+                routine, items, n_rows)
+        else:
+            self.positions = positions[0]
+            self.item = items[0]
+            self.row_wise = [key for key, value in items[0].items()
+                             if _is_row_wise(value, n_rows)]
+
+    @staticmethod
+    def _stack(routine, items, n_rows):
+        """Return shared settings, stacked settings and row-wise keys."""
+        shared = {}
+        stacked = {}
+        row_wise = []
+        for key, value in items[0].items():
+            if key in ('parameter', 'parameters', 'q_parameters', 'q_flag'):
+                continue
+            if key == 'segment_ids':
+                continue
+            if key not in stacked_keys(routine, items[0], n_rows):
+                shared[key] = value
+                continue
+            values = [item[key] for item in items]
+            if any(_is_row_wise(v, n_rows) for v in values):
+                row_wise.append(key)
+                stacked[key] = values
+            else:
+                stacked[key] = np.array(values, dtype=float)[np.newaxis, :]
+        return shared, stacked, row_wise
+
+    @staticmethod
+    def get_group_key(routine, columns, item, n_rows):
+        """Return key of the steps that can be evaluated together."""
+        keys = stacked_keys(routine, item, n_rows)
+        return (
+            routine,
+            len(columns),
+            tuple(sorted(keys)),
+            repr(sorted(
+                (key, id(value) if isinstance(value, np.ndarray) else value)
+                for key, value in item.items()
+                if key not in keys and key not in (
+                    'parameter', 'parameters', 'q_parameters', 'q_flag')
+            )),
+        )
+
+    def __call__(self, block, low, high):
+        """Return boolean array (n_block_rows, n_steps), True where passed.
+
+        Args:
+            block (np.ndarray): Rows low:high of all columns.
+        """
+        values = block[:, self.positions]
+        if not self.batched:
+            kwargs = dict(self.item)
+            for key in self.row_wise:
+                kwargs[key] = self.item[key][low:high]
+            return self.kernel(values, **kwargs).reshape(-1, 1)
+
+        kwargs = dict(self.shared, **self.stacked)
+        for key in self.row_wise:
+            kwargs[key] = np.column_stack([
+                np.broadcast_to(
+                    v[low:high] if isinstance(v, np.ndarray) else v,
+                    (high - low,))
+                for v in self.stacked[key]
+            ])
+        if self.segment_ids is not None:
+            kwargs['segment_ids'] = self.segment_ids[low:high]
+        return self.kernel(values, **kwargs)
+
+
+class FusedEngine:
+    """Evaluate the kernels of all steps of an ExecutionPlan.
+
+    The rows are processed in blocks of block_size rows, and all kernels
+    are evaluated on a block before moving on to the next one, so that the
+    values are read from cache instead of memory by all but the first
+    kernel. The columns are only read as views of the working frame, no
+    matter how it is stored (see eg. profileqc.arrow). Steps of a routine
+    with column_batch_keys are evaluated in one 2-D kernel call per block
+    (see KernelTask), eg. the range check of all parameters at once. Each
+    block is extended with the halo of rows needed by the kernels (see
+    row_extent), which makes the result equal to one evaluation of the
+    whole columns.
+    """
+
+    # Rows per block. Large enough to keep the per-call overhead of the
+    # batched kernels small, small enough for the temporaries of a block to
+    # stay in cache.
+    block_size = 1 << 14
+
+    def __init__(self, plan, settings):
+        """Initiate.
+
+        Args:
+            plan (ExecutionPlan): Steps to evaluate.
+            settings (Settings): Routine settings of the plan.
+        """
+        self.plan = plan
+        self.routines = {}
+        self.kernels = {}
+        for i, step in enumerate(plan):
+            routine = getattr(settings, step.routine)['routines'][
+                step.routine]['routine']
+            kernel = get_kernel(routine)
+            if kernel is not None:
+                self.routines[i] = RoutineReference.resolve_routine(routine)
+                self.kernels[i] = kernel
+
+    def supports(self, index):
+        """Return True if step number index is evaluated by its kernel."""
+        return index in self.kernels
+
+    def get_q_flag(self, index, item):
+        """Return the flag set by step number index where it fails."""
+        return item.get('q_flag') or getattr(self.routines[index], 'q_flag',
+                                             None) or 'B'
+
+    def get_tasks(self, items, column_index, n_rows):
+        """Return the KernelTasks of the steps in items."""
+        groups = {}
+        for i, item in items.items():
+            if i not in self.kernels:
+                continue
+            routine = self.routines[i]
+            columns = self.plan.steps[i].columns
+            key = ('step', i)
+            if hasattr(routine, 'column_batch_keys'):
+                key = KernelTask.get_group_key(routine, columns, item, n_rows)
+            groups.setdefault(key, []).append(i)
+        return [
+            KernelTask(self.routines[indices[0]], indices,
+                       [self.plan.steps[i].columns for i in indices],
+                       [items[i] for i in indices], column_index, n_rows)
+            for indices in groups.values()
+        ]
+
+    def evaluate(self, working, items, timings=None, nbytes=None):
+        """Return {step index: boolean array, True where passed}.
+
+        Args:
+            working (pd.DataFrame): Float working frame (see
+                                    SessionQC.set_working_frame).
+            items (dict): {step index: dataset settings} of the steps to
+                          evaluate. Steps without kernel are ignored.
+            timings (dict): If given, the seconds spent in each kernel are
+                            added to timings[step index]. The time of a
+                            batched kernel call is shared equally by its
+                            steps.
+            nbytes (dict): If given, and tracemalloc is tracing, the peak
+                           memory allocated by the kernels of each step is
+                           set to nbytes[step index] (the largest peak of
+                           all blocks, shared as the time).
+        """
+        n_rows = len(working)
+        columns = list(dict.fromkeys(
+            key for i in items if i in self.kernels
+            for key in self.plan.steps[i].columns))
+        column_index = {key: i for i, key in enumerate(columns)}
+        tasks = self.get_tasks(items, column_index, n_rows)
+        if not tasks:
+            return {}
+        # Column views, the rows of a block are copied to a small buffer
+        values = [working[key].to_numpy(dtype=float) for key in columns]
+        before = max(task.extent[0] for task in tasks)
+        after = max(task.extent[1] for task in tasks)
+
+        results = {i: np.empty(n_rows, dtype=bool)
+                   for task in tasks for i in task.indices}
+        measure = timings is not None or nbytes is not None
+        for start in range(0, n_rows, self.block_size):
+            end = min(start + self.block_size, n_rows)
+            low = max(start - before, 0)
+            high = min(end + after, n_rows)
+            block = np.empty((high - low, len(values)), dtype=np.float64)
+            for j, column in enumerate(values):
+                block[:, j] = column[low:high]
+            for task in tasks:
+                probe = Probe(nbytes is not None) if measure else None
+                passed = task(block, low, high)[start - low:end - low]
+                for j, i in enumerate(task.indices):
+                    results[i][start:end] = passed[:, j]
+                if probe is not None:
+                    self._add_measure(probe.event('routine', None),
+                                      task.indices, timings, nbytes)
+
+        for i in sorted(results):
+            if not results[i].all():
+                step = self.plan.steps[i]
+                qc_fail_message(self.routines[i],
+                                step.parameter or list(step.parameters))
+        return results
+
+    @staticmethod
+    def _add_measure(event, indices, timings, nbytes):
+        """Share the time and memory of a kernel call by its steps."""
+        n = len(indices)
+        for i in indices:
+            if timings is not None:
+                timings[i] = timings.get(i, 0.) + event.seconds / n
+            if nbytes is not None and event.nbytes is not None:
+                nbytes[i] = max(nbytes.get(i, 0), event.nbytes // n)
+
+
+def stacked_keys(routine, item, n_rows):
+    """Return the settings of item that can be stacked into vectors.
+
+    Numbers and row-wise arrays, except the settings in the
+    column_batch_keys of the routine.
+    """
+    batch_keys = getattr(routine, 'column_batch_keys', ())
+    return [
+        key for key, value in item.items()
+        if key not in SHARED_SETTINGS and key not in batch_keys
+        if _is_number(value) or _is_row_wise(value, n_rows)
+    ]
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.number)) and not isinstance(
+        value, (bool, np.bool_))
+
+
+def _is_row_wise(value, n_rows):
+    return isinstance(value, np.ndarray) and value.shape[:1] == (n_rows,)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Q0-flag codes and the flag matrix of SessionQC."""
+import numpy as np
+
+# Flag precedence: 0 < A < S < B. The code of a flag is its position here.
+FLAGS = ('0', 'A', 'S', 'B')
+FLAG_CODES = {flag: code for code, flag in enumerate(FLAGS)}
+_FLAG_CHARS = np.array(FLAGS, dtype='U1')
+
+
+def get_flag_codes(flag_field):
+    """Return uint8 codes for an array of flags.
+
+    Args:
+        flag_field (array like): eg. ['A', 'A', 'B', 'S', 'A']
+
+    Unknown flags are coded as '0' (no QC performed).
+    """
+    flag_field = np.asarray(flag_field)
+    codes = np.zeros(flag_field.shape, dtype=np.uint8)
+    for flag, code in FLAG_CODES.items():
+        if code:
+            codes[flag_field == flag] = code
+    return codes
+
+
+def get_flag_strings(codes):
+    """Return Q0-strings for a (n_rows, number_of_routines) code array.
+
+    Eg. [[1, 1, 1], [3, 2, 1]] --> ['AAA', 'BSA']
+    """
+    chars = _FLAG_CHARS[codes]
+    return chars.view(f'U{codes.shape[1]}').ravel()
+
+
+class FlagMatrix:
+    """Auto-QC flags of all Q0-fields held as one uint8 code matrix.
+
+    The matrix has the shape (n_rows, n_q0_columns, number_of_routines),
+    where the last axis corresponds to the positions of a Q0-string.
+    Flags are merged according to the precedence 0 < A < S < B, ie. a
+    merge is a plain element-wise maximum of the codes.
+    """
+
+    def __init__(self, columns, n_rows, number_of_routines, codes=None):
+        """Initiate.
+
+        Args:
+            codes (np.ndarray): Existing uint8 code array to work on, eg. a
+                                np.memmap (see profileqc.binary). It is
+                                used as is, not copied.
+        """
+        self.columns = list(columns)
+        self.column_index = {key: i for i, key in enumerate(self.columns)}
+        self.number_of_routines = number_of_routines
+        if codes is None:
+            codes = np.zeros(
+                (n_rows, len(self.columns), number_of_routines),
+                dtype=np.uint8
+            )
+        self.codes = codes
+        self.touched = set()
+
+    @classmethod
+    def from_frame(cls, df, columns, number_of_routines, reset_columns=None):
+        """Return matrix with codes parsed from the Q0-strings in df.
+
+        Args:
+            df (pd.DataFrame): data including the Q0-fields.
+            columns (list): Q0-fields to include in the matrix.
+            number_of_routines (int): Length of the Q0-strings.
+            reset_columns (iterable): Q0-fields that should start out as
+                                      '0' * number_of_routines no matter
+                                      what df holds (or not holds).
+        """
+        reset_columns = reset_columns or ()
+        matrix = cls(columns, len(df), number_of_routines)
+        for key, i in matrix.column_index.items():
+            if key in reset_columns:
+                continue
+            matrix.codes[:, i, :] = cls._parse_strings(
+                df[key].to_numpy(), number_of_routines
+            )
+        return matrix
+
+    @staticmethod
+    def _parse_strings(values, number_of_routines):
+        """Return codes of shape (len(values), number_of_routines).
+
+        Strings are truncated / padded with '0' to the given length.
+        """
+        chars = np.asarray(values, dtype=f'U{number_of_routines}')
+        chars = chars.view('U1').reshape(len(values), number_of_routines)
+        return get_flag_codes(chars)
+
+    def __contains__(self, key):
+        """Return True if key is a Q0-field of the matrix."""
+        return key in self.column_index
+
+    def merge(self, flag_field, q_flag_keys, qc_index, rows=None):
+        """Merge flags into the qc_index position of the given Q0-fields.
+
+        Args:
+            flag_field (array like): eg. ['A', 'A', 'B', 'S', 'A']
+            q_flag_keys (list): eg. ['Q0_TEMP_CTD', 'Q0_DENS_CTD'].
+            qc_index (int): position in the Q0-string.
+            rows (array like): Boolean row mask. Only these rows are merged.
+        """
+        cols = [self.column_index[key] for key in q_flag_keys
+                if key in self.column_index]
+        if not cols:
+            return
+        codes = get_flag_codes(flag_field)
+        plane = self.codes[:, :, qc_index]
+        if rows is None:
+            index = (slice(None), cols)
+        else:
+            rows = np.flatnonzero(rows)
+            index = np.ix_(rows, cols)
+            codes = codes[rows]
+        block = plane[index]
+        np.maximum(block, codes[:, np.newaxis], out=block)
+        plane[index] = block
+        self.touched.update(cols)
+
+    def propagate(self, source_codes, propagation, active=None):
+        """Merge the flags of many sources in one step.
+
+        Args:
+            source_codes (np.ndarray): uint8 codes of shape
+                                       (n_rows, n_sources), one column per
+                                       routine run (see get_flag_codes).
+            propagation (FlagPropagation): Q0-fields and positions of each
+                                           source, compiled for
+                                           self.columns.
+            active (array like): Boolean per source, only active sources
+                                 mark their Q0-fields as touched. Codes of
+                                 inactive sources should be 0.
+        """
+        for qc_index, targets, starts, sources in propagation.planes:
+            codes = np.maximum.reduceat(source_codes[:, sources], starts,
+                                        axis=1)
+            block = self.codes[:, targets, qc_index]
+            np.maximum(block, codes, out=block)
+            self.codes[:, targets, qc_index] = block
+        if active is None:
+            active = np.ones(len(propagation.targets), dtype=bool)
+        for i in np.flatnonzero(active):
+            self.touched.update(propagation.targets[i])
+
+    def get_strings(self, key):
+        """Return array of Q0-strings for the given Q0-field."""
+        return get_flag_strings(self.codes[:, self.column_index[key], :])
+
+    def get_max_codes(self):
+        """Return the highest code of each row and Q0-field.
+
+        Shape (n_rows, n_q0_columns).
+        """
+        return self.codes.max(axis=2)
+
+    @property
+    def touched_columns(self):
+        """Return the Q0-fields that have been flagged by any routine."""
+        return [self.columns[i] for i in sorted(self.touched)]
+
+
+class FlagPropagation:
+    """Sparse source --> Q0-field propagation matrix.
+
+    A source is one routine run that flags one or more Q0-fields (its
+    q_parameters) at its qc_index position. The matrix is stored per
+    qc_index plane in compressed form: for every target column the
+    sources that flag it, so that FlagMatrix.propagate merges all sources
+    with one gather and one np.maximum.reduceat per plane.
+    """
+
+    def __init__(self, columns, sources):
+        """Initiate.
+
+        Args:
+            columns (list): Q0-fields of the FlagMatrix.
+            sources (list): (q_parameters, qc_index) of each source.
+        """
+        column_index = {key: i for i, key in enumerate(columns)}
+        self.targets = []
+        matrix = {}
+        for i, (q_parameters, qc_index) in enumerate(sources):
+            cols = sorted({column_index[key] for key in q_parameters or ()
+                           if key in column_index})
+            self.targets.append(cols)
+            for col in cols:
+                matrix.setdefault(qc_index, {}).setdefault(col, []).append(i)
+
+        self.planes = []
+        for qc_index in sorted(matrix):
+            targets = sorted(matrix[qc_index])
+            sources_of = [matrix[qc_index][col] for col in targets]
+            starts = np.cumsum([0] + [len(s) for s in sources_of[:-1]])
+            self.planes.append((
+                qc_index,
+                np.array(targets, dtype=np.intp),
+                starts.astype(np.intp),
+                np.concatenate(sources_of).astype(np.intp),
+            ))
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Instrumentation of SessionQC.run (QcEvent, QcStats)."""
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from typing import NamedTuple
+import pandas as pd
+
+# Phases reported by SessionQC.run
+PHASES = ('open', 'routine', 'cache', 'close', 'sync', 'run')
+
+
+class QcEvent(NamedTuple):
+    """Measurement of one phase or routine run of SessionQC.run.
+
+    phase is one of PHASES. routine and dataset are only given for the
+    'routine' phase, flagged holds the number of flagged samples per flag,
+    eg. {'B': 3}. nbytes is the peak memory allocated during the phase, and
+    only measured if tracemalloc is tracing (eg. python -X tracemalloc).
+    """
+
+    serie: str
+    phase: str
+    seconds: float
+    routine: str = None
+    dataset: str = None
+    rows: int = 0
+    flagged: dict = None
+    nbytes: int = None
+
+
+class Probe:
+    """Measure wall time (and allocated memory) from initiation.
+
+    Probes must not be nested when memory is traced, since the peak of
+    tracemalloc is reset at start.
+    """
+
+    __slots__ = ('start', 'memory')
+
+    def __init__(self, trace_memory=True):
+        """Start measuring."""
+        self.memory = None
+        if trace_memory and tracemalloc.is_tracing():
+            self.memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+
+    def event(self, phase, serie, **kwargs):
+        """Return QcEvent measured up to now."""
+        seconds = time.perf_counter() - self.start
+        nbytes = None
+        if self.memory is not None:
+            nbytes = max(tracemalloc.get_traced_memory()[1] - self.memory, 0)
+        return QcEvent(serie=serie, phase=phase, seconds=seconds,
+                       nbytes=nbytes, **kwargs)
+
+
+class QcStats:
+    """Instrumentation hook that aggregates QcEvents.
+
+    Example:
+        stats = QcStats()
+        qc_run.add_hook(stats)
+        ...  # run QC
+        print(stats.format_summary())
+        stats.write_prometheus('/var/lib/node_exporter/profileqc.prom')
+    """
+
+    def __init__(self):
+        """Initiate."""
+        self.reset()
+
+    def reset(self):
+        """Remove all aggregated events."""
+        self.items = {}
+        self.profiles = 0
+
+    def __call__(self, event):
+        """Add event."""
+        if event.phase == 'run':
+            self.profiles += 1
+        key = (event.phase, event.routine or '', event.dataset or '')
+        item = self.items.get(key)
+        if item is None:
+            item = self.items[key] = {
+                'calls': 0, 'seconds': 0., 'max_seconds': 0., 'rows': 0,
+                'nbytes': None, 'flagged': {},
+            }
+        item['calls'] += 1
+        item['seconds'] += event.seconds
+        item['max_seconds'] = max(item['max_seconds'], event.seconds)
+        item['rows'] += event.rows or 0
+        if event.nbytes is not None:
+            item['nbytes'] = (item['nbytes'] or 0) + event.nbytes
+        for flag, n in (event.flagged or {}).items():
+            item['flagged'][flag] = item['flagged'].get(flag, 0) + n
+
+    def summary(self):
+        """Return the aggregated events as pd.DataFrame.
+
+        One row per phase / routine and dataset, sorted by total time.
+        """
+        flags = sorted({f for item in self.items.values()
+                        for f in item['flagged']})
+        records = []
+        for (phase, routine, dataset), item in self.items.items():
+            record = {
+                'phase': phase,
+                'routine': routine,
+                'dataset': dataset,
+                'calls': item['calls'],
+                'seconds': item['seconds'],
+                'mean_ms': item['seconds'] / item['calls'] * 1e3,
+                'max_ms': item['max_seconds'] * 1e3,
+                'rows': item['rows'],
+                'bytes': item['nbytes'],
+            }
+            for flag in flags:
+                record[f'flagged_{flag}'] = item['flagged'].get(flag, 0)
+            records.append(record)
+        df = pd.DataFrame(records)
+        if df.empty:
+            return df
+        return df.sort_values('seconds', ascending=False).reset_index(
+            drop=True)
+
+    def format_summary(self):
+        """Return the summary as a printable table."""
+        df = self.summary()
+        if df.empty:
+            return 'No QC events recorded'
+        return df.to_string(index=False, float_format=lambda v: f'{v:.4g}')
+
+    def to_prometheus(self, prefix='profileqc', labels=None):
+        """Return the aggregated events in Prometheus text format.
+
+        Args:
+            prefix (str): Prefix of the metric names.
+            labels (dict): Labels added to every sample, eg. {'node': 'b1'}.
+        """
+        labels = labels or {}
+        metrics = {
+            'seconds_total': ('counter', 'Wall time in seconds.', []),
+            'calls_total': ('counter', 'Number of runs.', []),
+            'rows_total': ('counter', 'Number of rows evaluated.', []),
+            'flagged_samples_total': (
+                'counter', 'Number of flagged samples.', []),
+            'allocated_bytes_total': (
+                'counter', 'Peak bytes allocated (tracemalloc).', []),
+        }
+        for (phase, routine, dataset), item in sorted(self.items.items()):
+            sample = dict(labels, phase=phase)
+            if routine:
+                sample.update(routine=routine, dataset=dataset)
+            metrics['seconds_total'][2].append((sample, item['seconds']))
+            metrics['calls_total'][2].append((sample, item['calls']))
+            metrics['rows_total'][2].append((sample, item['rows']))
+            for flag, n in sorted(item['flagged'].items()):
+                metrics['flagged_samples_total'][2].append(
+                    (dict(sample, flag=flag), n))
+            if item['nbytes'] is not None:
+                metrics['allocated_bytes_total'][2].append(
+                    (sample, item['nbytes']))
+
+        lines = [
+            f'# HELP {prefix}_profiles_total Number of QC-ed profiles.',
+            f'# TYPE {prefix}_profiles_total counter',
+            f'{prefix}_profiles_total{_format_labels(labels)} '
+            f'{self.profiles}',
+        ]
+        for name, (kind, text, samples) in metrics.items():
+            if not samples:
+                continue
+            lines.append(f'# HELP {prefix}_{name} {text}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            for sample, value in samples:
+                lines.append(
+                    f'{prefix}_{name}{_format_labels(sample)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, file_path, **kwargs):
+        """Write Prometheus textfile (for the node_exporter collector).
+
+        The file is replaced atomically so that the collector never reads
+        a partly written file.
+        """
+        file_path = Path(file_path)
+        tmp_path = file_path.with_name(f'{file_path.name}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf8') as fd:
+            fd.write(self.to_prometheus(**kwargs))
+        os.replace(tmp_path, file_path)
+
+
+def _format_labels(labels):
+    """Return Prometheus label set, eg. {phase="open"}."""
+    if not labels:
+        return ''
+    items = ','.join(f'{key}="{_escape(value)}"'
+                     for key, value in labels.items())
+    return '{' + items + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace(
+        '"', '\\"')
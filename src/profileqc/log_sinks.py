@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Sinks that write the QC log to disk (see QcLog.set_sink)."""
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import yaml
+
+_YamlDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+class LogSink:
+    """Base class of QC log sinks.
+
+    A sink receives the entries of QcLog one by one instead of QcLog
+    collecting them in memory. Activate with QcLog.set_sink(sink).
+    """
+
+    def add(self, serie, routine_name, parameter, flag, item):
+        """Add the flagged values of one routine run.
+
+        Args:
+            serie (str): Name of serie.
+            routine_name (str): Name of QC routine.
+            parameter (str): Name of parameter.
+            flag (str): Flag, eg. 'B'.
+            item (dict): {'values': list, 'pressure': list, 'info': str,
+                          'qc_index': int}
+        """
+        raise NotImplementedError
+
+    def add_etc(self, value):
+        """Add other information (stored under "etc" in the QC log)."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Write buffered entries to disk."""
+
+    def close(self):
+        """Flush and close the sink."""
+        self.flush()
+
+    def write_yaml(self, file_path):
+        """Write the log to a yaml file, in the layout of QcLog.write."""
+        raise NotImplementedError(
+            f'{self.__class__.__name__} can not be written as yaml')
+
+    def __enter__(self):
+        """Return self."""
+        return self
+
+    def __exit__(self, *args):
+        """Close the sink."""
+        self.close()
+
+
+class StreamingLogSink(LogSink):
+    """Append QC log entries to a JSON Lines file.
+
+    Every flag event is written as one line as soon as it is produced, so
+    memory use does not grow with the number of profiles. The yaml log of
+    QcLog.write can be produced afterwards with write_yaml.
+
+    Example:
+        with StreamingLogSink('qc_log.jsonl') as sink:
+            QcLog.set_sink(sink)
+            for name, item in datasets.items():
+                qc_run.run_profile(item, parameter_mapping=mapping,
+                                   dataset_name=name)
+            QcLog.set_sink(None)
+        sink.write_yaml('qc_log.yaml')
+    """
+
+    def __init__(self, file_path, mode='w'):
+        """Initiate.
+
+        Args:
+            file_path (str | Path): JSON Lines file.
+            mode (str): 'w' starts a new file, 'a' appends to an existing
+                        file (eg. when resuming a run).
+        """
+        self.file_path = Path(file_path)
+        self._fd = open(self.file_path, mode, encoding='utf8')
+
+    def add(self, serie, routine_name, parameter, flag, item):
+        """Append the flagged values of one routine run."""
+        self._write({
+            'serie': serie,
+            'routine_name': routine_name,
+            'parameter': parameter,
+            'flag': flag,
+            'item': item,
+        })
+
+    def add_etc(self, value):
+        """Append other information."""
+        self._write({'etc': value})
+
+    def _write(self, record):
+        if self._fd is None:
+            raise ValueError(f'{self.file_path} is closed')
+        self._fd.write(json.dumps(record, default=str))
+        self._fd.write('\n')
+
+    def flush(self):
+        """Write buffered entries to disk."""
+        if self._fd is not None:
+            self._fd.flush()
+
+    def close(self):
+        """Close the file."""
+        if self._fd is not None:
+            self._fd.close()
+            self._fd = None
+
+    def write_yaml(self, file_path):
+        """Write the log to a yaml file, in the layout of QcLog.write."""
+        self.flush()
+        write_yaml_log(self.file_path, file_path)
+
+
+class TabularLogSink(LogSink):
+    """Write the QC log as a table with one row per flagged value.
+
+    Columns: series, routine_name, qc_index, parameter, flag, pressure,
+    value. Rows are buffered and written in batches of batch_size rows to a
+    Parquet file (requires pyarrow) or a CSV file, so the log can be
+    filtered with a columnar scan, eg.
+        pd.read_parquet('qc_log.parquet',
+                        filters=[('routine_name', '==', 'qc_spike'),
+                                 ('parameter', '==', 'DOXY_CTD')])
+
+    Entries under "etc" are not part of the table and are ignored.
+    """
+
+    columns = ('series', 'routine_name', 'qc_index', 'parameter', 'flag',
+               'pressure', 'value')
+
+    def __init__(self, file_path, fmt=None, batch_size=100_000):
+        """Initiate.
+
+        Args:
+            file_path (str | Path): Output file.
+            fmt (str): 'parquet' or 'csv'. Defaults to the file suffix.
+            batch_size (int): Number of rows buffered before they are
+                              written.
+        """
+        self.file_path = Path(file_path)
+        self.fmt = (fmt or self.file_path.suffix.lstrip('.')).lower()
+        if self.fmt not in ('parquet', 'csv'):
+            raise ValueError(f'Unknown log table format: {self.fmt}')
+        self.batch_size = batch_size
+        self._buffer = {key: [] for key in self.columns}
+        self._buffered_rows = 0
+        self._writer = None
+        self._schema = None
+        self._started = False
+        if self.fmt == 'parquet':
+            self._pa, self._pq = _import_pyarrow()
+
+    def add(self, serie, routine_name, parameter, flag, item):
+        """Buffer one row per flagged value."""
+        values = item.get('values')
+        pressure = item.get('pressure')
+        n = max(_get_length(values), _get_length(pressure))
+        if not n:
+            return
+        values = _as_float_list(values, n)
+        pressure = _as_float_list(pressure, n)
+        qc_index = item.get('qc_index')
+        self._buffer['series'].extend([serie] * n)
+        self._buffer['routine_name'].extend([routine_name] * n)
+        self._buffer['qc_index'].extend([qc_index] * n)
+        self._buffer['parameter'].extend([parameter] * n)
+        self._buffer['flag'].extend([flag] * n)
+        self._buffer['pressure'].extend(pressure)
+        self._buffer['value'].extend(values)
+        self._buffered_rows += n
+        if self._buffered_rows >= self.batch_size:
+            self.flush()
+
+    def add_etc(self, value):
+        """Ignored, the table only holds flagged values."""
+
+    def _get_frame(self):
+        df = pd.DataFrame(self._buffer, columns=list(self.columns))
+        df['qc_index'] = df['qc_index'].astype('Int16')
+        df['pressure'] = df['pressure'].astype(float)
+        df['value'] = df['value'].astype(float)
+        for key in ('series', 'routine_name', 'parameter', 'flag'):
+            df[key] = df[key].astype(str)
+        return df
+
+    def flush(self):
+        """Write buffered rows to the file."""
+        if not self._buffered_rows and self._started:
+            return
+        df = self._get_frame()
+        if self.fmt == 'parquet':
+            self._write_parquet(df)
+        else:
+            df.to_csv(self.file_path, mode='a' if self._started else 'w',
+                      header=not self._started, index=False)
+        self._started = True
+        self._buffer = {key: [] for key in self.columns}
+        self._buffered_rows = 0
+
+    def _write_parquet(self, df):
+        table = self._pa.Table.from_pandas(df, schema=self._schema,
+                                           preserve_index=False)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = self._pq.ParquetWriter(self.file_path,
+                                                  self._schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        """Write remaining rows and close the file."""
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def _import_pyarrow():
+    """Return (pyarrow, pyarrow.parquet), an optional dependency."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(
+            'pyarrow is needed for QC log tables in parquet format, install '
+            'it or use the csv format') from e
+    return pa, pq
+
+
+def _get_length(values):
+    return len(values) if isinstance(values, (list, tuple, np.ndarray)) else 0
+
+
+def _as_float_list(values, n):
+    """Return values as a list of n floats, NaN if values are missing."""
+    if _get_length(values) != n:
+        return [np.nan] * n
+    return [np.nan if v is None else float(v) for v in values]
+
+
+def read_log_table(file_path, columns=None, filters=None):
+    """Return a QC log table written by TabularLogSink as pd.DataFrame.
+
+    Args:
+        file_path (str | Path): Parquet or CSV file.
+        columns (list): Columns to read.
+        filters (list): Parquet row filters, eg.
+                        [('parameter', '==', 'DOXY_CTD')]. For CSV files
+                        the filters are applied after reading.
+    """
+    file_path = Path(file_path)
+    if file_path.suffix.lower() == '.parquet':
+        _import_pyarrow()
+        return pd.read_parquet(file_path, columns=columns, filters=filters)
+    df = pd.read_csv(file_path, dtype={
+        'series': str, 'routine_name': str, 'parameter': str, 'flag': str,
+        'qc_index': 'Int16'})
+    for key, op, value in filters or ():
+        df = df[_FILTER_OPERATORS[op](df[key], value)]
+    if columns:
+        df = df[list(columns)]
+    return df.reset_index(drop=True)
+
+
+_FILTER_OPERATORS = {
+    '==': lambda serie, value: serie == value,
+    '!=': lambda serie, value: serie != value,
+    '<': lambda serie, value: serie < value,
+    '<=': lambda serie, value: serie <= value,
+    '>': lambda serie, value: serie > value,
+    '>=': lambda serie, value: serie >= value,
+    'in': lambda serie, value: serie.isin(value),
+    'not in': lambda serie, value: ~serie.isin(value),
+}
+
+
+def iter_records(file_path):
+    """Yield the records of a JSON Lines QC log."""
+    with open(file_path, encoding='utf8') as fd:
+        for line in fd:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _get_serie_offsets(file_path):
+    """Return {serie: [byte offsets of its records]} of a JSON Lines log."""
+    offsets = {}
+    with open(file_path, 'rb') as fd:
+        offset = 0
+        for line in fd:
+            if line.strip():
+                record = json.loads(line)
+                key = 'etc' if 'etc' in record else record['serie']
+                offsets.setdefault(key, []).append(offset)
+            offset += len(line)
+    return offsets
+
+
+def _read_serie(fd, key, offsets):
+    """Return the nested QcLog entry of one serie from its records."""
+    if key == 'etc':
+        item = []
+    else:
+        item = {}
+    for offset in offsets:
+        fd.seek(offset)
+        record = json.loads(fd.readline())
+        if 'etc' in record:
+            item.append(record['etc'])
+            continue
+        item.setdefault(record['routine_name'], {}).setdefault(
+            record['parameter'], {}).setdefault(
+            record['flag'], {}).update(record['item'])
+    return item
+
+
+def write_yaml_log(stream_path, yaml_path):
+    """Write a JSON Lines QC log as yaml, in the layout of QcLog.write.
+
+    Only the records of one serie are held in memory at a time. The file is
+    read twice: first to index the records of every serie, then to write
+    the series one by one in sorted order.
+    """
+    offsets = _get_serie_offsets(stream_path)
+    with open(stream_path, 'rb') as fd, \
+            open(yaml_path, 'w', encoding='utf8') as out:
+        if not offsets:
+            yaml.dump({}, out, Dumper=_YamlDumper)
+            return
+        for key in sorted(offsets):
+            yaml.dump(
+                {key: _read_serie(fd, key, offsets[key])},
+                out,
+                Dumper=_YamlDumper,
+                indent=4,
+                width=120,
+                default_flow_style=False,
+            )
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Manifest of the profiles completed by a QC run."""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+class RunManifest:
+    """On-disk record of the profiles that a QC run has completed.
+
+    One JSON line is appended (and synced to disk) per completed profile,
+    so a run that crashes can be resumed without QC-ing the completed
+    profiles again. A profile counts as completed if the input file is
+    unchanged (size and modification time), the run has the same settings
+    and the output file exists. The settings are the arguments of the run
+    and, if given, the content of the settings files: changing a threshold
+    in a yaml file or the advanced QC specification makes all profiles
+    pending again.
+    """
+
+    def __init__(self, file_path, config=None, settings=None):
+        """Initiate.
+
+        Args:
+            file_path (str | Path): JSON Lines file of the manifest.
+            config (dict): Settings of the run (see SessionQC.config).
+                           Profiles completed with other settings are not
+                           counted as completed.
+            settings (Settings): Settings object of the run, its source
+                                 files and repository version are part of
+                                 the settings of the run.
+        """
+        self.file_path = Path(file_path)
+        self.config_key = get_config_key(config, settings=settings)
+        self.completed = {}
+        # False if the last line is truncated
+        self._at_line_start = True
+        if self.file_path.exists():
+            self._read()
+
+    def _read(self):
+        with open(self.file_path, encoding='utf8') as fd:
+            for line in fd:
+                self._at_line_start = line.endswith('\n')
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Last line of a crashed run
+                    continue
+                self.completed[record['path']] = record
+
+    def is_completed(self, path):
+        """Return True if the file has been QC-ed with the same settings."""
+        record = self.completed.get(str(Path(path).resolve()))
+        if record is None or record.get('config') != self.config_key:
+            return False
+        if record.get('stat') != get_file_stat(path):
+            return False
+        return Path(record.get('out_path', '')).exists()
+
+    def get_pending(self, file_paths):
+        """Return the file paths that are not completed."""
+        return [path for path in file_paths if not self.is_completed(path)]
+
+    def add(self, path, out_path):
+        """Record a completed profile."""
+        record = {
+            'path': str(Path(path).resolve()),
+            'out_path': str(Path(out_path).resolve()),
+            'stat': get_file_stat(path),
+            'config': self.config_key,
+        }
+        self.completed[record['path']] = record
+        with open(self.file_path, 'a', encoding='utf8') as fd:
+            if not self._at_line_start:
+                fd.write('\n')
+                self._at_line_start = True
+            fd.write(json.dumps(record))
+            fd.write('\n')
+            fd.flush()
+            os.fsync(fd.fileno())
+
+    def reset(self):
+        """Forget all completed profiles."""
+        self.completed = {}
+        self._at_line_start = True
+        if self.file_path.exists():
+            self.file_path.unlink()
+
+
+def get_file_stat(path):
+    """Return [size, modification time in ns] of a file."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def get_config_key(config, settings=None):
+    """Return a short hash of the settings of a run.
+
+    Args:
+        config (dict): Arguments of the run (see SessionQC.config).
+        settings (Settings): Adds the size and modification time of the
+                             settings files (see Settings.source_paths) and
+                             the repository version.
+    """
+    config = dict(config or {})
+    if settings is not None:
+        config['repo_version'] = settings.repo_version
+        config['sources'] = {
+            str(Path(path).resolve()): get_file_stat(path)
+            for path in settings.source_paths
+        }
+    text = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf8')).hexdigest()[:16]
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Month and season overrides of the advanced QC specification."""
+from types import MappingProxyType
+import pandas as pd
+
+SEASONS = {
+    1: 'winter',
+    2: 'winter',
+    3: 'spring',
+    4: 'spring',
+    5: 'spring',
+    6: 'summer',
+    7: 'summer',
+    8: 'summer',
+    9: 'autumn',
+    10: 'autumn',
+    11: 'autumn',
+    12: 'winter'
+}
+
+
+def get_month_key(month):
+    """Return month as table key, eg. 4, '4', 4.0 --> '4'."""
+    return str(int(float(month)))
+
+
+class OverrideTable:
+    """Precomputed advanced routine settings for every (area, month).
+
+    The table is built once from the routine sheets of an advanced QC
+    specification. Resolving the settings of a profile is then a dictionary
+    lookup:
+        {routine: {parameter: {setting: value}}}
+    Every routine of the specification is present in the result, with an
+    empty mapping if nothing is specified for the area and month.
+    The settings are returned as read-only mappings, shared between calls.
+    """
+
+    def __init__(self, routines):
+        """Initiate."""
+        self.routines = list(routines)
+        self.table = {}
+        self._empty = {routine: {} for routine in self.routines}
+        # Read-only views of the table, by key
+        self._views = {}
+
+    def get(self, area, month):
+        """Return the settings of the given area and month (read-only)."""
+        key = (area, get_month_key(month))
+        if key not in self._views:
+            self._views[key] = _get_read_only(
+                self.table.get(key, self._empty))
+        return self._views[key]
+
+    def _add(self, area, month, routine, parameter, values):
+        key = (area, get_month_key(month))
+        self._views.pop(key, None)
+        if key not in self.table:
+            self.table[key] = {r: {} for r in self.routines}
+        self.table[key][routine][parameter] = values
+
+    @staticmethod
+    def _get_records(item, exclude):
+        """Return (parameter, row) records with native python values."""
+        cols = [c for c in item.columns if c not in exclude]
+        records = item[cols].to_dict('records')
+        return zip(item.index, item.to_dict('records'), records)
+
+    @classmethod
+    def from_month_lists(cls, data):
+        """Return table of a specification with a MONTH_LIST column.
+
+        As the smhi_expedition spec, where each row holds AREA_NAME and a
+        list of months (MONTH_LIST, eg. ['12', '1', '2']).
+        """
+        table = cls(data)
+        for routine, item in data.items():
+            for parameter, row, values in cls._get_records(
+                    item, ('AREA_NAME', 'SEASON')):
+                months = row['MONTH_LIST']
+                if not isinstance(months, list):
+                    continue
+                for month in filter(None, months):
+                    table._add(row['AREA_NAME'], month, routine, parameter,
+                               values)
+        return table
+
+    @classmethod
+    def from_seasons(cls, data, seasons=None):
+        """Return table of a specification with SEASON and MONTHS columns.
+
+        As the area_specific_qc-*.xlsx specs. For every month the settings
+        of its season apply, overwritten by rows where the month is given
+        explicitly in MONTHS (eg. '4; 5').
+        """
+        seasons = seasons or SEASONS
+        table = cls(data)
+        exclude = ('MONTHS', 'AREA_NAME', 'SEASON')
+        for routine, item in data.items():
+            records = list(cls._get_records(item, exclude))
+            for parameter, row, values in records:
+                for month, season in seasons.items():
+                    if row.get('SEASON') == season:
+                        table._add(row['AREA_NAME'], month, routine,
+                                   parameter, values)
+            if 'MONTHS' not in item.columns:
+                continue
+            for parameter, row, values in records:
+                for month in _parse_months(row['MONTHS']):
+                    table._add(row['AREA_NAME'], month, routine, parameter,
+                               values)
+        return table
+
+
+def _get_read_only(item):
+    """Return read-only view of nested dictionaries."""
+    return MappingProxyType({
+        key: _get_read_only(value) if isinstance(value, dict) else value
+        for key, value in item.items()
+    })
+
+
+def _parse_months(item):
+    """Return months of a MONTHS cell, eg. '4; 5.0' --> [4, 5]."""
+    if not item or pd.isna(item):
+        return []
+    return [int(float(s.strip())) for s in str(item).split(';')]
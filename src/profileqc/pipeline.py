@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Read --> QC --> write pipeline for profile files."""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd
+from profileqc.chunked import read_metadata, get_parameter_mapping
+from profileqc.qc import _init_worker, _run_worker_task
+from profileqc.utils import QcLog
+
+
+class QcPipeline:
+    """Read --> QC --> write pipeline for directories of profile files.
+
+    Profiles are read in a thread, QC-ed in a pool of worker processes (each
+    with its own SessionQC, see SessionQC.run_many) and written in a thread,
+    so that disk reads, QC and writes overlap. The stages are connected by
+    bounded queues: the reader waits when max_pending profiles are read but
+    not yet QC-ed, and no more than workers profiles are QC-ed ahead of
+    the writer. Peak memory is therefore a few profiles, not the cruise.
+
+    Profiles are written, and their QC log merged into QcLog, in the order
+    of the files, which gives the same log as a serial run. Set a log sink
+    (see profileqc.log_sinks) to stream the log to disk as well.
+
+    On Windows (spawn start method) this must be called from within an
+    "if __name__ == '__main__':" block.
+
+    Example:
+        pipeline = QcPipeline(workers=4,
+                              advanced_settings_name='smhi_expedition')
+        with StreamingLogSink('qc_log.jsonl') as sink:
+            QcLog.set_sink(sink)
+            pipeline.run_directory('processed_data', 'qc_data')
+        QcLog.set_sink(None)
+    """
+
+    def __init__(self, workers=None, max_pending=2, routines=None,
+                 routine_settings=None, routine_path=None,
+                 advanced_settings_name=None, result_cache=None,
+                 parameter_mapping=None, reader=None, writer=None,
+                 on_written=None):
+        """Initiate.
+
+        Args:
+            workers (int): Number of QC processes, defaults to the number
+                           of CPUs.
+            max_pending (int): Number of read profiles waiting for QC.
+            parameter_mapping (dict | callable): Mapping used for all
+                profiles, or a function returning the mapping of a data
+                item. Defaults to the column names without unit (see
+                profileqc.chunked.get_parameter_mapping).
+            reader (callable): reader(path) --> {'data': pd.DataFrame,
+                               'metadata': pd.Series}. Defaults to
+                               read_profile.
+            writer (callable): writer(path, data_item). Defaults to
+                               write_profile.
+            on_written (callable): on_written(path, out_path), called when
+                                   a profile is written and its QC log
+                                   merged, eg. RunManifest.add.
+            Other arguments are passed on to SessionQC.
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.parameter_mapping = parameter_mapping
+        self.reader = reader or read_profile
+        self.writer = writer or write_profile
+        self.on_written = on_written
+        self.config = {
+            'routines': routines,
+            'routine_path': routine_path,
+            'routine_settings': routine_settings,
+            'advanced_settings_name': advanced_settings_name,
+            'result_cache': result_cache,
+        }
+
+    def run_directory(self, directory, out_directory, pattern='*.txt'):
+        """QC all files in directory matching pattern, see run.
+
+        Returns:
+            List of written files.
+        """
+        file_paths = sorted(Path(directory).glob(pattern))
+        return self.run_files(file_paths, out_directory)
+
+    def run_files(self, file_paths, out_directory):
+        """QC the given files in a new event loop, see run.
+
+        Returns:
+            List of written files.
+        """
+        return asyncio.run(self.run(file_paths, out_directory))
+
+    async def run(self, file_paths, out_directory):
+        """QC the given files and write them to out_directory.
+
+        Files are written with the same name as the input file.
+
+        Args:
+            file_paths (iterable): Paths of the profile files.
+            out_directory (str | Path): Directory of the QC-ed files.
+
+        Returns:
+            List of written files.
+        """
+        out_directory = Path(out_directory)
+        out_directory.mkdir(parents=True, exist_ok=True)
+        read_queue = asyncio.Queue(maxsize=self.max_pending)
+        workers = self.workers or os.cpu_count() or 1
+        # At most one profile per worker is QC-ed ahead of the writer
+        qc_queue = asyncio.Queue(maxsize=workers)
+        written = []
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(self.config,)) as executor:
+            try:
+                async with asyncio.TaskGroup() as group:
+                    group.create_task(self._read(file_paths, read_queue))
+                    group.create_task(
+                        self._qc(read_queue, qc_queue, executor))
+                    group.create_task(
+                        self._write(qc_queue, out_directory, written))
+            except ExceptionGroup as e:
+                # The other stages are cancelled, raise the first error
+                raise e.exceptions[0]
+        return written
+
+    async def _read(self, file_paths, queue):
+        """Read profiles and put them on queue."""
+        for path in file_paths:
+            path = Path(path)
+            item = await asyncio.to_thread(self.reader, path)
+            await queue.put((path, item))
+        await queue.put(None)
+
+    async def _qc(self, read_queue, qc_queue, executor):
+        """Send profiles to the worker processes.
+
+        The futures are put on qc_queue in the order of the files.
+        """
+        loop = asyncio.get_running_loop()
+        while (entry := await read_queue.get()) is not None:
+            path, item = entry
+            task = (path.stem, item, self.get_parameter_mapping(item))
+            future = loop.run_in_executor(executor, _run_worker_task, task)
+            await qc_queue.put((path, future))
+        await qc_queue.put(None)
+
+    async def _write(self, queue, out_directory, written):
+        """Write QC-ed profiles and merge their QC log, in file order."""
+        while (entry := await queue.get()) is not None:
+            path, future = entry
+            _, item, log = await future
+            out_path = out_directory.joinpath(path.name)
+            await asyncio.to_thread(self._write_profile, path, out_path,
+                                    item, log)
+            written.append(out_path)
+
+    def _write_profile(self, path, out_path, item, log):
+        self.writer(out_path, item)
+        QcLog.merge(log)
+        if self.on_written is not None:
+            self.on_written(path, out_path)
+
+    def get_parameter_mapping(self, item):
+        """Return the parameter mapping of a data item."""
+        if callable(self.parameter_mapping):
+            return self.parameter_mapping(item)
+        if self.parameter_mapping is not None:
+            return self.parameter_mapping
+        return get_parameter_mapping(item['data'].columns)
+
+
+def read_profile(path, sep='\t', encoding='cp1252'):
+    """Return a standard format file as data item.
+
+    {'data': pd.DataFrame, 'metadata': pd.Series}. Values are read as
+    strings, the way ctdpy reads standard format files.
+    """
+    metadata = read_metadata(path, encoding=encoding)
+    data = pd.read_csv(path, sep=sep, encoding=encoding,
+                       skiprows=len(metadata), dtype=str,
+                       keep_default_na=False)
+    return {'data': data, 'metadata': metadata}
+
+
+def write_profile(path, item, sep='\t', encoding='cp1252'):
+    """Write data item as standard format file, metadata rows first."""
+    with open(path, 'w', encoding=encoding, newline='') as fd:
+        for line in item['metadata']:
+            fd.write(f'{line}\n')
+        item['data'].to_csv(fd, sep=sep, index=False, lineterminator='\n')
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Execution plans of SessionQC."""
+from typing import NamedTuple
+from profileqc.flag_handler import FlagPropagation
+
+
+def resolve_parameters(item, columns, parameter_mapping):
+    """Return the parameter names of item that are found in columns.
+
+    The names are taken as they are if they exist in columns, otherwise
+    through parameter_mapping. Returns a dictionary with the resolved
+    'parameter' or 'parameters' of item, or None if they are not available.
+    Item is not changed.
+
+    Args:
+        item (dict): Dataset settings of a routine.
+        columns (set): Columns of the data.
+        parameter_mapping (dict): Eg. {'TEMP_CTD': 'TEMP_CTD [°C]'}
+    """
+    parameter_mapping = parameter_mapping or {}
+    parameter = item.get('parameter')
+    if parameter:
+        if parameter in columns:
+            return {'parameter': parameter}
+        mapped = parameter_mapping.get(parameter)
+        if mapped and mapped in columns:
+            return {'parameter': mapped}
+
+    parameters = item.get('parameters')
+    if parameters:
+        if all(p in columns for p in parameters):
+            return {'parameters': list(parameters)}
+        mapped = [parameter_mapping.get(p) for p in parameters]
+        if all(mapped) and all(p in columns for p in mapped):
+            return {'parameters': mapped}
+    return None
+
+
+class PlanStep(NamedTuple):
+    """One routine run of an ExecutionPlan."""
+
+    routine: str
+    qc_index: int
+    dataset: str
+    parameter: str = None
+    parameters: tuple = None
+    q_parameters: tuple = ()
+
+    @property
+    def columns(self):
+        """Return the data columns read by the step."""
+        if self.parameter:
+            return (self.parameter,)
+        return self.parameters or ()
+
+    def get_item(self, qc_setting):
+        """Return the dataset settings of the step with resolved parameters.
+
+        Args:
+            qc_setting (dict): Current settings of the routine, holding
+                               the threshold values of the dataset.
+        """
+        item = dict(qc_setting['datasets'][self.dataset])
+        if self.parameter:
+            item['parameter'] = self.parameter
+        if self.parameters:
+            item['parameters'] = list(self.parameters)
+        return item
+
+
+class ExecutionPlan:
+    """The routine runs that apply to data of a given column layout.
+
+    A plan only depends on the columns of the data, the parameter mapping
+    and the parameter layout of the settings (see Settings.layout_key), so
+    that it can be shared by all profiles with the same schema. Threshold
+    values are read from the current settings when the plan is run, since
+    these may differ between profiles (advanced QC).
+    """
+
+    def __init__(self, key, steps):
+        """Initiate."""
+        self.key = key
+        self.steps = tuple(steps)
+        self.columns = tuple(dict.fromkeys(
+            column for step in self.steps for column in step.columns))
+        self._propagations = {}
+        # FusedEngine of the plan, see SessionQC.get_engine
+        self.engine = None
+
+    @classmethod
+    def build(cls, settings, columns, parameter_mapping=None):
+        """Return plan of the given settings and columns."""
+        key = cls.get_key(settings, columns, parameter_mapping)
+        columns = set(columns)
+        steps = []
+        for qc_routine, qc_index in settings.qc_routines.items():
+            qc_setting = getattr(settings, qc_routine)
+            for dataset, item in qc_setting['datasets'].items():
+                resolved = resolve_parameters(item, columns,
+                                              parameter_mapping)
+                if resolved is None:
+                    continue
+                parameters = resolved.get('parameters')
+                steps.append(PlanStep(
+                    routine=qc_routine,
+                    qc_index=qc_index,
+                    dataset=dataset,
+                    parameter=resolved.get('parameter'),
+                    parameters=tuple(parameters) if parameters else None,
+                    q_parameters=tuple(item.get('q_parameters') or ()),
+                ))
+        return cls(key, steps)
+
+    @staticmethod
+    def get_key(settings, columns, parameter_mapping=None):
+        """Return the cache key of a plan."""
+        return (
+            tuple(columns),
+            tuple(sorted((parameter_mapping or {}).items())),
+            settings.layout_key,
+        )
+
+    def get_propagation(self, flag_columns):
+        """Return FlagPropagation of the steps for the given Q0-fields.
+
+        Compiled once per layout of Q0-fields.
+        """
+        flag_columns = tuple(flag_columns)
+        propagation = self._propagations.get(flag_columns)
+        if propagation is None:
+            propagation = FlagPropagation(
+                flag_columns,
+                [(step.q_parameters, step.qc_index) for step in self.steps])
+            self._propagations[flag_columns] = propagation
+        return propagation
+
+    def __iter__(self):
+        """Iterate over the steps."""
+        return iter(self.steps)
+
+    def __len__(self):
+        """Return number of steps."""
+        return len(self.steps)
@@ -7,12 +7,20 @@ Created on 2022-01-04 17:05
 @author: johannes
 """
 import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 from profileqc.config import Settings
+from profileqc.engine import FusedEngine, StepResult
+from profileqc.flag_handler import FlagMatrix, FLAG_CODES, get_flag_codes
+from profileqc.instrumentation import Probe, QcEvent
+from profileqc.plan import ExecutionPlan, resolve_parameters
+from profileqc.result_cache import get_fingerprint
 from profileqc.utils import (
     get_time_as_format,
     get_pressure_str,
     get_float_list,
+    to_float_array,
     get_parameter_str,
     QcLog
 )
@@ -37,6 +45,10 @@ class SessionQC:
         S: Suspicious value
         E: Suspect extreme value that is checked and OK. (not implemented)
         <: Value is under the limit of quantification. (not implemented)
+
+    With a result_cache (see profileqc.result_cache.ResultCache), a profile
+    that has been QC-ed before with the same data and routine settings gets
+    its Q0-flags and QC log from the cache, no routine is run.
     """
 
     meta_columns = {'YEAR', 'MONTH', 'DAY', 'HOUR', 'MINUTE', 'SECOND',
@@ -45,11 +57,19 @@ class SessionQC:
 
     default_comnt = '//COMNT_QC; AUTOMATIC QC PERFORMED BY {}; TIMESTAMP {}; {}'
 
+    # Number of execution plans (column layouts) kept in memory.
+    max_cached_plans = 32
+
     def __init__(self, data_item, parameter_mapping=None, routines=None,
                  routine_settings=None, routine_path=None, dataset_name=None,
-                 advanced_settings_name=None):
+                 advanced_settings_name=None, result_cache=None):
         """Initiate."""
         QcLog()
+        self._plans = {}
+        self._log_entries = None
+        self.result_cache = result_cache
+        self.hooks = []
+        self.working = None
         self.parameter_mapping = parameter_mapping
         if data_item:
             self.df = data_item.get('data')
@@ -82,99 +102,322 @@ class SessionQC:
         )
 
     def initialize_qc_object(self, setting, name, item):
-        """Return QC routine."""
-        return setting['routines'][name]['routine'](self.df, **item)
+        """Return QC routine, run on the float working frame."""
+        return setting['routines'][name]['routine'](self.working, **item)
+
+    def set_working_frame(self, columns):
+        """Parse the given columns of self.df to the float working frame.
+
+        self.working holds the columns as float64 (empty strings are NaN),
+        so that the values are parsed only once per profile, no matter how
+        many routines read them. Each column is contiguous in memory.
+        The pressure column of the parameter mapping is always included,
+        it is needed for the QC log.
+        """
+        columns = self.get_working_columns(columns)
+        values = np.empty((len(self.df), len(columns)), dtype=np.float64,
+                          order='F')
+        for i, key in enumerate(columns):
+            values[:, i] = to_float_array(self.df[key])
+        self.working = pd.DataFrame(values, columns=columns,
+                                    index=self.df.index, copy=False)
+
+    def get_working_columns(self, columns):
+        """Return the columns of the working frame, see set_working_frame."""
+        columns = list(columns)
+        pressure_key = (self.parameter_mapping or {}).get('PRES_CTD')
+        if pressure_key:
+            columns.append(pressure_key)
+        return [key for key in dict.fromkeys(columns) if key in self.df]
+
+    def get_plan(self):
+        """Return the execution plan of the current data.
+
+        Plans are cached per column layout and parameter mapping, so that
+        profiles with the same schema share one plan (see ExecutionPlan).
+        """
+        key = ExecutionPlan.get_key(self.settings, self.df.columns,
+                                    self.parameter_mapping)
+        plan = self._plans.get(key)
+        if plan is None:
+            if len(self._plans) >= self.max_cached_plans:
+                self._plans.pop(next(iter(self._plans)))
+            plan = ExecutionPlan.build(self.settings, self.df.columns,
+                                       self.parameter_mapping)
+            self._plans[key] = plan
+        return plan
+
+    def add_hook(self, hook):
+        """Add instrumentation hook.
+
+        hook(event) is called with a QcEvent for every routine run and for
+        the open, cache, close and sync phases of run(), eg. a QcStats.
+        Hooks are not passed on to the worker processes of run_many.
+        """
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """Remove instrumentation hook."""
+        self.hooks.remove(hook)
+
+    def _emit(self, event):
+        for hook in self.hooks:
+            hook(event)
+
+    def _run_phase(self, phase, func):
+        """Run func, reported as phase if there are hooks."""
+        if not self.hooks:
+            func()
+            return
+        probe = Probe()
+        func()
+        self._emit(probe.event(phase, self.dataset_name, rows=len(self.df)))
 
     def run(self):
         """Run QC routines."""
-        self._open_up_flag_fields()
-
-        for qc_routine, qc_index in self.settings.qc_routines.items():
-            qc_setting = getattr(self.settings, qc_routine)
-
-            for item in qc_setting['datasets'].values():
-
-                # Check if parameters exists
-                if not self.parameters_available(item):
-                    continue
-
-                # Check if data exists
-                if not self.data_available(item):
-                    continue
-
-                # Get QC routine
-                qc_func = self.initialize_qc_object(qc_setting, qc_routine,
-                                                    item)
-
-                # Run QC routine
-                qc_func()
-
-                # Check results and execute appropriate action (flag the data)
-                self.add_qflag(qc_func.flag_return, item.get('q_parameters'),
-                               qc_index)
-
-                if qc_func.inverted_boolean.any():
-                    # pressure_string = get_pressure_str(
-                    #     self.df.loc[
-                    #         qc_func.inverted_boolean,
-                    #         self.parameter_mapping.get('PRES_CTD')
-                    #     ]
-                    # )
-                    pressure_list = get_float_list(
-                        self.df.loc[
-                            qc_func.inverted_boolean,
-                            self.parameter_mapping.get('PRES_CTD')
-                        ]
-                    )
-
-                    para_string = get_parameter_str(item)
-                    para_data_list = self._get_parameter_diff_list(para_string, qc_func)
-                    if not para_data_list:
-                        try:
-                            para_data_list = get_float_list(
-                                self.df.loc[
-                                    qc_func.inverted_boolean,
-                                    self.parameter_mapping.get(para_string)
-                                ]
-                            )
-                        except KeyError as e:
-                            logger.info(f'-No parameter_mapping found for key: {para_string}')
-                            logger.debug(f'   = {item=}')
-                            logger.debug(f'   - {para_string=}')
-                            logger.debug(f'   - {self.parameter_mapping.get(para_string)=}')
-
-                    QcLog.update_info(
-                        serie=self.dataset_name,
-                        routine_name=qc_routine,
-                        parameter=para_string,
-                        pressure=pressure_list,
-                        parameter_data=para_data_list,
-                        # pressure=pressure_string,
-                        flag=str(qc_func.q_flag),
-                        qc_index=qc_index,
-                        info=f'Flagged with: {qc_func.q_flag}'
-                    )
-
-        self._close_flag_fields()
-        self.synchronize_flag_fields()
+        run_probe = Probe(trace_memory=False) if self.hooks else None
+        plan = self.get_plan()
+        step_items = [step.get_item(getattr(self.settings, step.routine))
+                      for step in plan]
+
+        key = result = None
+        if self.result_cache is not None:
+            key = get_fingerprint(self.df, list(zip(plan, step_items)),
+                                  self.settings, self.parameter_mapping)
+            result = self.result_cache.get(key)
+
+        if result is not None:
+            self._run_phase('cache', lambda: self.set_result(result))
+        else:
+            self._log_entries = [] if key is not None else None
+            self._run_phase('open', self._open_up_flag_fields)
+            self.run_steps(plan, step_items)
+
+        self._run_phase('close', self._close_flag_fields)
+        self._run_phase('sync', self.synchronize_flag_fields)
+        if key is not None and result is None:
+            self.result_cache.put(key, self.get_result())
+            self._log_entries = None
         self.append_qc_comment()
+        if run_probe is not None:
+            self._emit(run_probe.event('run', self.dataset_name,
+                                       rows=len(self.df)))
+
+    def run_steps(self, plan, step_items):
+        """Run the steps of the plan that have data and flag self.flags.
+
+        Args:
+            plan (ExecutionPlan): Plan of self.df.
+            step_items (list): Dataset settings of each step of the plan.
+        """
+        self.set_working_frame(plan.columns)
+
+        items = {}
+        for i, item in enumerate(step_items):
+            # Check if data exists
+            if self.data_available(item):
+                items[i] = item
+
+        results = self.evaluate_steps(plan, items, measure=bool(self.hooks))
+
+        # Flags of each step, propagated to the Q0-fields after all steps
+        source_codes = np.zeros((len(self.df), len(plan)), dtype=np.uint8)
+        active = np.zeros(len(plan), dtype=bool)
+        for i, result in results.items():
+            step = plan.steps[i]
+            source_codes[:, i] = result.codes
+            active[i] = True
+
+            if result.flagged.any():
+                self.log_flags(step.routine, step.qc_index, items[i],
+                               result.q_flag, result.flagged)
+
+            if self.hooks:
+                n_flagged = int(np.count_nonzero(result.flagged))
+                self._emit(QcEvent(
+                    serie=self.dataset_name, phase='routine',
+                    seconds=result.seconds, routine=step.routine,
+                    dataset=step.dataset, rows=len(self.df),
+                    flagged={result.q_flag: n_flagged} if n_flagged else {},
+                    nbytes=result.nbytes
+                ))
+
+        self.flags.propagate(
+            source_codes, plan.get_propagation(self.flags.columns), active)
+
+    def get_result(self):
+        """Return the QC result of the last run for the result cache.
+
+        The Q-fields are not stored, they follow from the Q0-fields (see
+        synchronize_flag_fields).
+        """
+        return {
+            'columns': self.flags.columns,
+            'codes': self.flags.codes,
+            'touched': sorted(self.flags.touched),
+            'reset_keys': list(self._reset_flag_keys),
+            'log': self._log_entries or [],
+        }
+
+    def set_result(self, result):
+        """Set a QC result of get_result as the flags of self.df.
+
+        The QC log entries of the result are added under self.dataset_name.
+        """
+        self._reset_flag_keys = dict.fromkeys(result['reset_keys'])
+        self.flags = FlagMatrix(result['columns'], len(self.df),
+                                self.settings.number_of_routines,
+                                codes=result['codes'].copy())
+        self.flags.touched.update(result['touched'])
+        for entry in result['log']:
+            QcLog.update_info(serie=self.dataset_name, **entry)
+
+    def get_engine(self, plan):
+        """Return the FusedEngine of the plan, created once per plan."""
+        if plan.engine is None:
+            plan.engine = FusedEngine(plan, self.settings)
+        return plan.engine
+
+    def evaluate_steps(self, plan, items, measure=False):
+        """Run the given steps of the plan on the float working frame.
+
+        Steps with a routine kernel are evaluated column by column by the
+        FusedEngine of the plan, other routines are initiated and run one by
+        one.
+
+        Args:
+            plan (ExecutionPlan): Plan of self.df.
+            items (dict): {step index: dataset settings} of the steps to run.
+            measure (bool): Measure the time (and memory) of each step.
+
+        Returns:
+            {step index: StepResult}, in plan order.
+        """
+        engine = self.get_engine(plan)
+        timings = {} if measure else None
+        nbytes = {} if measure else None
+        passed = engine.evaluate(self.working, items, timings=timings,
+                                 nbytes=nbytes)
+
+        results = {}
+        for i, item in items.items():
+            step = plan.steps[i]
+            if i in passed:
+                q_flag = engine.get_q_flag(i, item)
+                flagged = ~passed[i]
+                codes = np.where(flagged, FLAG_CODES.get(q_flag, 0),
+                                 FLAG_CODES['A']).astype(np.uint8)
+                results[i] = StepResult(
+                    codes, flagged, q_flag,
+                    seconds=timings.get(i, 0.) if measure else None,
+                    nbytes=nbytes.get(i) if measure else None)
+                continue
+
+            probe = Probe() if measure else None
+            qc_setting = getattr(self.settings, step.routine)
+            qc_func = self.initialize_qc_object(qc_setting, step.routine,
+                                                item)
+            qc_func()
+            result = StepResult(
+                get_flag_codes(qc_func.flag_return),
+                np.asarray(qc_func.inverted_boolean, dtype=bool),
+                str(qc_func.q_flag))
+            if probe is not None:
+                event = probe.event('routine', self.dataset_name)
+                result = result._replace(seconds=event.seconds,
+                                         nbytes=event.nbytes)
+            results[i] = result
+        return results
+
+    def log_flagged(self, qc_routine, qc_index, item, qc_func, boolean,
+                    serie=None, rows=None):
+        """Add flagged values of a QC routine to the QC log.
+
+        Args:
+            qc_routine (str): Name of QC routine.
+            qc_index (int): Position in the Q0-string.
+            item (dict): Dataset settings of the routine.
+            qc_func: The QC routine object that has been run.
+            boolean (array like): True for the flagged values.
+            serie (str): Name of serie. Defaults to self.dataset_name.
+            rows (slice): Rows of self.df that boolean corresponds to.
+        """
+        self.log_flags(qc_routine, qc_index, item, str(qc_func.q_flag),
+                       boolean, serie=serie, rows=rows)
+
+    def log_flags(self, qc_routine, qc_index, item, q_flag, boolean,
+                  serie=None, rows=None):
+        """Add flagged values to the QC log, see log_flagged.
+
+        Args:
+            q_flag (str): Flag of the flagged values, eg. 'B'.
+        """
+        para_string, pressure_list, para_data_list = self.get_flagged_lists(
+            item, boolean, rows=rows)
+
+        entry = dict(
+            routine_name=qc_routine,
+            parameter=para_string,
+            pressure=pressure_list,
+            parameter_data=para_data_list,
+            # pressure=pressure_string,
+            flag=q_flag,
+            qc_index=qc_index,
+            info=f'Flagged with: {q_flag}'
+        )
+        if self._log_entries is not None:
+            # Kept for the result cache
+            self._log_entries.append(entry)
+        QcLog.update_info(serie=serie or self.dataset_name, **entry)
+
+    def get_flagged_lists(self, item, boolean, rows=None):
+        """Return the flagged values of a routine run for the QC log.
 
-    def _get_parameter_diff_list(self, para_string, qc_func):
+        Returns:
+            (parameter string, flagged pressure list, flagged value list)
+            The value list is False if no values are found.
+        """
+        pressure_list = self._get_flagged_list(
+            self.parameter_mapping.get('PRES_CTD'), boolean, rows=rows)
+
+        para_string = get_parameter_str(item)
+        para_data_list = self._get_parameter_diff_list(para_string, boolean,
+                                                       rows=rows)
+        if not para_data_list:
+            try:
+                para_data_list = self._get_flagged_list(
+                    self.parameter_mapping.get(para_string), boolean,
+                    rows=rows)
+            except KeyError:
+                logger.info(f'-No parameter_mapping found for key: {para_string}')
+                logger.debug(f'   = {item=}')
+                logger.debug(f'   - {para_string=}')
+                logger.debug(f'   - {self.parameter_mapping.get(para_string)=}')
+        return para_string, pressure_list, para_data_list
+
+    def _get_flagged_list(self, key, boolean, rows=None):
+        """Return flagged values of self.df[key] as a list of floats.
+
+        Read from the float working frame if the column is there.
+        """
+        if key in self.working:
+            values = self.working[key].to_numpy()
+            if rows is not None:
+                values = values[rows]
+            return values[np.asarray(boolean)].tolist()
+        serie = self.df[key]
+        if rows is not None:
+            serie = serie.iloc[rows]
+        return get_float_list(serie[np.asarray(boolean)])
+
+    def _get_parameter_diff_list(self, para_string, boolean, rows=None):
         if '-' not in para_string:
             return False
         par1, par2 = [par.strip() for par in para_string.split('-')]
-        par1_data_list = get_float_list(
-            self.df.loc[
-                qc_func.inverted_boolean,
-                self.parameter_mapping.get(par1)
-            ]
-        )
-        par2_data_list = get_float_list(
-            self.df.loc[
-                qc_func.inverted_boolean,
-                self.parameter_mapping.get(par2)
-            ]
-        )
+        par1_data_list = self._get_flagged_list(
+            self.parameter_mapping.get(par1), boolean, rows=rows)
+        par2_data_list = self._get_flagged_list(
+            self.parameter_mapping.get(par2), boolean, rows=rows)
         return [p1-p2 for p1, p2 in zip(par1_data_list, par2_data_list)]
 
     def synchronize_flag_fields(self):
@@ -192,39 +435,32 @@ class SessionQC:
         A-flags will not be visible in primary flag field.
         During manual quality control we only change the primary flag field.
         """
-        q0_fields = iter(q for q in self.df.columns if q.startswith('Q0_'))
-
-        for q0_key in q0_fields:
+        max_codes = self.flags.get_max_codes()
+        for q0_key, i in self.flags.column_index.items():
             primary_q_key = q0_key.replace('Q0_', 'Q_')
             for f in ('S', 'B'):
-                self._sync_flag(q0_key, primary_q_key, f)
+                self._sync_flag(max_codes[:, i], primary_q_key, f)
 
-    def _sync_flag(self, q0_key, q_key, flag):
+    def _sync_flag(self, max_codes, q_key, flag):
         """Set flag to flag field."""
-        boolean = self.df[q0_key].str.contains(flag, regex=False)
+        boolean = max_codes == FLAG_CODES[flag]
         if boolean.any():
             self.df.loc[boolean, q_key] = flag
 
-    def add_qflag(self, flag_field, q_flag_keys, qc_index):
+    def add_qflag(self, flag_field, q_flag_keys, qc_index, rows=None):
         """Add flag to the correct index.
 
+        Flags are merged into the Q0-flag matrix (see self.flags) with
+        the precedence 0 < A < S < B.
+
         Args:
-            flag_field (list): eg. ['0', '0', '0', '0', '0']
+            flag_field (list): eg. ['A', 'A', 'B', 'S', 'A']
             q_flag_keys (list): Data q-flag keys
                                 eg. ['Q0_TEMP_CTD', 'Q0_DENS_CTD'].
             qc_index (int): index of flag_field (list).
+            rows (array like): Boolean row mask, only flag these rows.
         """
-        for flag_key in q_flag_keys:
-            if flag_key not in self.df:
-                continue
-
-            for qf_list, qf in zip(self.df[flag_key], flag_field):
-                if qf_list[qc_index] == '0' or qf_list[qc_index] == 'A':
-                    qf_list[qc_index] = qf
-                elif qf_list[qc_index] == 'S' and qf == 'B':
-                    qf_list[qc_index] = qf
-                elif qf == 'S':  # qf_list[qc_index] != 'B'
-                    qf_list[qc_index] = qf
+        self.flags.merge(flag_field, q_flag_keys, qc_index, rows=rows)
 
     def set_qc0_standard_format(self, key=None):
         """Set default QC0 format."""
@@ -233,68 +469,80 @@ class SessionQC:
     def _open_up_flag_fields(self):
         """Open up QC0-flag field.
 
-        Convert string format to list format.
-        Eg. ['AAAAA', 'BSAAA'] --> [['A', 'A', 'A', 'A', 'A'],
-                                    ['B', 'S', 'A', 'A', 'A']]
+        Convert string format to the uint8 code matrix self.flags.
+        Eg. ['AAAAA', 'BSAAA'] --> [[1, 1, 1, 1, 1],
+                                    [3, 2, 1, 1, 1]]
         """
-        for key in self.df:
+        q0_keys, reset_keys = self.get_flag_fields(self.df)
+        self._reset_flag_keys = reset_keys
+        self.flags = FlagMatrix.from_frame(
+            self.df, q0_keys, self.settings.number_of_routines,
+            reset_columns=reset_keys
+        )
+
+    @classmethod
+    def get_flag_fields(cls, df):
+        """Return the Q0-fields of df and the ones that need a reset.
+
+        Returns:
+            (list of all Q0-fields, dict of Q0-fields that are missing in
+            df or not in the Q0-string format)
+        """
+        reset_keys = {}
+        for key in df:
             key = key.split(' ')[0]
-            if key not in self.meta_columns:
+            if key not in cls.meta_columns:
                 if not key.startswith('Q'):
-                    if 'Q0_' + key not in self.df:
-                        self.set_qc0_standard_format(key='Q0_' + key)
+                    if 'Q0_' + key not in df:
+                        reset_keys.setdefault('Q0_' + key)
                 elif key.startswith('Q0_'):
-                    if not type(self.df[key][0]) == str:
+                    if not type(df[key].iloc[0]) == str:
                         # In case we have a column for the QC-0 flags
                         # but not the correct format ('xxxxx').
-                        self.set_qc0_standard_format(key=key)
-                    elif not len(self.df[key][0]):
-                        self.set_qc0_standard_format(key=key)
+                        reset_keys.setdefault(key)
+                    elif not len(df[key].iloc[0]):
+                        reset_keys.setdefault(key)
 
-        for q_key in self.df:
-            if q_key.startswith('Q0_'):
-                self.df[q_key] = self.df[q_key].apply(list)
+        q0_keys = [key for key in df if key.startswith('Q0_')]
+        q0_keys.extend(key for key in reset_keys if key not in df)
+        return q0_keys, reset_keys
 
     def _close_flag_fields(self):
         """Close down QC0-flag field.
 
-        Convert list format to string format.
-        Eg. [['A', 'A', 'A', 'A', 'A'],
-             ['B', 'S', 'A', 'A', 'A']] --> ['AAAAA', 'BSAAA']
+        Convert the code matrix back to string format.
+        Eg. [[1, 1, 1, 1, 1],
+             [3, 2, 1, 1, 1]] --> ['AAAAA', 'BSAAA']
+        Strings are only rebuilt for the Q0-fields that have been flagged,
+        untouched fields are either kept as is or set to the default format.
         """
-        for q_key in self.df:
-            if q_key.startswith('Q0_'):
-                self.df[q_key] = self.df[q_key].apply(''.join)
+        touched = set(self.flags.touched_columns)
+        for q_key in self.flags.columns:
+            if q_key in touched:
+                self.df[q_key] = self.flags.get_strings(q_key)
+            elif q_key in self._reset_flag_keys:
+                self.set_qc0_standard_format(key=q_key)
+
+    def resolve_parameters(self, item):
+        """Return copy of item with parameter(s) as named in self.df.
+
+        None if the parameter(s) do not exist in self.df. Item is not
+        changed.
+        """
+        resolved = resolve_parameters(item, self.df.columns,
+                                      self.parameter_mapping)
+        if resolved is None:
+            return None
+        return {**item, **resolved}
 
     def parameters_available(self, item):
         """Check if parameter(s) exists in self.df."""
-        if item.get('parameter'):
-            if item.get('parameter') in self.df:
-                return True
-            if self.parameter_mapping.get(item['parameter']):
-                new_param = self.parameter_mapping.get(item['parameter'])
-                if new_param in self.df:
-                    item['parameter'] = new_param
-                    return True
-
-        if item.get('parameters'):
-            if all(x in self.df for x in item.get('parameters')):
-                return True
-            mapped = [self.parameter_mapping.get(p) for p in
-                      item.get('parameters')]
-            if all(mapped):
-                if all(x in self.df for x in mapped):
-                    item['parameters'] = mapped
-                    return True
+        return resolve_parameters(item, self.df.columns,
+                                  self.parameter_mapping) is not None
 
     def data_available(self, item):
         """Check if the parameter(s) in self.df have any data."""
         if item.get('parameter'):
-
-            print(f"{item.get('parameter')=}")
-            print(f"{self.df[item.get('parameter')]=}")
-            print(f"{type(self.df[item.get('parameter')])=}")
-            print(f"{self.df[item.get('parameter')].any()=}")
             if self.df[item.get('parameter')].any():
                 return True
 
@@ -309,6 +557,71 @@ class SessionQC:
             self.settings.user, time_stamp, self.settings.repo_version
         )
 
+    @property
+    def config(self):
+        """Return the arguments needed to set up an equal SessionQC."""
+        return {
+            'routines': self.routines,
+            'routine_path': self.routine_path,
+            'routine_settings': self.routine_settings,
+            'advanced_settings_name': self.advanced_settings_name,
+            'result_cache': self.result_cache,
+        }
+
+    def run_profile(self, data_item, parameter_mapping=None,
+                    dataset_name=None):
+        """Update data, update routine settings and run QC for one profile."""
+        self.update_data(data_item, parameter_mapping=parameter_mapping,
+                         dataset_name=dataset_name)
+        if self.settings.advanced_spec:
+            self.update_routines()
+        self.run()
+        return data_item
+
+    def run_many(self, datasets, workers=None, parameter_mapping=None,
+                 chunksize=1):
+        """Run QC for many profiles, in parallel processes if workers > 1.
+
+        Each worker process sets up its own SessionQC (settings and advanced
+        QC specification are loaded once per worker). The QC log of every
+        profile is merged back into QcLog in the order of datasets, which
+        gives the same log as a serial run.
+
+        On Windows (spawn start method) this must be called from within an
+        "if __name__ == '__main__':" block.
+
+        Args:
+            datasets (dict): {name: {'data': pd.DataFrame,
+                                     'metadata': pd.Series}}
+            workers (int): Number of processes. None or 1 runs serially in
+                           this process.
+            parameter_mapping (dict | callable): Mapping used for all
+                profiles, or a function returning the mapping of a data item.
+            chunksize (int): Number of profiles sent to a worker at a time.
+
+        Returns:
+            datasets, where every data item is replaced by its QC-ed copy.
+        """
+        tasks = [
+            (name, item, parameter_mapping(item)
+             if callable(parameter_mapping) else parameter_mapping)
+            for name, item in datasets.items()
+        ]
+        if not workers or workers == 1:
+            for name, item, mapping in tasks:
+                self.run_profile(item, parameter_mapping=mapping,
+                                 dataset_name=name)
+            return datasets
+
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(self.config,)) as executor:
+            for name, item, log in executor.map(_run_worker_task, tasks,
+                                                chunksize=chunksize):
+                datasets[name] = item
+                QcLog.merge(log)
+        return datasets
+
     def reset_log(self):
         """Reset log."""
         QcLog.update_info(reset_log=True)
@@ -320,6 +633,30 @@ class SessionQC:
             self.reset_log()
 
 
+_worker_session = None
+
+
+def _init_worker(config):
+    """Set up the SessionQC of a worker process."""
+    global _worker_session
+    # The log of each profile is returned to the parent process, never
+    # written to a sink inherited from it.
+    QcLog.set_sink(None)
+    _worker_session = SessionQC(None, **config)
+
+
+def _run_worker_task(task):
+    """Run QC for one profile in a worker process.
+
+    Returns the QC-ed data item together with the QC log of the profile.
+    """
+    name, item, parameter_mapping = task
+    QcLog.update_info(reset_log=True)
+    _worker_session.run_profile(item, parameter_mapping=parameter_mapping,
+                                dataset_name=name)
+    return name, item, QcLog.log
+
+
 if __name__ == "__main__":
     df = {'metadata': pd.Series([1, 2, 3, 4, 5]),
           'data': pd.DataFrame({'a': [1, 2, 3, 4, 5]})}
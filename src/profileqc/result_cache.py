@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Content-addressed cache of QC results."""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import zlib
+from pathlib import Path
+import numpy as np
+from profileqc import utils
+
+logger = logging.getLogger(__file__)
+
+# Increase when the layout of the cached results or the fingerprint changes.
+CACHE_VERSION = 1
+
+
+class ResultCache:
+    """Content-addressed on-disk cache of QC results.
+
+    A result holds the Q0- and Q-fields written by SessionQC.run and the
+    QC log entries of the profile, stored under the fingerprint of the
+    data and the settings (see get_fingerprint). Results are evicted least
+    recently used first when the files of the cache exceed max_bytes. A hit
+    renews the modification time of the file, which is what eviction is
+    based on, so the cache can be shared by many processes.
+
+    Example:
+        qc_run = SessionQC(None, advanced_settings_name='smhi_expedition',
+                           result_cache=ResultCache(max_bytes=2 ** 30))
+    """
+
+    suffix = '.qcresult'
+
+    def __init__(self, folder=None, max_bytes=512 * 2 ** 20):
+        """Initiate.
+
+        Args:
+            folder (str | Path): Folder of the cache. Defaults to "results"
+                                 in utils.get_cache_folder().
+            max_bytes (int): Maximum size of the cached files.
+        """
+        self.folder = Path(folder or utils.get_cache_folder().joinpath(
+            'results'))
+        self.max_bytes = max_bytes
+        self._size = None
+
+    def get_path(self, key):
+        """Return path of the result with the given fingerprint."""
+        return self.folder.joinpath(f'{key}{self.suffix}')
+
+    def get(self, key):
+        """Return the cached result of a fingerprint, None if not cached."""
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as fd:
+                result = pickle.loads(zlib.decompress(fd.read()))
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.info(f'Could not load cached result {path}: {e}')
+            return None
+        if result.get('version') != CACHE_VERSION:
+            return None
+        return result
+
+    def put(self, key, result):
+        """Store result under the fingerprint and evict old results.
+
+        Failure is logged, not raised.
+        """
+        path = self.get_path(key)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        data = zlib.compress(pickle.dumps(
+            dict(result, version=CACHE_VERSION),
+            protocol=pickle.HIGHEST_PROTOCOL), 1)
+        try:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as fd:
+                fd.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.info(f'Could not write cached result {path}: {e}')
+            if tmp_path.exists():
+                tmp_path.unlink()
+            return
+        if self._size is not None:
+            self._size += len(data)
+        if self._size is None or self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used results.
+
+        Results are removed until the cache fits in max_bytes.
+        """
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith(self.suffix):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        size = sum(entry[1] for entry in entries)
+        for _, file_size, path in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+        self._size = size
+
+    def clear(self):
+        """Remove all cached results."""
+        self.max_bytes, max_bytes = 0, self.max_bytes
+        try:
+            if self.folder.exists():
+                self.evict()
+        finally:
+            self.max_bytes = max_bytes
+
+
+def get_fingerprint(df, items, settings, parameter_mapping=None):
+    """Return the fingerprint of a QC run.
+
+    Computed from the data (column names and all values, Q-fields
+    included), the resolved routine settings of every step of the plan,
+    the parameter mapping, the layout of the Q0-strings and the repository
+    version of the settings.
+
+    Args:
+        df (pd.DataFrame): Data of the profile.
+        items (list): (PlanStep, dataset settings) of the plan.
+        settings (Settings): Settings of the run.
+        parameter_mapping (dict): Parameter mapping of the run.
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps([
+        CACHE_VERSION,
+        settings.repo_version,
+        list(settings.qc_routines.items()),
+        sorted((parameter_mapping or {}).items()),
+        [[list(step), item] for step, item in items],
+        [[key, str(dtype)] for key, dtype in df.dtypes.items()],
+    ], sort_keys=True, default=_get_json_value).encode('utf8'))
+    for key in df.columns:
+        digest.update(_get_column_bytes(df[key]))
+    return digest.hexdigest()
+
+
+def _get_column_bytes(serie):
+    """Return the values of serie as bytes.
+
+    Faster than pd.util.hash_pandas_object for string columns.
+    """
+    values = serie.to_numpy()
+    if values.dtype.kind in 'biufcmM':
+        return np.ascontiguousarray(values).tobytes()
+    return '\x1f'.join(map(str, values)).encode('utf8', 'surrogatepass') + \
+        b'\x1e'
+
+
+def _get_json_value(value):
+    if isinstance(value, np.ndarray):
+        return [str(value.dtype), value.shape,
+                hashlib.sha1(np.ascontiguousarray(value).tobytes())
+                .hexdigest()]
+    if isinstance(value, np.generic):
+        return value.item()
+    return repr(value)
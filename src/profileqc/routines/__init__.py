@@ -6,8 +6,31 @@ Created on 2020-02-20 13:26
 
 @author: a002028
 """
-from profileqc.routines.continuous import Decreasing, Increasing  # noqa: F401
-from profileqc.routines.dependencies import Dependencies  # noqa: F401
-from profileqc.routines.diff import DataDiff  # noqa: F401
-from profileqc.routines.range import Range  # noqa: F401
-from profileqc.routines.spike import Spike  # noqa: F401
+import importlib
+
+# Routine classes are imported from their module on first access, eg.
+# profileqc.routines.Spike imports profileqc.routines.spike.
+ROUTINE_MODULES = {
+    'Decreasing': 'profileqc.routines.continuous',
+    'Increasing': 'profileqc.routines.continuous',
+    'Dependencies': 'profileqc.routines.dependencies',
+    'DataDiff': 'profileqc.routines.diff',
+    'Range': 'profileqc.routines.range',
+    'Spike': 'profileqc.routines.spike',
+}
+
+__all__ = list(ROUTINE_MODULES)
+
+
+def __getattr__(attr):
+    """Return routine class, imported from its module."""
+    if attr in ROUTINE_MODULES:
+        routine = getattr(importlib.import_module(ROUTINE_MODULES[attr]), attr)
+        globals()[attr] = routine
+        return routine
+    raise AttributeError(f'module {__name__!r} has no attribute {attr!r}')
+
+
+def __dir__():
+    """Return module attributes including the lazy routine classes."""
+    return sorted(set(globals()) | set(ROUTINE_MODULES))
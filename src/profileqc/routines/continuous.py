@@ -10,6 +10,8 @@ import numpy as np
 import pandas as pd
 from profileqc.boolean_handler import BooleanBaseSerie
 from profileqc.config import qc_fail_message
+from profileqc.utils import get_float_serie
+from profileqc.routines.kernels import get_segment_starts
 
 # FIXME if we need a boolean return (in order to say which values are causing
 #  the QC-routine to fail) we use BooleanBaseSerie.
@@ -19,17 +21,32 @@ from profileqc.config import qc_fail_message
 class ContinuousBase(BooleanBaseSerie):
     """Base class of any continuous routine."""
 
+    # All parameters are checked in one kernel call (see engine.KernelTask)
+    column_batch_keys = ()
+
     def __init__(self, df_or_serie, parameter=None, q_flag=None,
-                 acceptable_error=None, **kwargs):
-        """Initiate."""
+                 acceptable_error=None, segment_ids=None, **kwargs):
+        """Initiate.
+
+        acceptable_error can be given as a scalar or as one value per row.
+        With segment_ids (segment number of each row) the first value of
+        every segment is treated as the first value of a separate serie.
+        """
         super().__init__()
         if type(df_or_serie) == pd.DataFrame:
-            self.serie = df_or_serie[parameter].astype(float)
+            self.serie = get_float_serie(df_or_serie[parameter])
         else:
-            self.serie = df_or_serie.astype(float)
+            self.serie = get_float_serie(df_or_serie)
         self.qc_passed = False
         self.q_flag = q_flag or 'B'
         self.acceptable_error = acceptable_error
+        self.segment_ids = segment_ids
+        self._boolean_array = None
+
+    @classmethod
+    def row_extent(cls, **settings):
+        """Return (rows before, rows after), each value needs the previous."""
+        return 1, 0
 
     @property
     def boolean_return(self):
@@ -45,26 +62,71 @@ class ContinuousBase(BooleanBaseSerie):
         False means that the value has NOT passed and should be
         flagged accordingly.
         """
-        return pd.Series([True] + list(self.boolean_generator))
-        # boolean = [True] + list(self.generator)
-        # return pd.Series(boolean)
+        return pd.Series(self.boolean_array)
+
+    @property
+    def boolean_array(self):
+        """Return numpy boolean array of the routine, computed once.
+
+        NaN gaps: a comparison where either value is NaN does not pass,
+        ie. both the NaN value and the first value after the gap are
+        flagged (as long as they are not on the first index).
+        """
+        if self._boolean_array is None:
+            self._boolean_array = self.kernel(
+                self.serie.to_numpy(dtype=float),
+                acceptable_error=self.acceptable_error,
+                segment_ids=self.segment_ids
+            )
+        return self._boolean_array
+
+    @classmethod
+    def kernel(cls, values, acceptable_error=None, segment_ids=None,
+               **kwargs):
+        """Return boolean array, see boolean_array.
+
+        values can also be 2-D with one column per parameter, then
+        acceptable_error can be given with one value per column, shape
+        (1, n_columns), or as (n_rows, n_columns).
+        """
+        boolean = np.ones(np.shape(values), dtype=bool)
+        if len(values) > 1:
+            previous, current = values[:-1], values[1:]
+            valid = ~(np.isnan(previous) | np.isnan(current))
+            error = acceptable_error
+            if np.ndim(error) and np.shape(error)[0] == len(values):
+                error = np.asarray(error, dtype=float)[1:]
+            boolean[1:] = False
+            cls.compare(previous, current, error, out=boolean[1:],
+                        where=valid)
+        if segment_ids is not None:
+            boolean[get_segment_starts(segment_ids)] = True
+        return boolean
 
     @property
     def flag_return(self):
         """Return serie of flags."""
         flag_serie = np.array(['A'] * self.serie.__len__())
-        flag_serie[self.inverted_boolean] = self.q_flag
+        flag_serie[~self.boolean_array] = self.q_flag
         return flag_serie
 
-    @property
-    def boolean_generator(self):
-        """Doc."""
+    @staticmethod
+    def compare(previous, current, error, out=None, where=True):
+        """Compare each value with the next one (numpy ufunc style).
+
+        Args:
+            previous (np.ndarray): values[:-1]
+            current (np.ndarray): values[1:]
+            error (float | np.ndarray): acceptable error of current.
+            out (np.ndarray): boolean array to write the result to.
+            where (np.ndarray): only compare where True.
+        """
         raise NotImplementedError
 
     @property
     def error_magnitude_accepted(self):
         """Return True / False."""
-        return all(self.boolean_generator)
+        return bool(self.boolean_array.all())
 
 
 class Decreasing(ContinuousBase):
@@ -89,15 +151,11 @@ class Decreasing(ContinuousBase):
             else:
                 qc_fail_message(self, self.serie.name)
 
-    @property
-    def boolean_generator(self):
-        """Return generator."""
-        return (i >= j for i, j in zip(self.serie, self.control_serie[1:]))
-
-    @property
-    def control_serie(self):
-        """Return the given data serie minus the acceptable error."""
-        return self.serie - self.acceptable_error
+    @staticmethod
+    def compare(previous, current, error, out=None, where=True):
+        """Return previous >= current - acceptable_error."""
+        return np.greater_equal(previous, current - error,
+                                out=out, where=where)
 
 
 class Increasing(ContinuousBase):
@@ -122,15 +180,11 @@ class Increasing(ContinuousBase):
             else:
                 qc_fail_message(self, self.serie.name)
 
-    @property
-    def boolean_generator(self):
-        """Return generator."""
-        return (i <= j for i, j in zip(self.serie, self.control_serie[1:]))
-
-    @property
-    def control_serie(self):
-        """Return the given data serie minus the acceptable error."""
-        return self.serie + self.acceptable_error
+    @staticmethod
+    def compare(previous, current, error, out=None, where=True):
+        """Return previous <= current + acceptable_error."""
+        return np.less_equal(previous, current + error,
+                             out=out, where=where)
 
 
 if __name__ == "__main__":
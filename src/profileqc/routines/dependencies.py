@@ -9,11 +9,60 @@ Created on 2020-07-08 13:19
 
 
 class Dependencies:
-    """Doc."""
-
-    def __init__(self, **kwargs):
-        """Initiate."""
-        # TODO: what to do here?
-        #  maybe it´s enough with the dependencies
-        #  listed in DEV_dependencies.yaml ?
-        pass
+    """Parameter dependencies used when flagging data.
+
+    The dependencies are given as in etc/parameter_dependencies.json, ie.
+    {parameter: [parameters that depend on it]}. The transitive closure is
+    computed once: if SALT_CTD depends on CNDC_CTD and DENS_CTD on SALT_CTD,
+    a flag on CNDC_CTD is propagated to both SALT_CTD and DENS_CTD.
+    """
+
+    def __init__(self, dependencies=None, transitive=True, **kwargs):
+        """Initiate.
+
+        Args:
+            dependencies (dict): Eg. {'TEMP_CTD': ['TEMP_CTD', 'SALT_CTD']}
+            transitive (bool): Follow dependencies of dependencies.
+        """
+        self.dependencies = {
+            key: list(value) for key, value in (dependencies or {}).items()
+        }
+        self.transitive = transitive
+        self.targets = {
+            key: self._get_closure(key) if transitive else tuple(
+                dict.fromkeys([key, *value]))
+            for key, value in self.dependencies.items()
+        }
+
+    def _get_closure(self, parameter):
+        """Return parameter and all parameters that depend on it.
+
+        In breadth-first order, starting with the parameter itself.
+        """
+        found = {parameter: None}
+        queue = [parameter]
+        while queue:
+            key = queue.pop(0)
+            for target in self.dependencies.get(key, ()):
+                if target not in found:
+                    found[target] = None
+                    queue.append(target)
+        return tuple(found)
+
+    def get_targets(self, *parameters):
+        """Return the parameters that flags on the parameters propagate to.
+
+        The given parameters themselves are included.
+        """
+        targets = {}
+        for parameter in parameters:
+            targets.update(dict.fromkeys(
+                self.targets.get(parameter, (parameter,))))
+        return tuple(targets)
+
+    def get_q_parameters(self, *parameters):
+        """Return the Q0-fields of get_targets.
+
+        Eg. ['Q0_DOXY_CTD', 'Q0_DOXY_SAT_CTD']
+        """
+        return ['Q0_' + key for key in self.get_targets(*parameters)]
@@ -10,6 +10,7 @@ import numpy as np
 import pandas as pd
 from profileqc.boolean_handler import BooleanBaseDataFrame
 from profileqc.config import qc_fail_message
+from profileqc.utils import get_float_frame
 
 
 class DiffBase(BooleanBaseDataFrame):
@@ -22,7 +23,7 @@ class DiffBase(BooleanBaseDataFrame):
         self.qc_passed = False
         self.q_flag = q_flag or 'B'
         self.parameters = parameters
-        self.data = df[self.parameters].astype(float)
+        self.data = get_float_frame(df[self.parameters])
         self.acceptable_error = acceptable_error
 
     @property
@@ -39,9 +40,24 @@ class DataDiff(DiffBase):
     We check how values for x number of parameters differ from one another.
     """
 
+    # All pairs of parameters are checked in one kernel call
+    column_batch_keys = ()
+
+    @classmethod
+    def kernel(cls, values, acceptable_error=None, **kwargs):
+        """Return boolean array, True where |value_2 - value_1| <= error.
+
+        Args:
+            values (np.ndarray): Array of shape (n_rows, 2), or
+                                 (n_rows, n_pairs, 2) for many pairs.
+        """
+        values = np.asarray(values, dtype=float)
+        return np.abs(values[..., -1] - values[..., 0]) <= acceptable_error
+
     def __call__(self):
         """Run routine."""
-        self.add_boolean_diff(self.parameters, self.acceptable_error)
+        self.boolean = self.kernel(self.data[self.parameters].to_numpy(),
+                                   acceptable_error=self.acceptable_error)
         # TODO handle QC failure.. boolean? report?
         if all(self.boolean):
             # Data passed with distinction!
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""Vectorized kernels of the QC routines."""
+import numpy as np
+
+
+def get_segment_starts(segment_ids):
+    """Return index of the first row of every segment but the first one.
+
+    Args:
+        segment_ids (np.ndarray): Segment (profile) number of each row,
+                                  eg. [0, 0, 0, 1, 1, 2] --> [3, 5]
+    """
+    return np.flatnonzero(np.diff(segment_ids)) + 1
+
+
+def rolling_mean_std(values, window, min_periods=None, segment_ids=None):
+    """Return centered rolling mean and standard deviation (ddof=1).
+
+    Equivalent to pd.Series(values).rolling(window, center=True,
+    min_periods=min_periods).mean() / .std(), but both statistics are
+    calculated in one go from shifted views of the same padded array.
+    NaN values are excluded from the windows. Where a window holds fewer
+    than min_periods valid values the statistics are NaN (std is also NaN
+    for less than 2 values). As in pandas, a window where all valid values
+    are equal gets exactly that value as mean and a std of 0.
+
+    Args:
+        values (np.ndarray): 1-D float array, or 2-D with one column per
+                             parameter (windows run along axis 0).
+        window (int): Size of the window.
+        min_periods (int): Minimum number of valid values in a window.
+        segment_ids (np.ndarray): Segment number of each row. Windows are
+                                  cut at segment boundaries, as if every
+                                  segment was a separate array.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    shape = values.shape
+    padded_shape = (n + window - 1,) + shape[1:]
+    min_periods = window if min_periods is None else min_periods
+
+    # Same window alignment as pandas: [i + offset + 1 - window, i + offset]
+    lead = window - 1 - (window - 1) // 2
+    valid = ~np.isnan(values)
+    padded = np.zeros(padded_shape)
+    padded[lead:lead + n] = values
+    padded_valid = np.zeros(padded_shape, dtype=bool)
+    padded_valid[lead:lead + n] = valid
+
+    # Window position k of every row is a shifted view of the padded arrays
+    windows = [padded[k:k + n] for k in range(window)]
+    valid_windows = [padded_valid[k:k + n] for k in range(window)]
+    if segment_ids is not None:
+        segment_ids = np.asarray(segment_ids).reshape(
+            (n,) + (1,) * (len(shape) - 1))
+        padded_segments = np.full((n + window - 1,) + segment_ids.shape[1:],
+                                  -1, dtype=np.int64)
+        padded_segments[lead:lead + n] = segment_ids
+        valid_windows = [
+            valid_windows[k] & (padded_segments[k:k + n] == segment_ids)
+            for k in range(window)
+        ]
+
+    total = np.zeros(shape)
+    count = np.zeros(shape)
+    window_max = np.full(shape, -np.inf)
+    window_min = np.full(shape, np.inf)
+    for k in range(window):
+        np.add(total, windows[k], out=total, where=valid_windows[k])
+        count += valid_windows[k]
+        np.maximum(window_max, windows[k], out=window_max,
+                   where=valid_windows[k])
+        np.minimum(window_min, windows[k], out=window_min,
+                   where=valid_windows[k])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.divide(total, count, out=total)
+        squares = np.zeros(shape)
+        deviation = np.empty(shape)
+        for k in range(window):
+            np.subtract(windows[k], mean, out=deviation)
+            deviation *= deviation
+            np.add(squares, deviation, out=squares, where=valid_windows[k])
+        std = np.sqrt(np.divide(squares, count - 1, out=squares), out=squares)
+
+    constant = window_max == window_min
+    mean[constant] = window_max[constant]
+    std[constant] = 0.
+
+    mean[count < max(min_periods, 1)] = np.nan
+    std[count < max(min_periods, 2)] = np.nan
+    return mean, std
+
+
+def spike_boolean(values, window, acceptable_stddev_factor, min_stddev_value,
+                  min_periods=None, segment_ids=None):
+    """Return boolean array of the spike check.
+
+    True where mean - std < value < mean + std, with mean and std from a
+    centered rolling window. The std is raised to at least
+    min_stddev_value and multiplied with acceptable_stddev_factor.
+    NaN values, and values without enough neighbours to calculate a std,
+    do not pass.
+
+    acceptable_stddev_factor and min_stddev_value can be given as scalars
+    or as one value per row. For 2-D values they broadcast against the
+    values, eg. shape (1, n_columns) for one value per column.
+    """
+    values = np.asarray(values, dtype=float)
+    mean, std = rolling_mean_std(values, window, min_periods=min_periods,
+                                 segment_ids=segment_ids)
+    np.maximum(std, min_stddev_value, out=std)
+    std *= acceptable_stddev_factor
+
+    boolean = np.less(values, mean + std)
+    boolean &= np.greater(values, np.subtract(mean, std, out=mean))
+    return boolean
@@ -10,6 +10,7 @@ import numpy as np
 import pandas as pd
 from profileqc.boolean_handler import BooleanBaseSerie
 from profileqc.config import qc_fail_message
+from profileqc.utils import get_float_serie
 
 
 class Range(BooleanBaseSerie):
@@ -18,6 +19,9 @@ class Range(BooleanBaseSerie):
     We check how values for x number of parameters differ from one another.
     """
 
+    # All parameters are checked in one kernel call (see engine.KernelTask)
+    column_batch_keys = ()
+
     def __init__(self, df_or_serie, parameter=None, q_flag=None,
                  min_range_value=None, max_range_value=None, **kwargs):
         """Initiate."""
@@ -25,16 +29,25 @@ class Range(BooleanBaseSerie):
         self.qc_passed = False
         self.q_flag = q_flag or 'B'
         if type(df_or_serie) == pd.DataFrame:
-            self.serie = df_or_serie[parameter].astype(float)
+            self.serie = get_float_serie(df_or_serie[parameter])
         else:
-            self.serie = df_or_serie.astype(float)
+            self.serie = get_float_serie(df_or_serie)
         self.min = min_range_value
         self.max = max_range_value
 
+    @classmethod
+    def kernel(cls, values, min_range_value=None, max_range_value=None,
+               **kwargs):
+        """Return boolean array, True where min <= value <= max."""
+        boolean = np.less_equal(values, max_range_value)
+        boolean &= np.greater_equal(values, min_range_value)
+        return boolean
+
     def __call__(self):
         """Run routine."""
-        self.add_boolean_less_or_equal(self.max)
-        self.add_boolean_greater_or_equal(self.min)
+        self.boolean = self.kernel(self.serie.to_numpy(dtype=float),
+                                   min_range_value=self.min,
+                                   max_range_value=self.max)
 
         if all(self.boolean):
             # Data passed with distinction!
@@ -49,46 +62,3 @@ class Range(BooleanBaseSerie):
         flag_serie = np.array(['A'] * self.serie.__len__())
         flag_serie[self.inverted_boolean] = self.q_flag
         return flag_serie
-
-
-if __name__ == "__main__":
-    import time
-    df = pd.DataFrame({'TEMP': ['AAAA'] * 100000})
-
-    start_timeit = time.time()
-    df['TEMP'].apply(tuple)
-    print("Timed: --apply(tuple) in %.9f sec" % (time.time() - start_timeit))
-
-    start_timeit = time.time()
-    li = df['TEMP'].apply(list)
-    # tup.apply(''.join)
-    print("Timed: --apply(list) in %.9f sec" % (time.time() - start_timeit))
-
-    def set_flag(value, i, flag):
-        """Doc."""
-        value[i] = flag
-        return value
-
-    start_timeit = time.time()
-    li = li.apply(lambda x: set_flag(x, 1, 'Bb'))
-    print("Timed: --set_flag in %.9f sec" % (time.time() - start_timeit))
-
-    start_timeit = time.time()
-    li.apply(''.join)
-    print("Timed: --join in %.9f sec" % (time.time() - start_timeit))
-
-    a = [[1, 2, 3]] * 1000000
-    a = pd.Series(a)
-    b = [6] * 100
-
-    start_timeit = time.time()
-    index = 1
-    # def ff(i, j):
-    #     i[index] = j
-    #     return i
-    # generator = (ff(i, j) for i, j in zip(a, b))
-    # a = list(generator)
-
-    for i, j in zip(a, b):
-        i[index] = j
-    print("Timed: --generator in %.9f sec" % (time.time() - start_timeit))
@@ -10,6 +10,8 @@ import numpy as np
 import pandas as pd
 from profileqc.boolean_handler import BooleanBaseSerie
 from profileqc.config import qc_fail_message
+from profileqc.utils import get_float_serie
+from profileqc.routines.kernels import rolling_mean_std, spike_boolean
 
 
 class Spike(BooleanBaseSerie):
@@ -18,36 +20,70 @@ class Spike(BooleanBaseSerie):
     We check how values for x number of parameters differ from one another.
     """
 
+    # Parameters with the same window are checked in one kernel call
+    column_batch_keys = ('number_of_values',)
+
     def __init__(self, df_or_serie, parameter=None, q_flag=None,
                  acceptable_stddev_factor=None, min_stddev_value=None,
-                 number_of_values=None, **kwargs):
-        """Initiate."""
+                 number_of_values=None, segment_ids=None, **kwargs):
+        """Initiate.
+
+        acceptable_stddev_factor and min_stddev_value can be given as
+        scalars or as one value per row. With segment_ids (segment number
+        of each row) the rolling window never crosses a segment boundary.
+        """
         super().__init__()
         self.qc_passed = False
         self.q_flag = q_flag or 'B'
 
         if type(df_or_serie) == pd.DataFrame:
-            self.serie = df_or_serie[parameter].astype(float)
+            self.serie = get_float_serie(df_or_serie[parameter])
         else:
-            self.serie = df_or_serie.astype(float)
+            self.serie = get_float_serie(df_or_serie)
 
         self.acceptable_stddev_factor = acceptable_stddev_factor
         self.min_stddev_value = min_stddev_value
         self.number_of_values = number_of_values or 7
+        self.segment_ids = segment_ids
 
         # self.number_of_values = 7  # ok window?
         # user can control the outcome with acceptable_stddev_factor
-        min_periods = int(np.floor(self.number_of_values / 2))
-        self.rolling = self.serie.rolling(self.number_of_values,
-                                          min_periods=min_periods,
-                                          center=True)
+        self.min_periods = int(np.floor(self.number_of_values / 2))
+        self._statistics = None
+
+    @classmethod
+    def row_extent(cls, number_of_values=None, **settings):
+        """Return (rows before, rows after) of the centered window."""
+        window = number_of_values or 7
+        lead = window - 1 - (window - 1) // 2
+        return lead, window - 1 - lead
+
+    @classmethod
+    def kernel(cls, values, acceptable_stddev_factor=None,
+               min_stddev_value=None, number_of_values=None,
+               segment_ids=None, **kwargs):
+        """Return boolean array of the spike check (see spike_boolean)."""
+        window = number_of_values or 7
+        return spike_boolean(
+            values,
+            window,
+            acceptable_stddev_factor,
+            min_stddev_value,
+            min_periods=int(np.floor(window / 2)),
+            segment_ids=segment_ids
+        )
 
     def __call__(self):
         """Run routine."""
-        self.add_boolean_less_than_other(self.max)
-        self.add_boolean_greater_than_other(self.min)
-
-        if all(self.boolean):
+        self.boolean = self.kernel(
+            self.serie.to_numpy(dtype=float),
+            acceptable_stddev_factor=self.acceptable_stddev_factor,
+            min_stddev_value=self.min_stddev_value,
+            number_of_values=self.number_of_values,
+            segment_ids=self.segment_ids
+        )
+
+        if self.boolean.all():
             # Data passed with distinction!
             self.qc_passed = True
             # qc_pass_message(self, self.serie.name)
@@ -64,23 +100,34 @@ class Spike(BooleanBaseSerie):
         """Return acceptable maximum values."""
         return self._mean + self._std
 
+    @property
+    def statistics(self):
+        """Return centered rolling mean and std, computed once."""
+        if self._statistics is None:
+            self._statistics = rolling_mean_std(
+                self.serie.to_numpy(dtype=float),
+                self.number_of_values,
+                min_periods=self.min_periods,
+                segment_ids=self.segment_ids
+            )
+        return self._statistics
+
     @property
     def _mean(self):
-        """Return mean values from the rolling object."""
-        return self.rolling.mean()
+        """Return rolling mean values."""
+        return pd.Series(self.statistics[0], index=self.serie.index)
 
     @property
     def _std(self):
-        """Return standard deviation values from the rolling object.
+        """Return standard deviation values from the rolling window.
 
         Based on the settings for this routine, we use a minimum value for the
         standard deviation and a factor to multiply with depending on the
         parameter and sensor sensitivity.-
         """
-        std_serie = self.rolling.std()
-        boolean = std_serie < self.min_stddev_value
-        std_serie[boolean] = self.min_stddev_value
-        return std_serie * self.acceptable_stddev_factor
+        std = np.maximum(self.statistics[1], self.min_stddev_value)
+        return pd.Series(std * self.acceptable_stddev_factor,
+                         index=self.serie.index)
 
     @property
     def flag_return(self):
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 SMHI, Swedish Meteorological and Hydrological Institute.
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""QC of casts while the scans are coming in."""
+import warnings
+import numpy as np
+import pandas as pd
+from profileqc.config import RoutineReference
+from profileqc.flag_handler import FlagMatrix
+from profileqc.qc import SessionQC
+from profileqc.utils import QcLog
+
+
+class StreamingSessionQC(SessionQC):
+    """Run ProfileQC on a cast while the scans are coming in.
+
+    Scans are pushed in chunks. Rows are returned with their final Q0- and
+    Q-flags as soon as every routine has the rows it needs: a routine that
+    compares a value with the previous one needs one row before, a spike
+    window of 7 values needs 3 rows before and after, etc. (see
+    row_extent of the routines). Only these rows are kept in a buffer
+    between the chunks.
+
+    When the cast is finished, the concatenated output is equal to the data
+    of SessionQC.run on the whole cast, and the QC log holds the same
+    entries.
+
+    Note that a routine is only run on parameters that hold data (see
+    SessionQC.data_available). Until every parameter of the plan has shown
+    data, no rows can be finalized, since a parameter that gets its first
+    value late in the cast changes the flags of all earlier rows, ie. a
+    parameter without data makes the whole cast wait for finish. Give the
+    columns with data as data_columns (eg. from a first pass over a file,
+    see profileqc.chunked.get_data_columns) and rows are never held back.
+    A warning is issued if data_columns is not given.
+
+    Example:
+        qc_run = StreamingSessionQC(parameter_mapping=parameter_mapping,
+                                    dataset_name='cast_01',
+                                    metadata=metadata,
+                                    data_columns=data_columns)
+        for chunk in reader:
+            writer.write(qc_run.push(chunk))
+        writer.write(qc_run.finish())
+    """
+
+    def __init__(self, parameter_mapping=None, dataset_name=None,
+                 metadata=None, routines=None, routine_settings=None,
+                 routine_path=None, advanced_settings_name=None,
+                 data_columns=None):
+        """Initiate.
+
+        Args:
+            data_columns (iterable): Columns that hold data somewhere in the
+                                     cast. If not given, this is found out
+                                     from the pushed rows and the number of
+                                     rows held back is not bounded.
+        """
+        super().__init__(None, parameter_mapping=parameter_mapping,
+                         routines=routines, routine_settings=routine_settings,
+                         routine_path=routine_path, dataset_name=dataset_name,
+                         advanced_settings_name=advanced_settings_name)
+        self.parameter_mapping = parameter_mapping or {}
+        self.meta = metadata
+        self.df = None
+        self._plan = None
+        self._buffer = None
+        self._number_of_halo_rows = 0
+        self._number_of_rows = 0
+        self._has_data = {}
+        self._data_columns = None
+        if data_columns is not None:
+            self._data_columns = set(data_columns)
+        else:
+            warnings.warn(
+                'StreamingSessionQC without data_columns holds back all rows '
+                'until every parameter of the plan has shown data, give '
+                'data_columns to bound the number of buffered rows',
+                UserWarning, stacklevel=2)
+        self._flagged = {}
+        self._finished = False
+
+    @property
+    def latency(self):
+        """Return the number of rows a row is held back.
+
+        Holds once all parameters have data. None before the first chunk.
+        """
+        return self._max_after if self._plan is not None else None
+
+    def _start(self, chunk):
+        """Set up plan, routine settings and Q0-fields of the first chunk."""
+        self.df = chunk
+        if self.settings.advanced_spec:
+            self.update_routines()
+        self._plan = self.get_plan()
+
+        # Reset keys and Q0-fields are given by the first row
+        self._open_up_flag_fields()
+        self._q0_keys = self.flags.columns
+
+        self._extents = []
+        for step in self._plan:
+            qc_setting = getattr(self.settings, step.routine)
+            routine = qc_setting['routines'][step.routine]['routine']
+            routine = RoutineReference.resolve_routine(routine)
+            self._extents.append(
+                routine.row_extent(**step.get_item(qc_setting)))
+        self._max_before = max((e[0] for e in self._extents), default=0)
+        self._max_after = max((e[1] for e in self._extents), default=0)
+        self._has_data = {key: False for key in self._plan.columns}
+        if self._data_columns is not None:
+            self._has_data = {key: key in self._data_columns
+                              for key in self._plan.columns}
+
+    def push(self, chunk):
+        """Add scans and return the rows that have got their final flags.
+
+        Args:
+            chunk (pd.DataFrame): The next rows of the cast, with the same
+                                  columns as the previous chunks.
+
+        Returns:
+            pd.DataFrame with the finalized rows (possibly no rows). The
+            index is the row number within the cast.
+        """
+        if self._finished:
+            raise ValueError('The cast is finished, no more rows can be '
+                             'added')
+        chunk = chunk.copy()
+        chunk.index = pd.RangeIndex(self._number_of_rows,
+                                    self._number_of_rows + len(chunk))
+        self._number_of_rows += len(chunk)
+        if self._plan is None:
+            self._start(chunk)
+            self._buffer = chunk
+        else:
+            self._buffer = pd.concat([self._buffer, chunk])
+
+        if self._data_columns is not None:
+            return self._process(final=False)
+        for key, has_data in self._has_data.items():
+            if not has_data and chunk[key].any():
+                self._has_data[key] = True
+        return self._process(final=False)
+
+    def finish(self):
+        """Finalize the cast.
+
+        Returns the remaining rows, adds the QC log entries of the cast and
+        the QC comment to the metadata.
+        """
+        if self._plan is None:
+            raise ValueError('No rows have been pushed')
+        if self._finished:
+            raise ValueError('The cast is already finished')
+        self._finished = True
+        out = self._process(final=True)
+        self._log_flagged()
+        if self.meta is not None:
+            self.append_qc_comment()
+        return out
+
+    def _get_active_steps(self):
+        """Return the plan steps with data."""
+        active = []
+        for i, step in enumerate(self._plan):
+            if step.parameter:
+                available = self._has_data[step.parameter]
+            else:
+                available = all(self._has_data[p] for p in step.parameters)
+            if available:
+                active.append(i)
+        return active
+
+    def _process(self, final=False):
+        """Flag and return the rows of the buffer that can be finalized."""
+        active = self._get_active_steps()
+        start = self._number_of_halo_rows
+        if final:
+            end = len(self._buffer)
+        elif self._data_columns is None and len(active) < len(self._plan):
+            # A parameter may still get data
+            end = start
+        else:
+            end = len(self._buffer) - self._max_after
+        if end <= start:
+            return self._buffer.iloc[0:0].copy()
+
+        # Run the routines on the whole buffer, keep the finalized rows
+        self.df = self._buffer
+        self.set_working_frame(self._plan.columns)
+        out = self._buffer.iloc[start:end].copy()
+        rows = slice(start, end)
+        self.flags = FlagMatrix.from_frame(
+            out, self._q0_keys, self.settings.number_of_routines,
+            reset_columns=self._reset_flag_keys
+        )
+        items = {
+            i: self._plan.steps[i].get_item(
+                getattr(self.settings, self._plan.steps[i].routine))
+            for i in active
+        }
+        source_codes = np.zeros((len(out), len(self._plan)), dtype=np.uint8)
+        for i, result in self.evaluate_steps(self._plan, items).items():
+            source_codes[:, i] = result.codes[rows]
+            boolean = result.flagged[rows]
+            if boolean.any():
+                self._collect_flagged(i, items[i], result.q_flag, boolean,
+                                      rows)
+        self.flags.propagate(
+            source_codes, self._plan.get_propagation(self.flags.columns),
+            np.isin(np.arange(len(self._plan)), active))
+
+        self.df = out
+        self._close_flag_fields()
+        self.synchronize_flag_fields()
+
+        # Keep the rows needed before the next unfinalized row
+        keep_from = max(end - self._max_before, 0)
+        self._buffer = self._buffer.iloc[keep_from:]
+        self._number_of_halo_rows = end - keep_from
+        return out
+
+    def _collect_flagged(self, index, item, q_flag, boolean, rows):
+        """Collect flagged values for the QC log of the cast."""
+        para_string, pressure_list, data_list = self.get_flagged_lists(
+            item, boolean, rows=rows)
+        collected = self._flagged.get(index)
+        if collected is None:
+            self._flagged[index] = {
+                'parameter': para_string,
+                'pressure': list(pressure_list),
+                'values': list(data_list) if data_list is not False
+                else False,
+                'flag': q_flag,
+            }
+            return
+        collected['pressure'].extend(pressure_list)
+        if collected['values'] is not False and data_list is not False:
+            collected['values'].extend(data_list)
+
+    def _log_flagged(self):
+        """Add the collected flagged values to QcLog, in plan order."""
+        for index in sorted(self._flagged):
+            step = self._plan.steps[index]
+            collected = self._flagged[index]
+            QcLog.update_info(
+                serie=self.dataset_name,
+                routine_name=step.routine,
+                parameter=collected['parameter'],
+                pressure=collected['pressure'],
+                parameter_data=collected['values'],
+                flag=collected['flag'],
+                qc_index=step.qc_index,
+                info=f'Flagged with: {collected["flag"]}'
+            )
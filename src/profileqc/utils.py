@@ -6,10 +6,12 @@ Created on 2022-01-04 15:20
 
 @author: johannes
 """
+import os
 import yaml
 import datetime
 from pathlib import Path
 import numpy as np
+import pandas as pd
 
 
 def get_base_folder():
@@ -17,6 +19,16 @@ def get_base_folder():
     return Path(__file__).parent
 
 
+def get_cache_folder():
+    """Return the cache folder of ProfileQC.
+
+    Can be set with the environment variable PROFILEQC_CACHE_DIR.
+    """
+    return Path(os.environ.get(
+        'PROFILEQC_CACHE_DIR', Path.home().joinpath('.cache', 'profileqc')
+    ))
+
+
 def git_version():
     """Return current version of this github-repository."""
     wd = get_base_folder()
@@ -60,6 +72,46 @@ def get_float_list(pressure_serie):
     return [float(item) if item else np.nan for item in pressure_serie]
 
 
+def to_float_array(values):
+    """Return values as a float64 numpy array.
+
+    Strings are parsed, empty strings (and None) are NaN. Values that are
+    already float64 are returned without a copy.
+    """
+    if isinstance(values, pd.Series):
+        values = values.to_numpy()
+    values = np.asarray(values)
+    if values.dtype.kind in 'fiub':
+        return values.astype(np.float64, copy=False)
+    empty = values == ''
+    if empty.any():
+        values = values.copy()
+        values[empty] = np.nan
+    return values.astype(np.float64)
+
+
+def get_float_serie(serie):
+    """Return pd.Series as float64 (see to_float_array).
+
+    A float64 serie is returned as is.
+    """
+    if serie.dtype == np.float64:
+        return serie
+    return pd.Series(to_float_array(serie), index=serie.index,
+                     name=serie.name)
+
+
+def get_float_frame(df):
+    """Return pd.DataFrame with all columns as float64.
+
+    A DataFrame with only float64 columns is returned as is.
+    """
+    if all(dtype == np.float64 for dtype in df.dtypes):
+        return df
+    return pd.DataFrame({key: to_float_array(df[key]) for key in df},
+                        index=df.index)
+
+
 def get_parameter_str(_item):
     """Doc."""
     para_string = _item.get('parameter')
@@ -76,6 +128,7 @@ class QcLog:
     """Logger for QC."""
 
     log = {}
+    sink = None
 
     def __init__(self, *args, reset_log=None, serie=None, routine_name=None,
                  parameter=None, pressure=None, info=None, flag=None, qc_index=None,
@@ -98,7 +151,7 @@ class QcLog:
 
         if any(args):
             for a in args:
-                self.log.setdefault('etc', []).append(a)
+                self._add_etc(a)
 
         # if serie and routine_name and parameter and flag:
         #     info = info or ''
@@ -111,14 +164,12 @@ class QcLog:
         if serie and routine_name and parameter and flag:
             info = info or ''
             pressure = pressure or 'pressure not specified'
-            self.log.setdefault(serie, {})
-            self.log[serie].setdefault(routine_name, {})
-            self.log[serie][routine_name].setdefault(parameter, {})
-            self.log[serie][routine_name][parameter].setdefault(flag, {})
-            self.log[serie][routine_name][parameter][flag]['values'] = parameter_data
-            self.log[serie][routine_name][parameter][flag]['pressure'] = pressure
-            self.log[serie][routine_name][parameter][flag]['info'] = info
-            self.log[serie][routine_name][parameter][flag]['qc_index'] = qc_index
+            self._add_flagged(serie, routine_name, parameter, flag, {
+                'values': parameter_data,
+                'pressure': pressure,
+                'info': info,
+                'qc_index': qc_index,
+            })
 
         # if serie and routine_name and parameter and flag:
         #     info = info or ''
@@ -149,6 +200,55 @@ class QcLog:
         """Update information to log."""
         return cls(*args, **kwargs)
 
+    @classmethod
+    def set_sink(cls, sink):
+        """Send log entries to sink instead of keeping them in cls.log.
+
+        Args:
+            sink: Object with the methods add(serie, routine_name, parameter,
+                  flag, item) and add_etc(value), eg. a
+                  profileqc.log_sinks.StreamingLogSink. None turns the sink
+                  off.
+        """
+        cls.sink = sink
+
+    @classmethod
+    def _add_etc(cls, value):
+        if cls.sink is not None:
+            cls.sink.add_etc(value)
+        else:
+            cls.log.setdefault('etc', []).append(value)
+
+    @classmethod
+    def _add_flagged(cls, serie, routine_name, parameter, flag, item):
+        if cls.sink is not None:
+            cls.sink.add(serie, routine_name, parameter, flag, item)
+            return
+        cls.log.setdefault(serie, {})
+        cls.log[serie].setdefault(routine_name, {})
+        cls.log[serie][routine_name].setdefault(parameter, {})
+        cls.log[serie][routine_name][parameter].setdefault(
+            flag, {}).update(item)
+
+    @classmethod
+    def merge(cls, log):
+        """Merge a log from another QcLog (eg. another process) into cls.log.
+
+        Entries are merged in the order of the given log, the same way as
+        they would have been added by QcLog.update_info (ie. they are sent
+        to cls.sink if it is set).
+        """
+        for serie, serie_item in log.items():
+            if serie == 'etc':
+                for value in serie_item:
+                    cls._add_etc(value)
+                continue
+            for routine_name, routine_item in serie_item.items():
+                for parameter, parameter_item in routine_item.items():
+                    for flag, flag_item in parameter_item.items():
+                        cls._add_flagged(serie, routine_name, parameter, flag,
+                                         flag_item)
+
     @classmethod
     def _reset_log(cls):
         """Reset cls.log."""
@@ -156,7 +256,13 @@ class QcLog:
 
     @classmethod
     def write(cls, file_path):
-        """Write to yaml file."""
+        """Write to yaml file.
+
+        If a sink is set, the yaml file is written from the sink.
+        """
+        if cls.sink is not None:
+            cls.sink.write_yaml(file_path)
+            return
         with open(file_path, 'w') as file:
             yaml.safe_dump(
                 cls.log,
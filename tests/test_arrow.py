@@ -0,0 +1,79 @@
+"""Tests of ArrowSessionQC.
+
+The Q0- and Q-fields and the QC log of a profile given as Arrow table are
+compared with SessionQC.run on the same profile as pd.DataFrame.
+"""
+import json
+import numpy as np
+import pytest
+from benchmarks.synthetic import make_profile, get_parameter_mapping
+from profileqc.qc import SessionQC
+from profileqc.utils import QcLog
+
+pa = pytest.importorskip('pyarrow')
+arrow = pytest.importorskip('profileqc.arrow')
+
+SPEC_NAME = 'smhi_expedition'
+
+
+def get_log():
+    """Return the QC log as text and reset it."""
+    log = json.dumps(QcLog.log, sort_keys=True, default=str)
+    QcLog.update_info(reset_log=True)
+    return log
+
+
+def get_flag_frame(df):
+    """Return the Q0- and Q-fields of df as strings."""
+    return df[[key for key in df if key.startswith('Q')]].astype(str)
+
+
+@pytest.fixture(scope='module', params=(None, SPEC_NAME))
+def sessions(request):
+    """Return (Arrow, pandas) sessions."""
+    return (arrow.ArrowSessionQC(advanced_settings_name=request.param),
+            SessionQC(None, advanced_settings_name=request.param))
+
+
+@pytest.mark.parametrize('as_str', (True, False))
+def test_equal_to_pandas(sessions, as_str):
+    """String and float64 data columns."""
+    arrow_session, session = sessions
+    item = make_profile(seed=5, n_rows=700, error_rate=0.02, as_str=as_str)
+    mapping = get_parameter_mapping(item['data'])
+
+    QcLog.update_info(reset_log=True)
+    table = pa.Table.from_pandas(item['data'], preserve_index=False)
+    arrow_item = arrow_session.run_profile(
+        {'data': table, 'metadata': item['metadata'].copy()},
+        parameter_mapping=mapping, dataset_name='S5')
+    log = get_log()
+
+    expected = {'data': item['data'].copy(),
+                'metadata': item['metadata'].copy()}
+    session.run_profile(expected, parameter_mapping=mapping,
+                        dataset_name='S5')
+    assert log == get_log()
+
+    assert isinstance(arrow_item['data'], pa.Table)
+    assert table.column_names == list(item['data'].columns)
+    df = arrow_item['data'].to_pandas()
+    assert list(df.columns) == list(expected['data'].columns)
+    assert get_flag_frame(df).equals(get_flag_frame(expected['data']))
+
+
+def test_float_array_is_view():
+    """A float64 column in one chunk without nulls is not copied."""
+    column = pa.chunked_array([pa.array(np.linspace(0., 1., 100))])
+    values = arrow.get_float_array(column)
+    buffer = np.frombuffer(column.chunk(0).buffers()[1], dtype=np.float64)
+    assert values.dtype == np.float64
+    assert np.shares_memory(values, buffer)
+
+
+def test_float_array_of_strings_and_nulls():
+    """Empty strings and nulls are NaN."""
+    values = arrow.get_float_array(pa.array(['1.5', '', None, '2']))
+    np.testing.assert_array_equal(values, [1.5, np.nan, np.nan, 2.])
+    values = arrow.get_float_array(pa.array([1., None, 3.]))
+    np.testing.assert_array_equal(values, [1., np.nan, 3.])
@@ -0,0 +1,81 @@
+"""Tests of BatchSessionQC.
+
+The Q0- and Q-fields and the QC log of profiles of different lengths QC-ed
+as one ragged batch are compared with SessionQC.run profile by profile.
+"""
+import json
+import pytest
+from benchmarks.synthetic import make_profile, get_parameter_mapping
+from profileqc.batch import BatchSessionQC, RaggedProfiles
+from profileqc.qc import SessionQC
+from profileqc.utils import QcLog
+
+SPEC_NAME = 'smhi_expedition'
+
+
+def get_log():
+    """Return the QC log as text and reset it."""
+    log = json.dumps(QcLog.log, sort_keys=True, default=str)
+    QcLog.update_info(reset_log=True)
+    return log
+
+
+def get_flag_frame(df):
+    """Return the Q0- and Q-fields of df."""
+    return df[[key for key in df if key.startswith('Q')]]
+
+
+@pytest.fixture
+def datasets():
+    """Return profiles of different lengths, months and positions."""
+    datasets = {
+        f'S{i}': make_profile(seed=i, n_rows=n_rows, error_rate=0.02)
+        for i, n_rows in enumerate((400, 3, 251, 1, 620, 90))
+    }
+    # Parameters without data in some of the profiles
+    datasets['S2']['data']['DOXY2_CTD [ml/l]'] = ''
+    datasets['S4']['data'].loc[:300, 'PAR_CTD [uE/(cm2*sec)]'] = ''
+    return datasets
+
+
+@pytest.mark.parametrize('spec_name', (None, SPEC_NAME))
+def test_equal_to_session(datasets, spec_name):
+    """Ragged batch and one SessionQC run per profile."""
+    session = SessionQC(None, advanced_settings_name=spec_name)
+    QcLog.update_info(reset_log=True)
+    expected = {}
+    for name, item in datasets.items():
+        expected[name] = {'data': item['data'].copy(),
+                          'metadata': item['metadata'].copy()}
+        session.run_profile(
+            expected[name],
+            parameter_mapping=get_parameter_mapping(item['data']),
+            dataset_name=name)
+    expected_log = get_log()
+
+    profiles = RaggedProfiles.from_datasets(datasets)
+    qc_run = BatchSessionQC(
+        profiles, parameter_mapping=get_parameter_mapping(profiles.data),
+        advanced_settings_name=spec_name)
+    qc_run.update_routines()
+    qc_run.run()
+    assert get_log() == expected_log
+
+    result = qc_run.profiles.split()
+    assert list(result) == list(datasets)
+    for name, item in result.items():
+        assert list(item['data'].columns) == list(
+            expected[name]['data'].columns)
+        assert get_flag_frame(item['data']).equals(
+            get_flag_frame(expected[name]['data']))
+
+
+def test_row_size():
+    """Row sizes must match the data."""
+    item = make_profile(seed=1, n_rows=10)
+    with pytest.raises(ValueError):
+        RaggedProfiles(item['data'], row_size=[4, 5])
+    with pytest.raises(ValueError):
+        RaggedProfiles(item['data'], row_size=[10, 0])
+    profiles = RaggedProfiles(item['data'], offsets=[0, 4, 10])
+    assert [len(item['data']) for item in profiles.split().values()] == [4, 6]
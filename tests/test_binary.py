@@ -0,0 +1,117 @@
+"""Tests of ProfileFile and MappedSessionQC.
+
+The Q0- and Q-fields and the QC log of a profile file QC-ed with the
+Q0-flags in the memmap of the flag sidecar are compared with SessionQC.run
+on the profile as pd.DataFrame.
+"""
+import json
+import numpy as np
+import pytest
+from benchmarks.synthetic import make_profile, get_parameter_mapping
+from profileqc.binary import MappedSessionQC, ProfileFile
+from profileqc.qc import SessionQC
+from profileqc.utils import QcLog, to_float_array
+
+SPEC_NAME = 'smhi_expedition'
+
+
+def get_log():
+    """Return the QC log as text and reset it."""
+    log = json.dumps(QcLog.log, sort_keys=True, default=str)
+    QcLog.update_info(reset_log=True)
+    return log
+
+
+def get_flag_frame(df):
+    """Return the Q0- and Q-fields of df as strings."""
+    return df[[key for key in df if key.startswith('Q')]].astype(str)
+
+
+def run_qc(session, item, name):
+    """Return data and QC log of SessionQC.run on a copy of item."""
+    QcLog.update_info(reset_log=True)
+    item = {'data': item['data'].copy(), 'metadata': item['metadata'].copy()}
+    session.run_profile(item, parameter_mapping=get_parameter_mapping(
+        item['data']), dataset_name=name)
+    return item['data'], get_log()
+
+
+@pytest.fixture(scope='module', params=(None, SPEC_NAME))
+def sessions(request):
+    """Return (mapped, pandas) sessions."""
+    return (MappedSessionQC(advanced_settings_name=request.param),
+            SessionQC(None, advanced_settings_name=request.param))
+
+
+@pytest.fixture
+def item():
+    """Return synthetic profile with a parameter without data."""
+    item = make_profile(seed=4, n_rows=500, error_rate=0.02)
+    item['data']['PAR_CTD [uE/(cm2*sec)]'] = ''
+    return item
+
+
+def test_write(tmp_path, item):
+    """Data, metadata and has_data read back from the file."""
+    profile = ProfileFile.write(tmp_path.joinpath('S4.pqc'), item)
+    df = item['data']
+    assert list(profile.columns) == list(df.columns)
+    assert list(profile.metadata) == list(item['metadata'])
+    assert not profile.has_data('PAR_CTD [uE/(cm2*sec)]')
+    assert profile.has_data('TEMP_CTD [deg C]')
+
+    frame = ProfileFile(profile.path).get_frame(flag_fields=True)
+    assert list(frame.columns) == list(df.columns)
+    for key in df:
+        if key in profile.float_columns:
+            np.testing.assert_array_equal(frame[key].to_numpy(),
+                                          to_float_array(df[key]))
+        else:
+            assert frame[key].tolist() == df[key].tolist()
+    assert isinstance(profile.get_values(), np.memmap)
+
+
+def test_equal_to_session(tmp_path, sessions, item):
+    """Flags and log, also when read back from the flag sidecar."""
+    mapped_session, session = sessions
+    expected, expected_log = run_qc(session, item, 'S4')
+
+    profile = ProfileFile.write(tmp_path.joinpath('S4.pqc'), item)
+    QcLog.update_info(reset_log=True)
+    mapped_session.run_profile(
+        profile, parameter_mapping=get_parameter_mapping(item['data']),
+        dataset_name='S4')
+    assert get_log() == expected_log
+    assert profile.flag_path.exists()
+
+    df = profile.to_data_item()['data']
+    assert list(df.columns) == list(expected.columns)
+    assert get_flag_frame(df).equals(get_flag_frame(expected))
+
+    # Q0-fields of the file opened again
+    q0_keys = [key for key in expected if key.startswith('Q0_')]
+    df = ProfileFile(profile.path).get_frame(flag_fields=True)
+    assert df[q0_keys].astype(str).equals(expected[q0_keys].astype(str))
+    for key in q0_keys:
+        assert list(profile.get_flag_strings(key)) == expected[key].tolist()
+
+
+def test_second_run(tmp_path, sessions, item):
+    """A file QC-ed again updates the existing flag sidecar."""
+    mapped_session, session = sessions
+    expected, _ = run_qc(session, item, 'S4')
+    expected, expected_log = run_qc(
+        session, {'data': expected, 'metadata': item['metadata']}, 'S4')
+
+    path = tmp_path.joinpath('S4.pqc')
+    ProfileFile.write(path, item)
+    for _ in range(2):
+        QcLog.update_info(reset_log=True)
+        profile = ProfileFile(path)
+        mapped_session.run_profile(
+            profile, parameter_mapping=get_parameter_mapping(item['data']),
+            dataset_name='S4')
+    assert get_log() == expected_log
+    assert sorted(tmp_path.iterdir()) == [path, profile.flag_path]
+    df = profile.to_data_item()['data']
+    assert get_flag_frame(df).equals(get_flag_frame(expected))
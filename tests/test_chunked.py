@@ -0,0 +1,49 @@
+"""Tests of ChunkedQC.
+
+A standard format file QC-ed in chunks is compared with SessionQC.run on
+the whole file: data, Q0- and Q-fields and the QC log.
+"""
+import json
+import pytest
+from benchmarks.synthetic import make_profile, get_parameter_mapping
+from profileqc.chunked import ChunkedQC
+from profileqc.pipeline import read_profile, write_profile
+from profileqc.qc import SessionQC
+from profileqc.utils import QcLog
+
+
+def get_log():
+    """Return the QC log as text and reset it."""
+    log = json.dumps(QcLog.log, sort_keys=True, default=str)
+    QcLog.update_info(reset_log=True)
+    return log
+
+
+@pytest.mark.parametrize('chunksize', (7, 257, 1000))
+def test_run_file(tmp_path, chunksize):
+    """Chunks of a few rows, of many rows and of the whole file."""
+    item = make_profile(seed=3, n_rows=900, error_rate=0.02)
+    item['data'].loc[:500, 'PAR_CTD [uE/(cm2*sec)]'] = ''
+    path = tmp_path.joinpath('cast.txt')
+    out_path = tmp_path.joinpath('cast_qc.txt')
+    write_profile(path, item)
+
+    QcLog.update_info(reset_log=True)
+    ChunkedQC(chunksize=chunksize).run_file(path, out_path,
+                                            dataset_name='cast')
+    log = get_log()
+
+    expected = read_profile(path)
+    SessionQC(None).run_profile(
+        expected, parameter_mapping=get_parameter_mapping(expected['data']),
+        dataset_name='cast')
+    assert log == get_log()
+
+    result = read_profile(out_path)
+    assert list(result['data'].columns) == list(expected['data'].columns)
+    assert result['data'].equals(expected['data'].astype(str))
+    # The QC comments hold a time stamp
+    assert len(result['metadata']) == len(expected['metadata'])
+    metadata = [line for line in result['metadata']
+                if 'COMNT_QC' not in line]
+    assert metadata == list(item['metadata'])
@@ -0,0 +1,101 @@
+"""Tests of the profileqc command and the manifest of resumed runs."""
+import json
+import os
+import shutil
+import pytest
+from benchmarks.synthetic import make_datasets
+from profileqc import utils
+from profileqc.cli import MANIFEST_NAME, main
+from profileqc.manifest import RunManifest
+from profileqc.pipeline import write_profile
+
+
+@pytest.fixture
+def routine_path(tmp_path):
+    """Return folder with a copy of the routine settings."""
+    etc_path = utils.get_base_folder().joinpath('etc')
+    path = tmp_path.joinpath('routines')
+    shutil.copytree(etc_path.joinpath('qc_routines'), path)
+    return path
+
+
+@pytest.fixture
+def input_paths(tmp_path):
+    """Return paths of three standard format files."""
+    folder = tmp_path.joinpath('data')
+    folder.mkdir()
+    paths = []
+    for name, item in make_datasets(n_profiles=3, n_rows=200).items():
+        paths.append(folder.joinpath(f'{name}.txt'))
+        write_profile(paths[-1], item)
+    return paths
+
+
+def run_cli(capsys, input_paths, out_path, *args):
+    """Return (exit code, first line of stdout) of profileqc run."""
+    code = main(['run', str(input_paths[0].parent.joinpath('*.txt')),
+                 '-o', str(out_path), '--jobs', '1', *args])
+    return code, capsys.readouterr().out.splitlines()[0]
+
+
+def touch(path):
+    """Give path a later modification time."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_resume(tmp_path, capsys, input_paths, routine_path):
+    """Completed files are skipped until the file or settings change."""
+    out_path = tmp_path.joinpath('qc')
+    args = ('--routine-path', str(routine_path))
+    assert run_cli(capsys, input_paths, out_path, *args) == (
+        0, '3 of 3 files to QC (0 already completed)')
+    assert sorted(path.name for path in out_path.glob('*.txt')) == [
+        path.name for path in input_paths]
+    assert run_cli(capsys, input_paths, out_path, *args) == (
+        0, '0 of 3 files to QC (3 already completed)')
+
+    touch(input_paths[1])
+    assert run_cli(capsys, input_paths, out_path, *args) == (
+        0, '1 of 3 files to QC (2 already completed)')
+
+    touch(routine_path.joinpath('qc_range.yaml'))
+    assert run_cli(capsys, input_paths, out_path, *args) == (
+        0, '3 of 3 files to QC (0 already completed)')
+
+    assert run_cli(capsys, input_paths, out_path, *args, '--restart') == (
+        0, '3 of 3 files to QC (0 already completed)')
+    with open(out_path.joinpath(MANIFEST_NAME)) as fd:
+        assert len(fd.readlines()) == 3
+
+
+def test_truncated_manifest(tmp_path, capsys, input_paths):
+    """The last line of a crashed run is ignored."""
+    out_path = tmp_path.joinpath('qc')
+    assert run_cli(capsys, input_paths, out_path)[0] == 0
+    manifest_path = out_path.joinpath(MANIFEST_NAME)
+    lines = manifest_path.read_text().splitlines()
+    lines[-1] = lines[-1][:len(lines[-1]) // 2]
+    manifest_path.write_text('\n'.join(lines))
+
+    manifest = RunManifest(manifest_path)
+    assert len(manifest.completed) == 2
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(manifest_path.read_text().splitlines()[-1])
+    assert run_cli(capsys, input_paths, out_path) == (
+        0, '1 of 3 files to QC (2 already completed)')
+    # The record of the resumed run is not appended to the truncated line
+    assert run_cli(capsys, input_paths, out_path) == (
+        0, '0 of 3 files to QC (3 already completed)')
+
+
+def test_duplicate_names(tmp_path, capsys, input_paths):
+    """Files with the same name are refused."""
+    folder = tmp_path.joinpath('other')
+    folder.mkdir()
+    shutil.copy(input_paths[0], folder)
+    code = main(['run', str(input_paths[0]), str(folder.joinpath('*.txt')),
+                 '-o', str(tmp_path.joinpath('qc'))])
+    assert code == 2
+    assert 'same name' in capsys.readouterr().err
+    assert not tmp_path.joinpath('qc').exists()
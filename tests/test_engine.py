@@ -0,0 +1,83 @@
+"""Tests of the fused block evaluation of the routine kernels.
+
+The Q0- and Q-fields and the QC log of SessionQC.run are compared with a
+run where every routine object is run on the whole columns.
+"""
+import json
+import pytest
+from benchmarks.synthetic import make_profile, get_parameter_mapping
+from profileqc.engine import FusedEngine
+from profileqc.qc import SessionQC
+from profileqc.utils import QcLog
+
+SPEC_NAME = 'smhi_expedition'
+
+
+class ReferenceEngine(FusedEngine):
+    """Engine that evaluates no step, all routine objects are run."""
+
+    def evaluate(self, working, items, timings=None, nbytes=None):
+        """Return no results."""
+        return {}
+
+
+class ReferenceSessionQC(SessionQC):
+    """SessionQC without fused evaluation."""
+
+    def get_engine(self, plan):
+        """Return engine that evaluates no step."""
+        return ReferenceEngine(plan, self.settings)
+
+
+def run_qc(session, item, name):
+    """Return the Q-fields and the QC log of a QC run."""
+    QcLog.update_info(reset_log=True)
+    item = {'data': item['data'].copy(), 'metadata': item['metadata'].copy()}
+    session.run_profile(item, parameter_mapping=get_parameter_mapping(
+        item['data']), dataset_name=name)
+    df = item['data']
+    flags = df[[key for key in df if key.startswith('Q')]]
+    log = json.dumps(QcLog.log, sort_keys=True, default=str)
+    QcLog.update_info(reset_log=True)
+    return flags, log
+
+
+@pytest.fixture(scope='module', params=(None, SPEC_NAME))
+def sessions(request):
+    """Return (fused, reference) sessions."""
+    return (SessionQC(None, advanced_settings_name=request.param),
+            ReferenceSessionQC(None, advanced_settings_name=request.param))
+
+
+def assert_equal_runs(sessions, item, name):
+    """Assert that both sessions give the same flags and QC log."""
+    fused, reference = sessions
+    flags, log = run_qc(fused, item, name)
+    expected_flags, expected_log = run_qc(reference, item, name)
+    assert list(flags.columns) == list(expected_flags.columns)
+    assert flags.equals(expected_flags)
+    assert log == expected_log
+
+
+@pytest.mark.parametrize('seed', (1, 2))
+def test_profile_over_block_edges(sessions, seed):
+    """Profiles of more than two blocks."""
+    n_rows = 2 * FusedEngine.block_size + 2232
+    item = make_profile(seed=seed, n_rows=n_rows)
+    assert_equal_runs(sessions, item, f'S{seed}')
+
+
+@pytest.mark.parametrize('block_size', (1, 7, 97))
+def test_small_blocks(sessions, block_size, monkeypatch):
+    """Blocks smaller than the halo of the routines."""
+    monkeypatch.setattr(FusedEngine, 'block_size', block_size)
+    item = make_profile(seed=3, n_rows=600, error_rate=0.03)
+    assert_equal_runs(sessions, item, 'S3')
+
+
+def test_missing_data(sessions):
+    """Parameters without data are not evaluated."""
+    item = make_profile(seed=4, n_rows=800)
+    item['data']['DOXY2_CTD [ml/l]'] = ''
+    item['data'].loc[:500, 'PAR_CTD [uE/(cm2*sec)]'] = ''
+    assert_equal_runs(sessions, item, 'S4')
@@ -0,0 +1,141 @@
+"""Tests of the QC log sinks.
+
+The QC log written to disk by a sink is compared with QcLog.log of the same
+runs kept in memory.
+"""
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+from benchmarks.synthetic import make_datasets, get_parameter_mapping
+from profileqc.log_sinks import (
+    StreamingLogSink,
+    TabularLogSink,
+    iter_records,
+    read_log_table,
+    write_yaml_log
+)
+from profileqc.qc import SessionQC
+from profileqc.utils import QcLog
+
+SPEC_NAME = 'smhi_expedition'
+
+
+@pytest.fixture(scope='module')
+def session():
+    """Return SessionQC with advanced QC specification."""
+    return SessionQC(None, advanced_settings_name=SPEC_NAME)
+
+
+@pytest.fixture(scope='module')
+def datasets():
+    """Return synthetic profiles."""
+    return make_datasets(n_profiles=4, n_rows=400, error_rate=0.02)
+
+
+def run_qc(session, datasets, sink=None):
+    """Run QC of all profiles, with the log sent to sink if given."""
+    QcLog.update_info(reset_log=True)
+    QcLog.set_sink(sink)
+    try:
+        for name, item in datasets.items():
+            item = {'data': item['data'].copy(),
+                    'metadata': item['metadata'].copy()}
+            session.run_profile(
+                item, parameter_mapping=get_parameter_mapping(item['data']),
+                dataset_name=name)
+        QcLog.update_info('end of run')
+    finally:
+        QcLog.set_sink(None)
+
+
+@pytest.fixture(scope='module')
+def expected_log(session, datasets):
+    """Return QcLog.log of the profiles kept in memory."""
+    run_qc(session, datasets)
+    log = json.loads(json.dumps(QcLog.log))
+    QcLog.update_info(reset_log=True)
+    assert len(log) == len(datasets) + 1
+    return log
+
+
+def test_streaming(tmp_path, session, datasets, expected_log):
+    """JSON Lines records and yaml log."""
+    stream_path = tmp_path.joinpath('qc_log.jsonl')
+    with StreamingLogSink(stream_path) as sink:
+        run_qc(session, datasets, sink=sink)
+    assert QcLog.log == {}
+
+    QcLog.log = {}
+    for record in iter_records(stream_path):
+        if 'etc' in record:
+            QcLog.update_info(record['etc'])
+        else:
+            QcLog.update_info(
+                serie=record['serie'], routine_name=record['routine_name'],
+                parameter=record['parameter'], flag=record['flag'],
+                pressure=record['item']['pressure'],
+                info=record['item']['info'],
+                qc_index=record['item']['qc_index'],
+                parameter_data=record['item']['values'])
+    assert QcLog.log == expected_log
+
+    QcLog.log = expected_log
+    QcLog.write(tmp_path.joinpath('expected.yaml'))
+    QcLog.update_info(reset_log=True)
+    write_yaml_log(stream_path, tmp_path.joinpath('qc_log.yaml'))
+    with open(tmp_path.joinpath('qc_log.yaml')) as fd:
+        text = fd.read()
+    with open(tmp_path.joinpath('expected.yaml')) as fd:
+        assert text == fd.read()
+    assert yaml.safe_load(text) == expected_log
+
+
+def test_empty_yaml_log(tmp_path):
+    """An empty log is written as an empty mapping."""
+    stream_path = tmp_path.joinpath('qc_log.jsonl')
+    StreamingLogSink(stream_path).close()
+    write_yaml_log(stream_path, tmp_path.joinpath('qc_log.yaml'))
+    with open(tmp_path.joinpath('qc_log.yaml')) as fd:
+        assert yaml.safe_load(fd) == {}
+
+
+@pytest.mark.parametrize('fmt', ('csv', 'parquet'))
+def test_tabular(tmp_path, session, datasets, expected_log, fmt):
+    """One row per flagged value, written in small batches."""
+    if fmt == 'parquet':
+        pytest.importorskip('pyarrow')
+    file_path = tmp_path.joinpath(f'qc_log.{fmt}')
+    with TabularLogSink(file_path, batch_size=50) as sink:
+        run_qc(session, datasets, sink=sink)
+
+    rows = []
+    for serie, serie_item in expected_log.items():
+        if serie == 'etc':
+            continue
+        for routine_name, routine_item in serie_item.items():
+            for parameter, parameter_item in routine_item.items():
+                for flag, item in parameter_item.items():
+                    for pressure, value in zip(item['pressure'],
+                                               item['values']):
+                        rows.append((serie, routine_name, item['qc_index'],
+                                     parameter, flag, pressure, value))
+    expected = pd.DataFrame(rows, columns=list(TabularLogSink.columns))
+
+    df = read_log_table(file_path)
+    assert list(df.columns) == list(TabularLogSink.columns)
+    assert len(df) == len(expected) > 50
+    for key in ('series', 'routine_name', 'parameter', 'flag'):
+        assert df[key].astype(str).tolist() == expected[key].tolist()
+    assert df['qc_index'].astype(int).tolist() == expected[
+        'qc_index'].tolist()
+    for key in ('pressure', 'value'):
+        np.testing.assert_allclose(df[key].to_numpy(dtype=float),
+                                   expected[key].to_numpy(dtype=float))
+
+    parameter = expected['parameter'].iloc[0]
+    df = read_log_table(file_path, columns=['parameter', 'value'],
+                        filters=[('parameter', '==', parameter)])
+    assert list(df.columns) == ['parameter', 'value']
+    assert len(df) == (expected['parameter'] == parameter).sum()
@@ -0,0 +1,45 @@
+"""Tests of OverrideTable."""
+import pandas as pd
+import pytest
+from profileqc.overrides import OverrideTable
+
+
+@pytest.fixture
+def table():
+    """Return table of a specification with a MONTH_LIST column."""
+    data = {
+        'qc_range': pd.DataFrame({
+            'PARAMETER': ['TEMP_CTD', 'SALT_CTD'],
+            'AREA_NAME': ['Skagerrak', 'Skagerrak'],
+            'MIN_RANGE_VALUE': [-2., 0.],
+            'MONTH_LIST': [['12', '1', '2'], ['1']],
+        }).set_index('PARAMETER'),
+        'qc_spike': pd.DataFrame(
+            columns=['PARAMETER', 'AREA_NAME', 'MONTH_LIST']
+        ).set_index('PARAMETER'),
+    }
+    return OverrideTable.from_month_lists(data)
+
+
+def test_get(table):
+    """Settings of the area and month, every routine present."""
+    settings = table.get('Skagerrak', 1.0)
+    assert list(settings) == ['qc_range', 'qc_spike']
+    assert list(settings['qc_range']) == ['TEMP_CTD', 'SALT_CTD']
+    assert settings['qc_range']['TEMP_CTD']['MIN_RANGE_VALUE'] == -2.
+    assert list(table.get('Skagerrak', '12')['qc_range']) == ['TEMP_CTD']
+    assert table.get('Kattegat', 1) == {'qc_range': {}, 'qc_spike': {}}
+
+
+@pytest.mark.parametrize('area', ('Skagerrak', 'Kattegat'))
+def test_read_only(table, area):
+    """The returned settings can not be modified."""
+    settings = table.get(area, 1)
+    with pytest.raises(TypeError):
+        settings['qc_range']['TEMP_CTD'] = {}
+    with pytest.raises(TypeError):
+        settings['qc_spike'] = {}
+    if 'TEMP_CTD' in settings['qc_range']:
+        with pytest.raises(TypeError):
+            settings['qc_range']['TEMP_CTD']['MIN_RANGE_VALUE'] = 5.
+    assert table.get(area, 1) is settings
@@ -0,0 +1,94 @@
+"""Tests of QcPipeline.
+
+The files and the QC log of a pipeline run are compared with SessionQC.run
+on one profile at a time.
+"""
+import json
+import threading
+import pytest
+from benchmarks.synthetic import make_datasets
+from profileqc.chunked import get_parameter_mapping
+from profileqc.pipeline import QcPipeline, read_profile, write_profile
+from profileqc.qc import SessionQC
+from profileqc.utils import QcLog
+
+SPEC_NAME = 'smhi_expedition'
+
+
+def get_log():
+    """Return the QC log as text and reset it."""
+    log = json.dumps(QcLog.log, sort_keys=True, default=str)
+    QcLog.update_info(reset_log=True)
+    return log
+
+
+def run_in_thread(func, timeout=120):
+    """Return func(), fail instead of hanging."""
+    result = {}
+
+    def target():
+        try:
+            result['value'] = func()
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), 'The pipeline did not return'
+    if 'error' in result:
+        raise result['error']
+    return result['value']
+
+
+@pytest.fixture(scope='module')
+def input_paths(tmp_path_factory):
+    """Return paths of five standard format files."""
+    folder = tmp_path_factory.mktemp('data')
+    paths = []
+    datasets = make_datasets(n_profiles=5, n_rows=300, error_rate=0.02)
+    for name, item in datasets.items():
+        paths.append(folder.joinpath(f'{name}.txt'))
+        write_profile(paths[-1], item)
+    return paths
+
+
+@pytest.mark.parametrize('spec_name', (None, SPEC_NAME))
+def test_equal_to_serial_run(tmp_path, input_paths, spec_name):
+    """Files are written in order, with the QC log of a serial run."""
+    written_paths = []
+    pipeline = QcPipeline(
+        workers=2, max_pending=1, advanced_settings_name=spec_name,
+        on_written=lambda path, out_path: written_paths.append(path))
+    QcLog.update_info(reset_log=True)
+    out_paths = run_in_thread(
+        lambda: pipeline.run_files(input_paths, tmp_path))
+    log = get_log()
+    assert written_paths == input_paths
+    assert out_paths == [tmp_path.joinpath(path.name)
+                         for path in input_paths]
+
+    session = SessionQC(None, advanced_settings_name=spec_name)
+    for path, out_path in zip(input_paths, out_paths):
+        expected = read_profile(path)
+        session.run_profile(
+            expected,
+            parameter_mapping=get_parameter_mapping(expected['data'].columns),
+            dataset_name=path.stem)
+        result = read_profile(out_path)
+        assert result['data'].equals(expected['data'].astype(str))
+    assert log == get_log()
+
+
+def test_reader_error(tmp_path, input_paths):
+    """An error of the reader is raised, the other stages are stopped."""
+    def reader(path):
+        if path == input_paths[2]:
+            raise ValueError(f'Could not read {path}')
+        return read_profile(path)
+
+    pipeline = QcPipeline(workers=2, max_pending=1, reader=reader)
+    with pytest.raises(ValueError, match='Could not read'):
+        run_in_thread(lambda: pipeline.run_files(input_paths, tmp_path))
+    QcLog.update_info(reset_log=True)
+    assert len(list(tmp_path.glob('*.txt'))) <= 2
@@ -0,0 +1,145 @@
+"""Tests of the QC result cache of SessionQC."""
+import json
+import os
+import pytest
+from benchmarks.synthetic import make_profile, get_parameter_mapping
+from profileqc.engine import SHARED_SETTINGS
+from profileqc.qc import SessionQC
+from profileqc.result_cache import ResultCache, get_fingerprint
+from profileqc.utils import QcLog
+
+SPEC_NAME = 'smhi_expedition'
+
+
+def get_log():
+    """Return the QC log as text and reset it."""
+    log = json.dumps(QcLog.log, sort_keys=True, default=str)
+    QcLog.update_info(reset_log=True)
+    return log
+
+
+def run_qc(session, item, name):
+    """Return the data and QC log of a QC run on a copy of item."""
+    QcLog.update_info(reset_log=True)
+    item = {'data': item['data'].copy(), 'metadata': item['metadata'].copy()}
+    session.run_profile(item, parameter_mapping=get_parameter_mapping(
+        item['data']), dataset_name=name)
+    return item['data'], get_log()
+
+
+def get_items(session, item):
+    """Return (PlanStep, dataset settings) of the plan of item."""
+    session.update_data(item, parameter_mapping=get_parameter_mapping(
+        item['data']))
+    if session.settings.advanced_spec:
+        session.update_routines()
+    return [(step, step.get_item(getattr(session.settings, step.routine)))
+            for step in session.get_plan()]
+
+
+@pytest.fixture(scope='module')
+def session():
+    """Return SessionQC without result cache."""
+    return SessionQC(None, advanced_settings_name=SPEC_NAME)
+
+
+@pytest.fixture
+def item():
+    """Return synthetic profile."""
+    return make_profile(seed=7, n_rows=600, error_rate=0.02)
+
+
+def test_cache_hit(tmp_path, item):
+    """The second run is taken from the cache, with equal data and log."""
+    cached_session = SessionQC(None, advanced_settings_name=SPEC_NAME,
+                               result_cache=ResultCache(tmp_path))
+    events = []
+    cached_session.add_hook(events.append)
+
+    first, first_log = run_qc(cached_session, item, 'S7')
+    assert [event for event in events if event.phase == 'routine']
+    assert len(list(tmp_path.iterdir())) == 1
+
+    events.clear()
+    second, second_log = run_qc(cached_session, item, 'S7')
+    phases = {event.phase for event in events}
+    assert 'cache' in phases
+    assert 'routine' not in phases
+    assert second.equals(first)
+    assert second_log == first_log
+    assert first_log != json.dumps({})
+
+
+def test_equal_to_uncached_run(tmp_path, session, item):
+    """Runs with the cache give the data and log of a run without it."""
+    expected, expected_log = run_qc(session, item, 'S7')
+    cached_session = SessionQC(None, advanced_settings_name=SPEC_NAME,
+                               result_cache=ResultCache(tmp_path))
+    for _ in range(2):
+        df, log = run_qc(cached_session, item, 'S7')
+        assert df.equals(expected)
+        assert log == expected_log
+
+
+def test_fingerprint_of_data(session, item):
+    """One changed value changes the fingerprint."""
+    items = get_items(session, item)
+    key = get_fingerprint(item['data'], items, session.settings,
+                          session.parameter_mapping)
+    assert key == get_fingerprint(item['data'].copy(), items,
+                                  session.settings, session.parameter_mapping)
+
+    df = item['data'].copy()
+    df.loc[100, 'TEMP_CTD [deg C]'] = '10.0001'
+    assert key != get_fingerprint(df, items, session.settings,
+                                  session.parameter_mapping)
+
+
+def test_fingerprint_of_settings(session, item):
+    """One changed routine threshold changes the fingerprint."""
+    items = get_items(session, item)
+    key = get_fingerprint(item['data'], items, session.settings,
+                          session.parameter_mapping)
+
+    step, settings = items[0]
+    thresholds = [name for name, value in settings.items()
+                  if isinstance(value, (int, float))]
+    threshold = next(name for name in thresholds
+                     if name not in SHARED_SETTINGS)
+    changed = list(items)
+    changed[0] = (step, {**settings, threshold: settings[threshold] + 1})
+    assert key != get_fingerprint(item['data'], changed, session.settings,
+                                  session.parameter_mapping)
+
+
+def test_evict(tmp_path):
+    """The least recently used results are removed first."""
+    cache = ResultCache(tmp_path, max_bytes=10 ** 6)
+    for i in range(5):
+        cache.put(f'key{i}', {'data': bytes(range(256)) * (i + 1)})
+    sizes = {i: cache.get_path(f'key{i}').stat().st_size for i in range(5)}
+    # Oldest first: key3, key1, key4, key0, key2
+    for second, i in enumerate((3, 1, 4, 0, 2)):
+        os.utime(cache.get_path(f'key{i}'), ns=(second * 10 ** 9,
+                                                second * 10 ** 9))
+
+    cache.max_bytes = sizes[2] + sizes[0] + sizes[4]
+    cache.evict()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        f'key{i}{cache.suffix}' for i in (0, 2, 4)]
+    assert cache._size == cache.max_bytes
+
+
+def test_get_renews_results(tmp_path):
+    """A hit makes the result the most recently used one."""
+    cache = ResultCache(tmp_path)
+    for i in range(2):
+        cache.put(f'key{i}', {'data': i})
+        os.utime(cache.get_path(f'key{i}'), ns=(i * 10 ** 9, i * 10 ** 9))
+    assert cache.get('key0')['data'] == 0
+    assert cache.get('missing') is None
+
+    cache.max_bytes = cache.get_path('key0').stat().st_size
+    cache.evict()
+    assert [path.name for path in tmp_path.iterdir()] == [
+        f'key0{cache.suffix}']
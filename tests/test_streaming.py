@@ -0,0 +1,135 @@
+"""Tests of StreamingSessionQC.
+
+The concatenated output of a cast pushed in chunks is compared with
+SessionQC.run on the whole cast: Q0- and Q-fields and the QC log.
+"""
+import contextlib
+import json
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_profile, get_parameter_mapping
+from profileqc.qc import SessionQC
+from profileqc.streaming import StreamingSessionQC
+from profileqc.utils import QcLog
+
+SPEC_NAME = 'smhi_expedition'
+
+
+@pytest.fixture(scope='module', params=(None, SPEC_NAME))
+def spec_name(request):
+    """Return name of the advanced QC specification."""
+    return request.param
+
+
+@pytest.fixture(scope='module')
+def session(spec_name):
+    """Return SessionQC of the whole casts."""
+    return SessionQC(None, advanced_settings_name=spec_name)
+
+
+def get_log():
+    """Return the QC log as text and reset it."""
+    log = json.dumps(QcLog.log, sort_keys=True, default=str)
+    QcLog.update_info(reset_log=True)
+    return log
+
+
+def run_qc(session, item, name):
+    """Return data and QC log of SessionQC.run on the whole cast."""
+    QcLog.update_info(reset_log=True)
+    item = {'data': item['data'].copy(), 'metadata': item['metadata'].copy()}
+    session.run_profile(item, parameter_mapping=get_parameter_mapping(
+        item['data']), dataset_name=name)
+    return item['data'], get_log()
+
+
+def run_streaming(spec_name, item, name, seed, max_rows=40,
+                  data_columns=None):
+    """Return data and QC log of the cast pushed in random chunks."""
+    QcLog.update_info(reset_log=True)
+    df = item['data']
+    if data_columns is None:
+        context = pytest.warns(UserWarning, match='data_columns')
+    else:
+        context = contextlib.nullcontext()
+    with context:
+        qc_run = StreamingSessionQC(
+            parameter_mapping=get_parameter_mapping(df), dataset_name=name,
+            metadata=item['metadata'].copy(),
+            advanced_settings_name=spec_name, data_columns=data_columns)
+    rng = np.random.default_rng(seed)
+    outputs = []
+    start = 0
+    while start < len(df):
+        end = start + int(rng.integers(1, max_rows + 1))
+        outputs.append(qc_run.push(df.iloc[start:end]))
+        start = end
+    outputs.append(qc_run.finish())
+    return pd.concat(outputs), get_log()
+
+
+def assert_equal_runs(session, spec_name, item, name, seed, **kwargs):
+    """Assert that streaming gives the data and QC log of a whole run."""
+    expected, expected_log = run_qc(session, item, name)
+    df, log = run_streaming(spec_name, item, name, seed, **kwargs)
+    assert list(df.columns) == list(expected.columns)
+    assert len(df) == len(expected)
+    flag_keys = [key for key in expected if key.startswith('Q')]
+    assert df[flag_keys].reset_index(drop=True).equals(
+        expected[flag_keys].reset_index(drop=True))
+    assert log == expected_log
+
+
+@pytest.mark.parametrize('seed', (1, 2, 3))
+def test_random_chunks(session, spec_name, seed):
+    """Chunks of 1-40 rows."""
+    item = make_profile(seed=seed, n_rows=500 + 91 * seed, error_rate=0.02)
+    assert_equal_runs(session, spec_name, item, f'S{seed}', seed)
+
+
+def test_single_rows(session, spec_name):
+    """One row per chunk."""
+    item = make_profile(seed=5, n_rows=300)
+    assert_equal_runs(session, spec_name, item, 'S5', 5, max_rows=1)
+
+
+def test_late_data(session, spec_name):
+    """A parameter that gets its first value late in the cast."""
+    item = make_profile(seed=9, n_rows=400)
+    item['data'].loc[:250, 'DOXY2_CTD [ml/l]'] = ''
+    assert_equal_runs(session, spec_name, item, 'S9', 9)
+
+
+def test_data_columns(session, spec_name):
+    """Columns with data given beforehand."""
+    item = make_profile(seed=6, n_rows=400)
+    item['data'].loc[:250, 'DOXY2_CTD [ml/l]'] = ''
+    item['data']['PAR_CTD [uE/(cm2*sec)]'] = ''
+    data_columns = [key for key in item['data']
+                    if item['data'][key].any()]
+    assert_equal_runs(session, spec_name, item, 'S6', 6,
+                      data_columns=data_columns)
+
+
+def test_latency(spec_name):
+    """Rows are held back while a parameter lacks data, if not given."""
+    item = make_profile(seed=8, n_rows=200)
+    item['data']['PAR_CTD [uE/(cm2*sec)]'] = ''
+    df = item['data']
+    kwargs = {'parameter_mapping': get_parameter_mapping(df),
+              'dataset_name': 'S8', 'advanced_settings_name': spec_name}
+
+    with pytest.warns(UserWarning, match='data_columns'):
+        qc_run = StreamingSessionQC(**kwargs)
+    assert len(qc_run.push(df.iloc[:150])) == 0
+    assert len(qc_run.finish()) == 150
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        qc_run = StreamingSessionQC(
+            **kwargs, data_columns=[key for key in df if df[key].any()])
+    assert len(qc_run.push(df.iloc[:150])) == 150 - qc_run.latency
+    assert len(qc_run.finish()) == qc_run.latency
+    QcLog.update_info(reset_log=True)